@@ -0,0 +1,85 @@
+"""Count the MongoDB commands issued by the quiz_results export at different sizes.
+
+Usage: MONGO_URI=mongodb://localhost:27017 python benchmarks/export_queries.py [rows ...]
+
+Seeds a throwaway database (tnca_export_benchmark), runs the export row
+generator and prints the number of find/distinct/aggregate commands. The
+count should stay flat as the row count grows; only cursor getMores scale.
+"""
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient, monitoring
+
+import models.database as database
+
+BENCHMARK_DB = 'tnca_export_benchmark'
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        if event.database_name == BENCHMARK_DB:
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def seed(db, rows, users=200, quizzes=20):
+    db.users.delete_many({})
+    db.quizzes.delete_many({})
+    db.quiz_attempts.delete_many({})
+
+    user_ids = [str(_id) for _id in db.users.insert_many(
+        [{"name": f"User {i}", "email": f"user{i}@example.com"} for i in range(users)]
+    ).inserted_ids]
+    quiz_ids = [str(_id) for _id in db.quizzes.insert_many(
+        [{"title": f"Quiz {i}", "category": "General"} for i in range(quizzes)]
+    ).inserted_ids]
+
+    now = datetime.utcnow()
+    db.quiz_attempts.insert_many([
+        {
+            "user_id": user_ids[i % users],
+            "quiz_id": quiz_ids[i % quizzes],
+            "score": i % 10,
+            "percentage": (i % 10) * 10,
+            "time_taken": 60,
+            "status": "completed",
+            "created_at": now
+        }
+        for i in range(rows)
+    ])
+
+def main(sizes):
+    counter = CommandCounter()
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'), event_listeners=[counter])
+    database.db = client[BENCHMARK_DB]
+
+    from services.exports import quiz_result_rows
+
+    print(f"{'rows':>8} {'queries':>8} {'getMore':>8} {'seconds':>8}")
+    for rows in sizes:
+        seed(database.db, rows)
+        counter.commands.clear()
+
+        started = time.perf_counter()
+        exported = sum(1 for _ in quiz_result_rows())
+        elapsed = time.perf_counter() - started
+
+        queries = sum(count for name, count in counter.commands.items() if name != 'getMore')
+        print(f"{exported:>8} {queries:>8} {counter.commands['getMore']:>8} {elapsed:>8.2f}")
+
+    client.drop_database(BENCHMARK_DB)
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 10000, 100000])
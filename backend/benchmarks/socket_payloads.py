@@ -0,0 +1,109 @@
+"""Compare Socket.IO payload size and encode cost for JSON and MessagePack.
+
+Usage: python benchmarks/socket_payloads.py [iterations]
+
+For each main event type, prints the bytes of the Socket.IO frame a client
+receives (event name included) for JSON and for the MessagePack schema, each
+raw and after deflate (what permessage-deflate does to a single frame, without
+its context carried across frames), plus the encode time per message.
+"""
+import json
+import os
+import sys
+import timeit
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack
+
+from services.socket_codec import to_json, to_msgpack
+
+def leaderboard_entries(count):
+    return [{
+        'user_id': f'65f0c2a1b7e4d3c2a1b0{rank:04d}',
+        'username': f'cuber{rank}',
+        'name': f'Player Number {rank}',
+        'total_score': 10000 - rank * 37,
+        'total_plays': 120 - rank,
+        'correct_answers': 90 - rank,
+        'average_score': round((10000 - rank * 37) / (120 - rank), 2),
+        'rank': rank
+    } for rank in range(1, count + 1)]
+
+now = datetime.utcnow()
+EVENTS = {
+    'game_move_update': {
+        'session_id': '65f0c2a1b7e4d3c2a1b0ffee',
+        'move': {'notation': "R U R' U'", 'index': 42},
+        'user_id': '65f0c2a1b7e4d3c2a1b00001',
+        'timestamp': now
+    },
+    'leaderboard_update': {
+        'game_id': '65f0c2a1b7e4d3c2a1b0aaaa',
+        'version': 1201,
+        'base_version': 1200,
+        'changed': leaderboard_entries(3),
+        'removed': ['65f0c2a1b7e4d3c2a1b09999']
+    },
+    'leaderboard_snapshot': {
+        'game_id': '65f0c2a1b7e4d3c2a1b0aaaa',
+        'version': 1201,
+        'entries': leaderboard_entries(10)
+    },
+    'tournament_update': {
+        'tournament_id': '65f0c2a1b7e4d3c2a1b0bbbb',
+        'base_version': 17,
+        'version': 18,
+        'match': {
+            'match_id': 'round_2_match_3', 'round': 2,
+            'player1_id': '65f0c2a1b7e4d3c2a1b00001', 'player2_id': '65f0c2a1b7e4d3c2a1b00002',
+            'winner_id': '65f0c2a1b7e4d3c2a1b00001', 'status': 'completed',
+            'scheduled_time': None, 'completed_time': now, 'player1_score': 3, 'player2_score': 1
+        },
+        'advanced': [],
+        'new_matches': [],
+        'progress': {'total_matches': 31, 'completed_matches': 20, 'progress_percentage': 64.5, 'current_round': 2},
+        'status': 'active',
+        'winner_id': None
+    },
+    'chat_message': {
+        'session_id': '65f0c2a1b7e4d3c2a1b0ffee',
+        'message': 'gg, nice solve!',
+        'user_id': '65f0c2a1b7e4d3c2a1b00001',
+        'user_name': 'Player Number 1',
+        'timestamp': now
+    }
+}
+
+def json_frame(event, data):
+    # Socket.IO EVENT packet as sent over a websocket text frame
+    return ('42' + json.dumps([event, to_json(data)], separators=(',', ':'))).encode()
+
+def msgpack_frame(event, data):
+    # Binary event: placeholder text frame plus one binary attachment frame
+    header = ('451-' + json.dumps([event, {'_placeholder': True, 'num': 0}], separators=(',', ':'))).encode()
+    return header, b'\x04' + to_msgpack(event, data)
+
+def deflated(payload):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+def main(iterations):
+    print(f"msgpack {msgpack.version}, {iterations} encodes per measurement\n")
+    print(f"{'event':<22}{'json B':>8}{'json+df':>9}{'mp B':>8}{'mp+df':>8}{'saved':>8}{'json us':>9}{'mp us':>8}")
+    for event, data in EVENTS.items():
+        text = json_frame(event, data)
+        header, binary = msgpack_frame(event, data)
+        binary_total = len(header) + len(binary)
+        binary_deflated = deflated(header) + deflated(binary)
+
+        json_cost = timeit.timeit(lambda: json_frame(event, data), number=iterations) / iterations * 1e6
+        msgpack_cost = timeit.timeit(lambda: msgpack_frame(event, data), number=iterations) / iterations * 1e6
+        saved = 100 * (1 - binary_total / len(text))
+        print(f"{event:<22}{len(text):>8}{deflated(text):>9}{binary_total:>8}{binary_deflated:>8}{saved:>7.0f}%"
+              f"{json_cost:>9.1f}{msgpack_cost:>8.1f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -36,4 +36,38 @@ keyfile = None
 certfile = None
 
 # Preload app for better performance
-preload_app = True 
\ No newline at end of file
+preload_app = True 
+
+# Report worker processes (run report jobs outside the web workers)
+report_processes = []
+
+# Local Socket.IO broker process (SOCKETIO_MESSAGE_QUEUE=local://...)
+broker_processes = []
+
+def when_ready(server):
+    from services.report_worker import start_workers
+    from services.socket_broker import start_broker
+    mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/tnca_iq_platform')
+    report_processes.extend(start_workers(mongo_uri))
+    server.log.info(f"Started {len(report_processes)} report worker(s)")
+
+    broker = start_broker()
+    if broker:
+        broker_processes.append(broker)
+        server.log.info("Started local Socket.IO message broker")
+
+def post_fork(server, worker):
+    from websocket_service import socketio
+    from services.socket_broker import reset_host_id
+    reset_host_id(socketio)
+
+def worker_exit(server, worker):
+    from services.presence import presence
+    presence.withdraw()
+
+def on_exit(server):
+    from services.report_worker import stop_workers
+    from services.socket_broker import stop_broker
+    stop_workers(report_processes)
+    for broker in broker_processes:
+        stop_broker(broker)
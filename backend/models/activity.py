@@ -0,0 +1,104 @@
+from models.database import get_db
+from datetime import datetime
+from bson import ObjectId
+import os
+
+ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', 30))
+
+class Activity:
+    """Append-only feed of notable events in the activity_events collection.
+
+    Names are denormalized at write time so the feed is read with one
+    query; old events expire through a TTL index on created_at.
+    """
+
+    @staticmethod
+    def record(event_type, title, description, user_id=None, created_at=None):
+        """Append an event; failures never break the action being recorded"""
+        try:
+            db = get_db()
+            db.activity_events.insert_one({
+                "type": event_type,
+                "title": title,
+                "description": description,
+                "user_id": str(user_id) if user_id else None,
+                "created_at": created_at or datetime.utcnow()
+            })
+        except Exception as e:
+            print(f"Error recording activity: {e}")
+
+    @staticmethod
+    def record_registration(user_id, user_name, created_at=None):
+        Activity.record('user_registered', 'New user registered', f'{user_name} joined the platform', user_id, created_at)
+
+    @staticmethod
+    def record_quiz_completed(user_id, user_name, quiz_title, created_at=None):
+        Activity.record('quiz_completed', 'Quiz completed', f'{user_name} completed {quiz_title}', user_id, created_at)
+
+    @staticmethod
+    def record_game_played(user_id, user_name, game_name, created_at=None):
+        Activity.record('game_played', 'Game played', f'{user_name} played {game_name}', user_id, created_at)
+
+    @staticmethod
+    def get_feed(limit=10, cursor=None):
+        """Newest events first; pass the last event id as cursor to load older ones"""
+        db = get_db()
+        query = {}
+        if cursor:
+            query["_id"] = {"$lt": ObjectId(cursor)}
+
+        # ObjectIds are time-ordered, so the _id index serves the sort
+        events = list(db.activity_events.find(query).sort("_id", -1).limit(limit + 1))
+        has_more = len(events) > limit
+        events = events[:limit]
+        next_cursor = str(events[-1]['_id']) if has_more else None
+        return events, next_cursor
+
+    @staticmethod
+    def to_dict(event):
+        created_at = event.get('created_at') or event['_id'].generation_time.replace(tzinfo=None)
+        return {
+            "id": str(event['_id']),
+            "type": event.get('type'),
+            "title": event.get('title'),
+            "description": event.get('description'),
+            "time": created_at.strftime('%H:%M'),
+            "timestamp": created_at.isoformat()
+        }
+
+    @staticmethod
+    def seed_from_history(limit=10):
+        """Populate an empty feed from recent registrations and attempts (first start only)"""
+        from models.quiz import Quiz
+        from models.user import User
+
+        db = get_db()
+        if db.activity_events.estimated_document_count() > 0:
+            return 0
+
+        events = []
+        for user in db.users.find({}, {"name": 1, "created_at": 1}).sort("created_at", -1).limit(limit):
+            events.append(('user_registered', 'New user registered',
+                           f'{user.get("name", "Unknown")} joined the platform', user['_id'], user.get('created_at')))
+
+        attempts = list(db.quiz_attempts.find(
+            {"status": "completed"}, {"user_id": 1, "quiz_id": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(limit))
+        user_names = User.get_names({attempt.get('user_id') for attempt in attempts})
+        quizzes = Quiz.get_summaries({attempt.get('quiz_id') for attempt in attempts})
+        for attempt in attempts:
+            user_name = user_names.get(attempt.get('user_id'))
+            quiz = quizzes.get(attempt.get('quiz_id'))
+            if user_name and quiz:
+                events.append(('quiz_completed', 'Quiz completed',
+                               f'{user_name} completed {quiz["title"]}', attempt.get('user_id'), attempt.get('created_at')))
+
+        # Insert oldest first so _id order matches event time
+        events = sorted((event for event in events if event[4]), key=lambda event: event[4])
+        if events:
+            db.activity_events.insert_many([
+                {"type": event_type, "title": title, "description": description,
+                 "user_id": str(user_id), "created_at": created_at}
+                for event_type, title, description, user_id, created_at in events
+            ])
+        return len(events)
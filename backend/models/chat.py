@@ -0,0 +1,21 @@
+from models.database import get_db
+
+class ChatMessage:
+    """Game session chat messages, written in batches by services/chat.py"""
+
+    @staticmethod
+    def insert_many(messages):
+        """Insert a batch of message documents; returns the number written"""
+        if not messages:
+            return 0
+        db = get_db()
+        result = db.chat_messages.insert_many(messages, ordered=False)
+        return len(result.inserted_ids)
+
+    @staticmethod
+    def get_recent(session_id, limit=50):
+        """Latest messages for a session, oldest first"""
+        db = get_db()
+        messages = list(db.chat_messages.find({"session_id": session_id}).sort([("created_at", -1), ("_id", -1)]).limit(limit))
+        messages.reverse()
+        return messages
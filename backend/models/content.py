@@ -1,4 +1,5 @@
 from models.database import get_db
+from services.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
 import os
@@ -106,11 +107,11 @@ class Content:
         return [Content(content) for content in content_list]
 
     @staticmethod
-    def get_all_content():
-        """Get all content (admin)"""
+    def get_content_page(limit=None, cursor=None):
+        """One page of content (admin), newest first; returns (content, next_cursor)"""
         db = get_db()
-        content_list = list(db.content.find().sort("created_at", -1))
-        return [Content(content) for content in content_list]
+        content_list, next_cursor = paginate(db.content, sort=[("created_at", -1), ("_id", -1)], limit=limit, cursor=cursor)
+        return [Content(content) for content in content_list], next_cursor
 
     def update_content(self, update_data):
         """Update content"""
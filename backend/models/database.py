@@ -5,20 +5,73 @@ import os
 # Global database connection
 db = None
 
+def connect(uri):
+    """Open the database connection for this process (used by init_db and worker processes)"""
+    global db
+    client = MongoClient(uri)
+    db = client.tnca_iq_platform
+    return db
+
 def init_db(app):
     """Initialize database connection"""
-    global db
     try:
-        client = MongoClient(app.config['MONGO_URI'])
-        db = client.tnca_iq_platform
+        connect(app.config['MONGO_URI'])
         
         # Create indexes for better performance
         db.users.create_index("email", unique=True)
         db.users.create_index("username", unique=True)
+        db.users.create_index("performance_history.date")
+        db.users.create_index([("iq_score", -1)])
+        db.users.create_index("username_lower")
+        db.users.create_index("email_lower")
+        db.users.create_index("name_lower")
+        db.users.create_index([("role", 1), ("created_at", -1)])
         db.quizzes.create_index("title")
+        db.quizzes.create_index("scheduled_at", sparse=True)
         db.quiz_attempts.create_index([("user_id", 1), ("quiz_id", 1)])
+        # One attempt per user, quiz and day; legacy attempts without a day are exempt
+        db.quiz_attempts.create_index(
+            [("user_id", 1), ("quiz_id", 1), ("day", 1)],
+            unique=True,
+            partialFilterExpression={"day": {"$exists": True}}
+        )
+        db.quiz_attempts.create_index([("user_id", 1), ("created_at", -1)])
+        db.quiz_attempts.create_index([("quiz_id", 1), ("created_at", -1)])
         db.game_scores.create_index([("user_id", 1), ("game_type", 1)])
+        db.game_scores.create_index([("game_type", 1), ("created_at", -1)])
+        db.user_game_stats.create_index([("game_id", 1), ("last_played", -1)])
         db.analytics.create_index([("user_id", 1), ("date", -1)])
+        db.daily_rollups.create_index("date")
+        # Keyset pagination sorts on (created_at, _id)
+        db.matches.create_index([("challenger_id", 1), ("created_at", -1), ("_id", -1)])
+        db.matches.create_index([("opponent_id", 1), ("created_at", -1), ("_id", -1)])
+        db.content.create_index([("created_at", -1), ("_id", -1)])
+        db.tournaments.create_index([("created_at", -1), ("_id", -1)])
+        db.reports.create_index([("status", 1), ("created_at", 1)])
+        from models.activity import ACTIVITY_RETENTION_DAYS
+        db.activity_events.create_index("created_at", expireAfterSeconds=ACTIVITY_RETENTION_DAYS * 86400)
+        from models.socket_state import SOCKET_STATE_TTL_HOURS
+        db.socket_subscriptions.create_index("updated_at", expireAfterSeconds=SOCKET_STATE_TTL_HOURS * 3600)
+        db.live_game_sessions.create_index("updated_at", expireAfterSeconds=SOCKET_STATE_TTL_HOURS * 3600)
+        db.live_game_sessions.create_index("user_id")
+        db.chat_messages.create_index([("session_id", 1), ("created_at", -1), ("_id", -1)])
+        from services.presence import PRESENCE_STALE_SECONDS
+        db.socket_presence.create_index("updated_at", expireAfterSeconds=PRESENCE_STALE_SECONDS)
+        db.quiz_admission_slots.create_index([("quiz_id", 1), ("n", 1)])
+        db.quiz_admission_tickets.create_index([("quiz_id", 1), ("user_id", 1)], unique=True)
+        db.quiz_admission_tickets.create_index([("quiz_id", 1), ("seq", 1)])
+        
+        # Lowercased search fields for users created before search existed
+        backfill_user_search()
+        
+        # created_at for documents written before it was set (keyset pagination sorts on it)
+        backfill_sort_keys()
+        
+        # Seed analytics rollups on first start (before any new events are counted)
+        build_initial_rollups()
+        
+        # Seed the activity feed on first start
+        seed_activity_feed()
         
         # Create super admin if not exists
         create_super_admin()
@@ -53,6 +106,47 @@ def create_super_admin():
     except Exception as e:
         print(f"Error creating super admin: {e}")
 
+def backfill_user_search():
+    """Add lowercased search fields to existing users"""
+    from models.user import User
+    
+    try:
+        updated = User.backfill_search_keys()
+        if updated:
+            print(f"Backfilled search fields for {updated} users")
+    except Exception as e:
+        print(f"Error backfilling user search fields: {e}")
+
+def backfill_sort_keys():
+    """Add created_at to documents in created_at-sorted collections that lack it"""
+    from services.pagination import backfill_created_at
+    
+    try:
+        for name in ('quiz_attempts', 'matches', 'content', 'tournaments', 'users'):
+            updated = backfill_created_at(db[name])
+            if updated:
+                print(f"Backfilled created_at for {updated} {name}")
+    except Exception as e:
+        print(f"Error backfilling created_at: {e}")
+
+def build_initial_rollups():
+    """Backfill daily analytics rollups if none exist yet"""
+    from models.rollup import DailyRollup
+    
+    try:
+        DailyRollup.ensure_backfilled()
+    except Exception as e:
+        print(f"Error building daily rollups: {e}")
+
+def seed_activity_feed():
+    """Fill an empty activity feed from recent history"""
+    from models.activity import Activity
+    
+    try:
+        Activity.seed_from_history()
+    except Exception as e:
+        print(f"Error seeding activity feed: {e}")
+
 def get_db():
     """Get database instance"""
     return db 
\ No newline at end of file
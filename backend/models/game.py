@@ -541,7 +541,7 @@ class Game:
                 'updated_at': datetime.utcnow()
             })
 
-    def get_leaderboard(self):
+    def get_leaderboard(self, limit=50):
         """Get leaderboard for this game"""
         db = get_db()
         
@@ -591,7 +591,7 @@ class Game:
                 '$sort': {'total_score': -1}
             },
             {
-                '$limit': 50
+                '$limit': limit
             }
         ]
         
@@ -1,6 +1,8 @@
 from models.database import get_db
-from datetime import datetime
+from services.pagination import paginate
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 
 class Match:
     def __init__(self, match_data):
@@ -26,6 +28,11 @@ class Match:
         self.cube_type = match_data.get('cube_type', '3x3')
         self.chess_mode = match_data.get('chess_mode', 'standard')
         self.is_admin_challenge = match_data.get('is_admin_challenge', False)
+        
+        # Live (server-authoritative) matches
+        self.result_reason = match_data.get('result_reason')
+        self.move_log = match_data.get('move_log')
+        self.live = match_data.get('live')  # checkpoint while the match is being played
 
     @staticmethod
     def create_match(challenger_id, opponent_id, game_id, level_id, match_type='student_vs_student', cube_type=None, chess_mode=None):
@@ -112,17 +119,17 @@ class Match:
         return Match(match_data) if match_data else None
 
     @staticmethod
-    def get_user_matches(user_id):
-        """Get all matches for a user"""
+    def get_user_matches(user_id, limit=None, cursor=None):
+        """One page of a user's matches, newest first; returns (matches, next_cursor)"""
         db = get_db()
-        matches_data = db.matches.find({
+        query = {
             '$or': [
                 {'challenger_id': ObjectId(user_id)},
                 {'opponent_id': ObjectId(user_id)}
             ]
-        }).sort('created_at', -1)
-        
-        return [Match(match_data) for match_data in matches_data]
+        }
+        matches_data, next_cursor = paginate(db.matches, query, sort=[('created_at', -1), ('_id', -1)], limit=limit, cursor=cursor)
+        return [Match(match_data) for match_data in matches_data], next_cursor
 
     @staticmethod
     def get_pending_matches(user_id):
@@ -281,16 +288,99 @@ class Match:
 
     def calculate_score(self, solution, time_taken):
         """Calculate score for a solution"""
-        # This should use the same logic as the Game model
-        # Score calculation should be based on:
-        # - Solution correctness
-        # - Time taken vs time limit
-        # - Difficulty level
-        # - Game type specific factors
-        
-        # Placeholder for actual score calculation logic
-        # TODO: Implement proper score calculation based on game type and solution validation
-        return 0  # Default to 0 until proper calculation is implemented
+        # Solutions submitted over REST cannot be validated; live matches are
+        # played and scored by services/match_engine.py (see live_score)
+        return 0
+
+    @staticmethod
+    def live_score(result, time_taken, time_limit):
+        """Score for a live match result ('win', 'draw' or 'loss'), same scale as Game.calculate_score"""
+        if result == 'loss':
+            return 0
+        if result == 'draw':
+            return 50
+        time_bonus = max(0, int((time_limit - time_taken) / time_limit * 50)) if time_limit else 0
+        return 100 + time_bonus
+
+    @staticmethod
+    def claim_live(match_id, worker_id, lease_seconds):
+        """Take (or keep) ownership of an active match for one worker; returns the match document or None"""
+        db = get_db()
+        now = datetime.utcnow()
+        return db.matches.find_one_and_update(
+            {
+                '_id': ObjectId(match_id),
+                'status': 'active',
+                '$or': [
+                    {'live_owner': None},
+                    {'live_owner': worker_id},
+                    {'live_lease_until': {'$lt': now}}
+                ]
+            },
+            {'$set': {'live_owner': worker_id, 'live_lease_until': now + timedelta(seconds=lease_seconds)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def get_live_owner(match_id):
+        """Worker currently playing an active match, if its lease is still valid"""
+        db = get_db()
+        match_data = db.matches.find_one(
+            {'_id': ObjectId(match_id), 'status': 'active', 'live_lease_until': {'$gte': datetime.utcnow()}},
+            {'live_owner': 1}
+        )
+        return match_data.get('live_owner') if match_data else None
+
+    @staticmethod
+    def checkpoint_live(worker_id, checkpoints, match_ids, lease_seconds):
+        """Renew this worker's leases and save live checkpoints ({match_id: state}) in one bulk write"""
+        if not match_ids:
+            return
+        db = get_db()
+        lease_until = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        operations = []
+        for match_id in match_ids:
+            update = {'live_lease_until': lease_until}
+            if match_id in checkpoints:
+                update['live'] = checkpoints[match_id]
+            operations.append(UpdateOne({'_id': ObjectId(match_id), 'live_owner': worker_id}, {'$set': update}))
+        db.matches.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def finish_live(match_id, worker_id, result):
+        """Store a live match's final result and move log, then update player stats.
+
+        result holds winner_id (None for a draw), the scores and times of both
+        players, result_reason and move_log. Returns the Match, or None if this
+        worker no longer owns it.
+        """
+        db = get_db()
+        now = datetime.utcnow()
+        match_data = db.matches.find_one_and_update(
+            {'_id': ObjectId(match_id), 'status': 'active', 'live_owner': worker_id},
+            {
+                '$set': {
+                    'status': 'completed',
+                    'winner_id': ObjectId(result['winner_id']) if result['winner_id'] else None,
+                    'challenger_score': result['challenger_score'],
+                    'opponent_score': result['opponent_score'],
+                    'challenger_time': result['challenger_time'],
+                    'opponent_time': result['opponent_time'],
+                    'result_reason': result['result_reason'],
+                    'move_log': result['move_log'],
+                    'completed_at': now,
+                    'updated_at': now
+                },
+                '$unset': {'live': '', 'live_owner': '', 'live_lease_until': ''}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if not match_data:
+            return None
+        
+        match = Match(match_data)
+        match.update_user_stats()
+        return match
 
     def update_user_stats(self):
         """Update user statistics after match completion"""
@@ -376,6 +466,8 @@ class Match:
             'challenger_time': self.challenger_time,
             'opponent_time': self.opponent_time,
             'winner_id': self.winner_id,
+            'result_reason': self.result_reason,
+            'move_log': self.move_log,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
@@ -398,6 +490,7 @@ class Match:
             'challenger_time': self.challenger_time,
             'opponent_time': self.opponent_time,
             'winner_id': self.winner_id,
+            'result_reason': self.result_reason,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
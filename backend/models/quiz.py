@@ -1,10 +1,109 @@
 from models.database import get_db
-from datetime import datetime
+from models.rollup import DailyRollup
+from services.cache import TTLCache
+from services.pagination import paginate
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
+import numpy as np
 import os
 import base64
+import json
 import uuid
 
+# Sentinel codes used by the compiled answer key
+NO_ANSWER = -1       # question left unanswered
+UNKNOWN_ANSWER = -2  # answer that matches no correct answer of the quiz
+NO_KEY = -3          # question without a correct answer in the key
+
+REGRADE_BATCH_SIZE = 1000
+
+QUIZ_CACHE_TTL = int(os.getenv('QUIZ_CACHE_TTL', 60))  # seconds
+QUIZ_VERSION_TTL = float(os.getenv('QUIZ_VERSION_TTL', 5))  # seconds another worker's edit can go unseen
+SCHEDULED_WINDOW_CACHE = timedelta(minutes=int(os.getenv('QUIZ_WINDOW_CACHE_MINUTES', 15)))
+
+# Per-worker cache of quiz documents used on the quiz start path, and of the
+# (is_active, updated_at) stamp each cached copy is checked against
+_quiz_cache = TTLCache(ttl=QUIZ_CACHE_TTL, max_entries=512)
+_quiz_versions = TTLCache(ttl=QUIZ_VERSION_TTL, max_entries=512)
+
+def parse_datetime(value):
+    """Parse an ISO-8601 string (or pass through a datetime); empty values become None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Stored datetimes are naive UTC
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+def normalize_answer(value):
+    """Normalize an answer so equivalent values compare equal"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value if value else None
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+class AnswerKey:
+    """Compiled answer key: correct answers encoded as integers plus a marks array"""
+    def __init__(self, answer_key, question_count):
+        self.question_count = question_count
+        self.vocabulary = {}
+        self.answers = np.full(question_count, NO_KEY, dtype=np.int32)
+        self.marks = np.zeros(question_count, dtype=np.float64)
+        
+        for i in range(question_count):
+            entry = answer_key.get(str(i), {}) or {}
+            try:
+                self.marks[i] = float(entry.get('marks', 1))
+            except (TypeError, ValueError):
+                self.marks[i] = 1
+            
+            correct_answer = normalize_answer(entry.get('correct_answer'))
+            if correct_answer is not None:
+                self.answers[i] = self.vocabulary.setdefault(correct_answer, len(self.vocabulary))
+
+    def encode(self, answers):
+        """Encode a list of answers into an integer array aligned with the key"""
+        codes = np.full(self.question_count, NO_ANSWER, dtype=np.int32)
+        for i, answer in enumerate((answers or [])[:self.question_count]):
+            normalized = normalize_answer(answer)
+            if normalized is not None:
+                codes[i] = self.vocabulary.get(normalized, UNKNOWN_ANSWER)
+        return codes
+
+    def encode_many(self, answer_sets):
+        """Encode several attempts into an (attempts x questions) matrix"""
+        matrix = np.full((len(answer_sets), self.question_count), NO_ANSWER, dtype=np.int32)
+        for row, answers in enumerate(answer_sets):
+            matrix[row] = self.encode(answers)
+        return matrix
+
+    def grade(self, answers):
+        """Grade a single attempt in one vectorized pass"""
+        return float(np.dot(self.encode(answers) == self.answers, self.marks))
+
+    def grade_many(self, answer_sets):
+        """Grade many attempts at once as a matrix-vector product"""
+        if not answer_sets:
+            return np.zeros(0, dtype=np.float64)
+        return (self.encode_many(answer_sets) == self.answers) @ self.marks
+
+def _as_score(value):
+    """Return whole-number scores as ints to keep stored values unchanged"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
 class Quiz:
     def __init__(self, quiz_data):
         self.id = str(quiz_data.get('_id'))
@@ -24,6 +123,8 @@ class Quiz:
         self.answer_key = quiz_data.get('answer_key', {})  # Store answer key separately
         self.allow_image_questions = quiz_data.get('allow_image_questions', True)
         self.allow_image_answers = quiz_data.get('allow_image_answers', True)
+        self.scheduled_at = quiz_data.get('scheduled_at')  # start of a scheduled exam window
+        self._compiled_key = None
 
     @staticmethod
     def create_quiz(quiz_data):
@@ -60,6 +161,7 @@ class Quiz:
             "is_active": quiz_data.get('is_active', True),
             "allow_image_questions": quiz_data.get('allow_image_questions', True),
             "allow_image_answers": quiz_data.get('allow_image_answers', True),
+            "scheduled_at": parse_datetime(quiz_data.get('scheduled_at')),
             "created_by": quiz_data['created_by'],
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
@@ -104,6 +206,76 @@ class Quiz:
         quiz = db.quizzes.find_one({"_id": ObjectId(quiz_id)})
         return Quiz(quiz) if quiz else None
 
+    @staticmethod
+    def get_cached(quiz_id):
+        """Get quiz by ID through the per-worker quiz cache.
+
+        Edits only clear the cache of the worker that made them, so the cached
+        copy is compared with the quiz's current is_active/updated_at (a small
+        read, itself cached for QUIZ_VERSION_TTL) and reloaded when they differ.
+        """
+        db = get_db()
+        version = _quiz_versions.get(quiz_id)
+        if version is None:
+            stamp = db.quizzes.find_one({"_id": ObjectId(quiz_id)}, {"is_active": 1, "updated_at": 1})
+            if not stamp:
+                _quiz_cache.delete(quiz_id)
+                return None
+            version = (stamp.get('is_active'), stamp.get('updated_at'))
+            _quiz_versions.set(quiz_id, version)
+        
+        quiz_data = _quiz_cache.get(quiz_id)
+        if quiz_data is None or (quiz_data.get('is_active'), quiz_data.get('updated_at')) != version:
+            quiz_data = db.quizzes.find_one({"_id": ObjectId(quiz_id)})
+            if not quiz_data:
+                return None
+            _quiz_cache.set(quiz_id, quiz_data)
+        return Quiz(quiz_data)
+
+    @staticmethod
+    def uncache(quiz_id):
+        """Drop a quiz from this worker's cache after an edit"""
+        _quiz_cache.delete(quiz_id)
+        _quiz_versions.delete(quiz_id)
+
+    @staticmethod
+    def prewarm_scheduled(lead_time):
+        """Load quizzes whose scheduled window starts within lead_time into the cache"""
+        db = get_db()
+        now = datetime.utcnow()
+        quizzes = db.quizzes.find({
+            "is_active": True,
+            "scheduled_at": {"$gte": now - SCHEDULED_WINDOW_CACHE, "$lte": now + lead_time}
+        })
+        
+        warmed = 0
+        for quiz_data in quizzes:
+            # Keep the quiz cached until the window has been open for a while
+            ttl = (quiz_data['scheduled_at'] + SCHEDULED_WINDOW_CACHE - now).total_seconds()
+            _quiz_cache.set(str(quiz_data['_id']), quiz_data, ttl=max(ttl, QUIZ_CACHE_TTL))
+            warmed += 1
+        return warmed
+
+    @staticmethod
+    def get_summaries(quiz_ids):
+        """Get title and category for several quizzes in a single query"""
+        db = get_db()
+        object_ids = [ObjectId(quiz_id) for quiz_id in quiz_ids if quiz_id and ObjectId.is_valid(quiz_id)]
+        if not object_ids:
+            return {}
+        
+        quizzes = db.quizzes.find(
+            {"_id": {"$in": object_ids}},
+            {"title": 1, "category": 1}
+        )
+        return {
+            str(quiz['_id']): {
+                'title': quiz.get('title'),
+                'category': quiz.get('category', 'General')
+            }
+            for quiz in quizzes
+        }
+
     @staticmethod
     def get_active_quizzes():
         """Get all active quizzes"""
@@ -112,11 +284,11 @@ class Quiz:
         return [Quiz(quiz) for quiz in quizzes]
 
     @staticmethod
-    def get_all_quizzes():
-        """Get all quizzes (for admin)"""
+    def get_quizzes_page(limit=None, cursor=None):
+        """One page of quizzes (for admin), oldest first; returns (quizzes, next_cursor)"""
         db = get_db()
-        quizzes = list(db.quizzes.find({}))
-        return [Quiz(quiz) for quiz in quizzes]
+        quizzes, next_cursor = paginate(db.quizzes, sort=[("_id", 1)], limit=limit, cursor=cursor)
+        return [Quiz(quiz) for quiz in quizzes], next_cursor
 
     @staticmethod
     def get_quizzes_by_category(category):
@@ -138,11 +310,14 @@ class Quiz:
         allowed_fields = [
             'title', 'description', 'category', 'difficulty', 
             'time_limit', 'total_marks', 'questions', 'is_active',
-            'allow_image_questions', 'allow_image_answers'
+            'allow_image_questions', 'allow_image_answers', 'scheduled_at'
         ]
         update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
         update_fields['updated_at'] = datetime.utcnow()
         
+        if 'scheduled_at' in update_fields:
+            update_fields['scheduled_at'] = parse_datetime(update_fields['scheduled_at'])
+        
         # Process questions and update answer key if questions are updated
         if 'questions' in update_fields:
             questions = update_fields['questions']
@@ -168,6 +343,7 @@ class Quiz:
                 {"_id": ObjectId(self.id)},
                 {"$set": update_fields}
             )
+            Quiz.uncache(self.id)
             return True
         return False
 
@@ -175,6 +351,7 @@ class Quiz:
         """Delete quiz"""
         db = get_db()
         db.quizzes.delete_one({"_id": ObjectId(self.id)})
+        Quiz.uncache(self.id)
         return True
 
     def deactivate_quiz(self):
@@ -184,6 +361,7 @@ class Quiz:
             {"_id": ObjectId(self.id)},
             {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
         )
+        Quiz.uncache(self.id)
         self.is_active = False
 
     def activate_quiz(self):
@@ -193,6 +371,7 @@ class Quiz:
             {"_id": ObjectId(self.id)},
             {"$set": {"is_active": True, "updated_at": datetime.utcnow()}}
         )
+        Quiz.uncache(self.id)
         self.is_active = True
 
     def increment_attempts(self):
@@ -215,31 +394,117 @@ class Quiz:
         )
         self.average_score = new_average
 
+    @property
+    def compiled_key(self):
+        """Answer key compiled for vectorized grading (built once per instance)"""
+        if self._compiled_key is None:
+            self._compiled_key = AnswerKey(self.answer_key, len(self.questions))
+        return self._compiled_key
+
+    def score_to_percentage(self, score):
+        """Convert a raw score to a percentage of the quiz total marks"""
+        return (score / self.total_marks) * 100 if self.total_marks > 0 else 0
+
     def calculate_score(self, answers):
         """Calculate score based on answers"""
-        score = 0
-        total_questions = len(self.questions)
+        score = _as_score(self.compiled_key.grade(answers))
         
-        for i, question in enumerate(self.questions):
-            if i < len(answers):
-                user_answer = answers[i]
-                correct_answer_data = self.answer_key.get(str(i), {})
-                correct_answer = correct_answer_data.get('correct_answer')
-                marks = correct_answer_data.get('marks', 1)
-                
-                # Check if answer is correct (supports both text and image answers)
-                if user_answer == correct_answer:
-                    score += marks
-        
-        # Convert to percentage
-        percentage = (score / self.total_marks) * 100 if self.total_marks > 0 else 0
         return {
             'score': score,
-            'total_questions': total_questions,
-            'percentage': percentage,
+            'total_questions': len(self.questions),
+            'percentage': self.score_to_percentage(score),
             'max_marks': self.total_marks
         }
 
+    def regrade_attempts(self, progress=None):
+        """Re-grade every completed attempt against the current answer key.
+
+        `progress(attempts_regraded)` is called after every batch and every
+        REGRADE_BATCH_SIZE users so a background job can report a heartbeat.
+        """
+        db = get_db()
+        key = self.compiled_key
+        
+        cursor = db.quiz_attempts.find(
+            {"quiz_id": self.id, "status": "completed"},
+            {"answers": 1, "user_id": 1, "score": 1, "percentage": 1, "created_at": 1, "completed_at": 1}
+        ).batch_size(REGRADE_BATCH_SIZE)
+        
+        summary = {'attempts_regraded': 0, 'attempts_changed': 0, 'users_affected': 0, 'history_unmatched': 0}
+        regraded_users = {}  # user_id -> {attempt_id: {'old', 'new', 'completed_at'}}
+        rollup_deltas = {}  # hour the attempt started in -> change in percentage
+        batch = []
+        
+        def flush(batch):
+            scores = key.grade_many([attempt.get('answers') or [] for attempt in batch])
+            attempt_updates = []
+            
+            for attempt, raw_score in zip(batch, scores):
+                score = _as_score(raw_score)
+                percentage = self.score_to_percentage(score)
+                summary['attempts_regraded'] += 1
+                
+                if attempt.get('score') == score:
+                    continue
+                
+                summary['attempts_changed'] += 1
+                created_at = attempt.get('created_at')
+                if created_at:
+                    hour = created_at.replace(minute=0, second=0, microsecond=0)
+                    rollup_deltas[hour] = rollup_deltas.get(hour, 0) + percentage - (attempt.get('percentage') or 0)
+                attempt_updates.append(UpdateOne(
+                    {"_id": attempt['_id']},
+                    {"$set": {"score": score, "percentage": percentage, "regraded_at": datetime.utcnow()}}
+                ))
+                
+                user_id = attempt.get('user_id')
+                if user_id and ObjectId.is_valid(user_id):
+                    regraded_users.setdefault(user_id, {})[str(attempt['_id'])] = {
+                        'old': attempt.get('percentage'),
+                        'new': percentage,
+                        'completed_at': attempt.get('completed_at')
+                    }
+            
+            if attempt_updates:
+                db.quiz_attempts.bulk_write(attempt_updates, ordered=False)
+            if progress:
+                progress(summary['attempts_regraded'])
+        
+        for attempt in cursor:
+            batch.append(attempt)
+            if len(batch) >= REGRADE_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        
+        for hour, delta in rollup_deltas.items():
+            DailyRollup.adjust_quiz_score(hour, delta)
+        
+        # Correct each affected user's history and recompute iq_score / badge_level
+        from models.user import User
+        for count, (user_id, regraded) in enumerate(regraded_users.items(), start=1):
+            updated, unmatched = User.apply_regrade(user_id, regraded)
+            summary['users_affected'] += int(updated)
+            summary['history_unmatched'] += unmatched
+            if progress and count % REGRADE_BATCH_SIZE == 0:
+                progress(summary['attempts_regraded'])
+        
+        # Refresh quiz average from the regraded attempts
+        average = list(db.quiz_attempts.aggregate([
+            {"$match": {"quiz_id": self.id, "status": "completed"}},
+            {"$group": {"_id": None, "avg": {"$avg": "$percentage"}}}
+        ]))
+        if average:
+            self.average_score = average[0].get('avg') or 0
+            db.quizzes.update_one(
+                {"_id": ObjectId(self.id)},
+                {"$set": {"average_score": self.average_score}}
+            )
+        
+        summary['average_score'] = self.average_score
+        return summary
+
     def to_dict(self):
         """Convert quiz to dictionary (admin view with answer key)"""
         return {
@@ -255,6 +520,7 @@ class Quiz:
             "is_active": self.is_active,
             "allow_image_questions": self.allow_image_questions,
             "allow_image_answers": self.allow_image_answers,
+            "scheduled_at": self.scheduled_at.isoformat() if self.scheduled_at else None,
             "created_by": self.created_by,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
@@ -0,0 +1,103 @@
+from models.database import get_db
+from models.rollup import DailyRollup
+from services.pagination import paginate
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+class QuizAttempt:
+    """Lifecycle helpers for documents in the quiz_attempts collection"""
+
+    @staticmethod
+    def day_key(moment=None):
+        """UTC calendar day an attempt belongs to, e.g. '2024-05-31'"""
+        return (moment or datetime.utcnow()).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def start(user_id, quiz_id):
+        """Create an in-progress attempt, at most one per user, quiz and day"""
+        db = get_db()
+        now = datetime.utcnow()
+
+        attempt_data = {
+            "user_id": user_id,
+            "quiz_id": quiz_id,
+            "day": QuizAttempt.day_key(now),
+            "created_at": now,
+            "started_at": now,
+            "status": "in_progress",
+            "answers": [],
+            "score": 0,
+            "time_taken": 0
+        }
+
+        try:
+            result = db.quiz_attempts.insert_one(attempt_data)
+        except DuplicateKeyError:
+            # The unique (user_id, quiz_id, day) index enforces one attempt per day
+            raise ValueError('You have already attempted this quiz today')
+
+        DailyRollup.record_quiz_attempt(now)
+        return str(result.inserted_id)
+
+    @staticmethod
+    def get_today(user_id, quiz_id):
+        """Get the user's attempt at a quiz for the current day, if any"""
+        db = get_db()
+        return db.quiz_attempts.find_one({
+            "user_id": user_id,
+            "quiz_id": quiz_id,
+            "day": QuizAttempt.day_key()
+        })
+
+    @staticmethod
+    def get_in_progress(attempt_id, user_id, quiz_id):
+        """Get an attempt that can still be submitted"""
+        db = get_db()
+        return db.quiz_attempts.find_one({
+            "_id": ObjectId(attempt_id),
+            "user_id": user_id,
+            "quiz_id": quiz_id,
+            "status": "in_progress"
+        })
+
+    @staticmethod
+    def complete(attempt_id, answers, score_result, time_taken):
+        """Mark an attempt as completed with its graded result"""
+        db = get_db()
+        attempt = db.quiz_attempts.find_one_and_update(
+            {"_id": ObjectId(attempt_id)},
+            {
+                "$set": {
+                    "answers": answers,
+                    "score": score_result['score'],
+                    "percentage": score_result['percentage'],
+                    "time_taken": time_taken,
+                    "completed_at": datetime.utcnow(),
+                    "status": "completed"
+                }
+            },
+            projection={"created_at": 1}
+        )
+
+        if attempt and attempt.get('created_at'):
+            DailyRollup.record_quiz_score(attempt['created_at'], score_result['percentage'])
+
+    @staticmethod
+    def get_user_attempts(user_id, limit=None, cursor=None):
+        """One page of a user's attempts, newest first, with quiz titles joined in one query"""
+        from models.quiz import Quiz
+
+        db = get_db()
+        attempts, next_cursor = paginate(db.quiz_attempts, {"user_id": user_id},
+                                         sort=[("created_at", -1), ("_id", -1)], limit=limit, cursor=cursor)
+        summaries = Quiz.get_summaries({attempt.get('quiz_id') for attempt in attempts})
+
+        for attempt in attempts:
+            attempt['_id'] = str(attempt['_id'])
+            summary = summaries.get(attempt.get('quiz_id'))
+            if summary:
+                attempt['quiz_title'] = summary['title']
+                attempt['quiz_category'] = summary['category']
+
+        return attempts, next_cursor
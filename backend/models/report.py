@@ -0,0 +1,201 @@
+from models.database import get_db
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+import os
+
+# Report type -> export it is generated from (see services/exports.py)
+REPORT_TYPES = {
+    'users': 'users',
+    'user_analytics': 'users',
+    'quiz_results': 'quiz_results',
+    'performance': 'quiz_results',
+    'iq_analytics': 'iq_analytics'
+}
+REPORT_FORMATS = {'xlsx': 'xlsx', 'excel': 'xlsx', 'csv': 'csv'}
+
+# Jobs that run on the report workers but produce a result summary instead of a file
+JOB_TYPES = {'quiz_regrade'}
+
+class Report:
+    """Report jobs in the reports collection, which doubles as the job queue.
+
+    Besides exports it carries JOB_TYPES jobs (e.g. quiz regrades) that are
+    too heavy to run inside a request.
+
+    Status moves queued -> running -> completed/failed; a running job whose
+    heartbeat stops is put back in the queue.
+    """
+
+    @staticmethod
+    def create(name, report_type, report_format, created_by):
+        """Queue a report job"""
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f'Invalid report type: {report_type}')
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f'Invalid report format: {report_format}')
+
+        db = get_db()
+        now = datetime.utcnow()
+        report_doc = {
+            "name": name,
+            "type": report_type,
+            "format": REPORT_FORMATS[report_format],
+            "status": "queued",
+            "progress": 0,
+            "rows_written": 0,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = db.reports.insert_one(report_doc)
+        return str(result.inserted_id)
+
+    @staticmethod
+    def create_job(name, job_type, params, created_by):
+        """Queue a non-export job; its summary is stored in `result` when it completes"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f'Invalid job type: {job_type}')
+
+        db = get_db()
+        now = datetime.utcnow()
+        job_doc = {
+            "name": name,
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "progress": 0,
+            "rows_written": 0,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = db.reports.insert_one(job_doc)
+        return str(result.inserted_id)
+
+    @staticmethod
+    def get(report_id):
+        db = get_db()
+        if not ObjectId.is_valid(report_id):
+            return None
+        return db.reports.find_one({"_id": ObjectId(report_id)})
+
+    @staticmethod
+    def list_recent(limit=50):
+        """Newest report jobs first"""
+        db = get_db()
+        return list(db.reports.find().sort("created_at", -1).limit(limit))
+
+    @staticmethod
+    def claim_next(worker_id):
+        """Atomically take the oldest queued job"""
+        db = get_db()
+        now = datetime.utcnow()
+        return db.reports.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "worker": worker_id, "started_at": now, "updated_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    def update_progress(report_id, rows_written, progress):
+        """Record progress; doubles as the job heartbeat"""
+        db = get_db()
+        db.reports.update_one(
+            {"_id": ObjectId(report_id), "status": "running"},
+            {"$set": {"rows_written": rows_written, "progress": progress, "updated_at": datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def complete(report_id, file_path, rows_written):
+        db = get_db()
+        now = datetime.utcnow()
+        db.reports.update_one(
+            {"_id": ObjectId(report_id)},
+            {"$set": {
+                "status": "completed",
+                "progress": 100,
+                "rows_written": rows_written,
+                "file_path": file_path,
+                "file_size": os.path.getsize(file_path),
+                "completed_at": now,
+                "updated_at": now
+            }}
+        )
+
+    @staticmethod
+    def complete_job(report_id, result, rows_written):
+        db = get_db()
+        now = datetime.utcnow()
+        db.reports.update_one(
+            {"_id": ObjectId(report_id)},
+            {"$set": {
+                "status": "completed",
+                "progress": 100,
+                "rows_written": rows_written,
+                "result": result,
+                "completed_at": now,
+                "updated_at": now
+            }}
+        )
+
+    @staticmethod
+    def fail(report_id, error):
+        db = get_db()
+        db.reports.update_one(
+            {"_id": ObjectId(report_id)},
+            {"$set": {"status": "failed", "error": error, "updated_at": datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def requeue_stale(stale_after):
+        """Put running jobs whose worker stopped reporting back in the queue"""
+        db = get_db()
+        result = db.reports.update_many(
+            {"status": "running", "updated_at": {"$lt": datetime.utcnow() - stale_after}},
+            {"$set": {"status": "queued", "progress": 0, "rows_written": 0}, "$unset": {"worker": ""}}
+        )
+        return result.modified_count
+
+    @staticmethod
+    def delete(report_id):
+        """Delete a report and its generated file"""
+        db = get_db()
+        report = db.reports.find_one_and_delete({"_id": ObjectId(report_id)})
+        if report and report.get('file_path') and os.path.exists(report['file_path']):
+            os.remove(report['file_path'])
+        return report is not None
+
+    @staticmethod
+    def delete_expired(retention_days):
+        """Remove finished reports (and files) older than the retention period"""
+        db = get_db()
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        expired = db.reports.find(
+            {"status": {"$in": ["completed", "failed"]}, "created_at": {"$lt": cutoff}},
+            {"_id": 1}
+        )
+        removed = 0
+        for report in expired:
+            if Report.delete(str(report['_id'])):
+                removed += 1
+        return removed
+
+    @staticmethod
+    def to_dict(report):
+        return {
+            "id": str(report['_id']),
+            "name": report.get('name'),
+            "type": report.get('type'),
+            "format": report.get('format'),
+            "status": report.get('status'),
+            "progress": report.get('progress', 0),
+            "rows_written": report.get('rows_written', 0),
+            "file_size": report.get('file_size'),
+            "error": report.get('error'),
+            "result": report.get('result'),
+            "created_by": report.get('created_by'),
+            "created_at": report['created_at'].isoformat() if report.get('created_at') else None,
+            "completed_at": report['completed_at'].isoformat() if report.get('completed_at') else None
+        }
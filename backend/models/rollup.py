@@ -0,0 +1,181 @@
+from models.database import get_db
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+
+class DailyRollup:
+    """Per-day analytics counters in the daily_rollups collection, maintained as events happen.
+
+    One document per UTC day (_id 'YYYY-MM-DD') with day totals and per-hour
+    quiz counters; combined with the stored weekday this gives the hour-of-week grid.
+    """
+
+    @staticmethod
+    def day_key(moment):
+        return moment.strftime('%Y-%m-%d')
+
+    @staticmethod
+    def day_of_week(moment):
+        """Day of week numbered like MongoDB's $dayOfWeek (1 = Sunday ... 7 = Saturday)"""
+        return (moment.weekday() + 1) % 7 + 1
+
+    @staticmethod
+    def _increment(moment, counters):
+        """Apply $inc counters to the rollup document for moment's day"""
+        try:
+            db = get_db()
+            day = datetime(moment.year, moment.month, moment.day)
+            db.daily_rollups.update_one(
+                {"_id": DailyRollup.day_key(moment)},
+                {
+                    "$inc": counters,
+                    "$setOnInsert": {"date": day, "day_of_week": DailyRollup.day_of_week(moment)}
+                },
+                upsert=True
+            )
+        except Exception as e:
+            # Rollups are derived data; never fail the user-facing write because of them
+            print(f"Error updating daily rollup: {e}")
+
+    @staticmethod
+    def record_registration(created_at):
+        DailyRollup._increment(created_at, {"registrations": 1})
+
+    @staticmethod
+    def record_quiz_attempt(created_at):
+        DailyRollup._increment(created_at, {
+            "quiz_attempts": 1,
+            f"hours.{created_at.hour}.attempts": 1
+        })
+
+    @staticmethod
+    def record_quiz_score(created_at, percentage):
+        """Add a graded attempt's percentage to the day/hour it was started in"""
+        DailyRollup._increment(created_at, {
+            "quiz_score_sum": percentage,
+            "quiz_score_count": 1,
+            f"hours.{created_at.hour}.score_sum": percentage,
+            f"hours.{created_at.hour}.score_count": 1
+        })
+
+    @staticmethod
+    def adjust_quiz_score(created_at, delta):
+        """Shift the score total for attempts started in created_at's hour (used by regrades)"""
+        DailyRollup._increment(created_at, {
+            "quiz_score_sum": delta,
+            f"hours.{created_at.hour}.score_sum": delta
+        })
+
+    @staticmethod
+    def record_iq_score(date, iq_score):
+        DailyRollup._increment(date, {"iq_sum": iq_score, "iq_count": 1})
+
+    @staticmethod
+    def adjust_iq_score(date, delta):
+        """Shift the IQ total for the day of a re-scored history entry (used by regrades)"""
+        DailyRollup._increment(date, {"iq_sum": delta})
+
+    @staticmethod
+    def get_range(days=30):
+        """Rollup documents for the last `days` days, oldest first"""
+        db = get_db()
+        start_date = datetime.utcnow() - timedelta(days=days)
+        start_day = datetime(start_date.year, start_date.month, start_date.day)
+        return list(db.daily_rollups.find({"date": {"$gte": start_day}}).sort("_id", 1))
+
+    @staticmethod
+    def backfill(days=30):
+        """Rebuild rollups for the `days` days before today from the raw collections"""
+        db = get_db()
+        # Today's document is still receiving live $inc updates; replacing it
+        # here could drop increments made while the backfill runs
+        now = datetime.utcnow()
+        end_date = datetime(now.year, now.month, now.day)
+        start_date = end_date - timedelta(days=days)
+        day_format = {"format": "%Y-%m-%d", "date": None}
+
+        rollups = {}
+        def rollup_for(day):
+            if day not in rollups:
+                date = datetime.strptime(day, '%Y-%m-%d')
+                rollups[day] = {
+                    "_id": day,
+                    "date": date,
+                    "day_of_week": DailyRollup.day_of_week(date),
+                    "registrations": 0,
+                    "quiz_attempts": 0,
+                    "quiz_score_sum": 0,
+                    "quiz_score_count": 0,
+                    "game_scores": 0,
+                    "iq_sum": 0,
+                    "iq_count": 0,
+                    "hours": {}
+                }
+            return rollups[day]
+
+        registrations = db.users.aggregate([
+            {"$match": {"created_at": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {"_id": {"$dateToString": dict(day_format, date="$created_at")}, "count": {"$sum": 1}}}
+        ])
+        for item in registrations:
+            rollup_for(item['_id'])['registrations'] = item['count']
+
+        attempts = db.quiz_attempts.aggregate([
+            {"$match": {"created_at": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateToString": dict(day_format, date="$created_at")},
+                    "hour": {"$hour": "$created_at"}
+                },
+                "attempts": {"$sum": 1},
+                "score_sum": {"$sum": {"$ifNull": ["$percentage", 0]}},
+                "score_count": {"$sum": {"$cond": [{"$gt": ["$percentage", None]}, 1, 0]}}
+            }}
+        ])
+        for item in attempts:
+            rollup = rollup_for(item['_id']['day'])
+            rollup['quiz_attempts'] += item['attempts']
+            rollup['quiz_score_sum'] += item['score_sum']
+            rollup['quiz_score_count'] += item['score_count']
+            rollup['hours'][str(item['_id']['hour'])] = {
+                "attempts": item['attempts'],
+                "score_sum": item['score_sum'],
+                "score_count": item['score_count']
+            }
+
+        game_scores = db.game_scores.aggregate([
+            {"$match": {"completed_at": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {"_id": {"$dateToString": dict(day_format, date="$completed_at")}, "count": {"$sum": 1}}}
+        ])
+        for item in game_scores:
+            rollup_for(item['_id'])['game_scores'] = item['count']
+
+        iq_scores = db.users.aggregate([
+            {"$match": {"performance_history.date": {"$gte": start_date}}},
+            {"$project": {"performance_history.date": 1, "performance_history.iq_score": 1}},
+            {"$unwind": "$performance_history"},
+            {"$match": {"performance_history.date": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {
+                "_id": {"$dateToString": dict(day_format, date="$performance_history.date")},
+                "iq_sum": {"$sum": "$performance_history.iq_score"},
+                "iq_count": {"$sum": 1}
+            }}
+        ])
+        for item in iq_scores:
+            rollup = rollup_for(item['_id'])
+            rollup['iq_sum'] = item['iq_sum']
+            rollup['iq_count'] = item['iq_count']
+
+        db.daily_rollups.delete_many({"date": {"$gte": start_date, "$lt": end_date}, "_id": {"$nin": list(rollups)}})
+        if rollups:
+            db.daily_rollups.bulk_write(
+                [ReplaceOne({"_id": day}, rollup, upsert=True) for day, rollup in rollups.items()],
+                ordered=False
+            )
+        return len(rollups)
+
+    @staticmethod
+    def ensure_backfilled(days=30):
+        """Build the initial rollups the first time the collection is empty"""
+        db = get_db()
+        if db.daily_rollups.estimated_document_count() == 0:
+            DailyRollup.backfill(days)
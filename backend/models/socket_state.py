@@ -0,0 +1,122 @@
+from models.database import get_db
+from datetime import datetime
+import os
+
+SOCKET_STATE_TTL_HOURS = int(os.getenv('SOCKET_STATE_TTL_HOURS', 24))
+
+class SocketState:
+    """Room membership and live game sessions shared by every Socket.IO worker.
+
+    Kept in Mongo so a client that reconnects to another worker (after a
+    worker is recycled or restarted) gets its rooms and game sessions back.
+    Entries untouched for SOCKET_STATE_TTL_HOURS expire through TTL indexes.
+    """
+
+    @staticmethod
+    def add_room(user_id, room):
+        try:
+            db = get_db()
+            db.socket_subscriptions.update_one(
+                {"_id": str(user_id)},
+                {"$addToSet": {"rooms": room}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error saving socket room: {e}")
+
+    @staticmethod
+    def remove_room(user_id, room):
+        try:
+            db = get_db()
+            db.socket_subscriptions.update_one(
+                {"_id": str(user_id)},
+                {"$pull": {"rooms": room}, "$set": {"updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"Error removing socket room: {e}")
+
+    @staticmethod
+    def save_game_session(session_id, user_id, game_id=None, level_id=None):
+        try:
+            db = get_db()
+            db.live_game_sessions.update_one(
+                {"_id": session_id},
+                {"$set": {
+                    "user_id": str(user_id) if user_id else None,
+                    "game_id": game_id,
+                    "level_id": level_id,
+                    "updated_at": datetime.utcnow()
+                }, "$setOnInsert": {"started_at": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error saving game session: {e}")
+
+    @staticmethod
+    def remove_game_session(session_id):
+        try:
+            db = get_db()
+            db.live_game_sessions.delete_one({"_id": session_id})
+        except Exception as e:
+            print(f"Error removing game session: {e}")
+
+    @staticmethod
+    def get_game_session(session_id):
+        db = get_db()
+        return db.live_game_sessions.find_one({"_id": session_id})
+
+    @staticmethod
+    def restore(user_id):
+        """Rooms and game sessions to rejoin when a user's socket connects; returns (rooms, sessions)"""
+        db = get_db()
+        user_id = str(user_id)
+        subscription = db.socket_subscriptions.find_one({"_id": user_id}, {"rooms": 1}) or {}
+        sessions = list(db.live_game_sessions.find({"user_id": user_id}))
+        return subscription.get('rooms', []), sessions
+
+    @staticmethod
+    def touch_game_sessions(session_ids):
+        """Mark game sessions held by live sockets as still in use"""
+        if not session_ids:
+            return
+        try:
+            db = get_db()
+            db.live_game_sessions.update_many(
+                {"_id": {"$in": list(session_ids)}},
+                {"$set": {"updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"Error refreshing game sessions: {e}")
+
+    @staticmethod
+    def reap_game_sessions(before):
+        """Delete game sessions no worker has refreshed since before; returns the count removed"""
+        db = get_db()
+        return db.live_game_sessions.delete_many({"updated_at": {"$lt": before}}).deleted_count
+
+    @staticmethod
+    def publish_presence(worker_id, sockets, users, rooms):
+        """Store one worker's online counts; rooms is a list of {'room', 'users'}"""
+        try:
+            db = get_db()
+            db.socket_presence.replace_one(
+                {"_id": worker_id},
+                {"sockets": sockets, "users": users, "rooms": rooms, "updated_at": datetime.utcnow()},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error publishing presence: {e}")
+
+    @staticmethod
+    def remove_presence(worker_id):
+        try:
+            db = get_db()
+            db.socket_presence.delete_one({"_id": worker_id})
+        except Exception as e:
+            print(f"Error removing presence: {e}")
+
+    @staticmethod
+    def get_presence(since):
+        """Counts published by workers that are still reporting"""
+        db = get_db()
+        return list(db.socket_presence.find({"updated_at": {"$gte": since}}))
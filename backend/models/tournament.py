@@ -1,6 +1,8 @@
 from models.database import get_db
+from services.pagination import paginate
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 import random
 import math
 
@@ -26,6 +28,7 @@ class Tournament:
         self.created_by = str(tournament_data.get('created_by'))
         self.created_at = tournament_data.get('created_at', datetime.utcnow())
         self.updated_at = tournament_data.get('updated_at', datetime.utcnow())
+        self.version = tournament_data.get('version', 0)  # bumped on every bracket change
 
     @staticmethod
     def create_tournament(tournament_data):
@@ -46,7 +49,8 @@ class Tournament:
             'current_participants': 0,
             'brackets': [],
             'matches': [],
-            'participants': []
+            'participants': [],
+            'version': 0
         })
         
         result = db.tournaments.insert_one(tournament_data)
@@ -61,6 +65,13 @@ class Tournament:
         tournaments_data = db.tournaments.find().sort('created_at', -1)
         return [Tournament(tournament_data) for tournament_data in tournaments_data]
 
+    @staticmethod
+    def get_tournaments_page(limit=None, cursor=None):
+        """One page of tournaments, newest first; returns (tournaments, next_cursor)"""
+        db = get_db()
+        tournaments_data, next_cursor = paginate(db.tournaments, sort=[('created_at', -1), ('_id', -1)], limit=limit, cursor=cursor)
+        return [Tournament(tournament_data) for tournament_data in tournaments_data], next_cursor
+
     @staticmethod
     def get_active_tournaments():
         """Get active tournaments"""
@@ -140,12 +151,14 @@ class Tournament:
                     'brackets': brackets,
                     'start_date': datetime.utcnow(),
                     'updated_at': datetime.utcnow()
-                }
+                },
+                '$inc': {'version': 1}
             }
         )
         
         self.status = 'active'
         self.brackets = brackets
+        self.version += 1
         self.start_date = datetime.utcnow()
 
     def generate_single_elimination_brackets(self):
@@ -245,36 +258,114 @@ class Tournament:
         
         return brackets
 
+    def find_match(self, match_id):
+        """(bracket index, match index) of a match, or None"""
+        for bracket_index, bracket in enumerate(self.brackets):
+            for match_index, match in enumerate(bracket['matches']):
+                if match['match_id'] == match_id:
+                    return bracket_index, match_index
+        return None
+
     def update_match_result(self, match_id, winner_id, player1_score, player2_score):
-        """Update match result and advance tournament"""
+        """Record a match result and advance the tournament; returns the room delta, or None if no such match"""
         db = get_db()
+        position = self.find_match(match_id)
+        if not position:
+            return None
         
-        # Find and update the match
-        for bracket in self.brackets:
-            for match in bracket['matches']:
-                if match['match_id'] == match_id:
-                    match['winner_id'] = winner_id
-                    match['status'] = 'completed'
-                    match['completed_time'] = datetime.utcnow()
-                    match['player1_score'] = player1_score
-                    match['player2_score'] = player2_score
-                    
-                    # Update tournament in database
-                    db.tournaments.update_one(
-                        {'_id': ObjectId(self.id)},
-                        {
-                            '$set': {
-                                'brackets': self.brackets,
-                                'updated_at': datetime.utcnow()
-                            }
-                        }
-                    )
-                    
-                    # Check if tournament is complete
-                    self.check_tournament_completion()
-                    return True
+        # Only the one match is written; the returned brackets include concurrent results
+        path = f'brackets.{position[0]}.matches.{position[1]}'
+        now = datetime.utcnow()
+        updated = db.tournaments.find_one_and_update(
+            {'_id': ObjectId(self.id), f'{path}.match_id': match_id},
+            {
+                '$set': {
+                    f'{path}.winner_id': winner_id,
+                    f'{path}.status': 'completed',
+                    f'{path}.completed_time': now,
+                    f'{path}.player1_score': player1_score,
+                    f'{path}.player2_score': player2_score,
+                    'updated_at': now
+                },
+                '$inc': {'version': 1}
+            },
+            projection={'brackets': 1, 'version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            return None
+        
+        self.brackets = updated['brackets']
+        self.version = updated['version']
+        self.updated_at = now
+        base_version = self.version - 1
+        match = self.brackets[position[0]]['matches'][position[1]]
         
-        return False
+        advanced, new_matches = self.advance_round(position[0])
+        self.check_tournament_completion()
+        
+        return {
+            'tournament_id': self.id,
+            'base_version': base_version,
+            'version': self.version,
+            'match': match,
+            'advanced': advanced,
+            'new_matches': new_matches,
+            'progress': self.get_tournament_progress(),
+            'status': self.status,
+            'winner_id': self.winner_id
+        }
+
+    def advance_round(self, bracket_index):
+        """Open the next elimination round once every match of the latest round is decided"""
+        if self.tournament_type == 'round_robin' or bracket_index != len(self.brackets) - 1:
+            return [], []
+        
+        matches = self.brackets[bracket_index]['matches']
+        if any(match['status'] != 'completed' or not match['winner_id'] for match in matches):
+            return [], []
+        
+        winners = [match['winner_id'] for match in matches if match['winner_id'] != 'bye']
+        if len(winners) < 2:
+            return [], []
+        
+        round_num = self.brackets[bracket_index]['round'] + 1
+        new_matches = []
+        for i in range(0, len(winners), 2):
+            match = {
+                'match_id': f'round_{round_num}_match_{i//2}',
+                'round': round_num,
+                'player1_id': winners[i],
+                'player2_id': winners[i + 1] if i + 1 < len(winners) else 'bye',
+                'winner_id': None,
+                'status': 'pending',
+                'scheduled_time': None,
+                'completed_time': None,
+                'player1_score': 0,
+                'player2_score': 0
+            }
+            if match['player2_id'] == 'bye':
+                match.update({'winner_id': winners[i], 'status': 'completed', 'completed_time': datetime.utcnow(), 'player1_score': 1})
+            new_matches.append(match)
+        
+        # Guarded on the round count so concurrent final results open the round only once
+        db = get_db()
+        updated = db.tournaments.find_one_and_update(
+            {'_id': ObjectId(self.id), f'brackets.{len(self.brackets)}': {'$exists': False}},
+            {
+                '$push': {'brackets': {'round': round_num, 'matches': new_matches}},
+                '$set': {'updated_at': datetime.utcnow()},
+                '$inc': {'version': 1}
+            },
+            projection={'version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated:
+            return [], []
+        
+        self.brackets.append({'round': round_num, 'matches': new_matches})
+        self.version = updated['version']
+        return winners, new_matches
 
     def check_tournament_completion(self):
         """Check if tournament is complete and set winner"""
@@ -287,17 +378,22 @@ class Tournament:
                 final_match = final_bracket['matches'][0]
                 if final_match['status'] == 'completed' and final_match['winner_id']:
                     # Tournament complete
-                    db.tournaments.update_one(
-                        {'_id': ObjectId(self.id)},
+                    updated = db.tournaments.find_one_and_update(
+                        {'_id': ObjectId(self.id), 'status': {'$ne': 'completed'}},
                         {
                             '$set': {
                                 'status': 'completed',
                                 'winner_id': ObjectId(final_match['winner_id']),
                                 'end_date': datetime.utcnow(),
                                 'updated_at': datetime.utcnow()
-                            }
-                        }
+                            },
+                            '$inc': {'version': 1}
+                        },
+                        projection={'version': 1},
+                        return_document=ReturnDocument.AFTER
                     )
+                    if updated:
+                        self.version = updated['version']
                     self.status = 'completed'
                     self.winner_id = final_match['winner_id']
                     self.end_date = datetime.utcnow()
@@ -346,5 +442,6 @@ class Tournament:
             'winner_id': self.winner_id,
             'created_by': self.created_by,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         } 
\ No newline at end of file
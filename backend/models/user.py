@@ -1,9 +1,33 @@
 from models.database import get_db
+from models.rollup import DailyRollup
+from models.activity import Activity
+from services.pagination import paginate
 import bcrypt
 from datetime import datetime
 from bson import ObjectId
+from pymongo import UpdateOne
 import re
 
+REGRADE_RETRIES = 3        # re-reads when a user's history changes during a regrade
+LEGACY_ENTRY_WINDOW = 300  # seconds between an attempt's completion and its unlinked history entry
+
+# Lowercased copies of these fields (e.g. username_lower) back case-insensitive prefix search
+SEARCH_FIELDS = ('username', 'email', 'name')
+
+# sort option -> stored field; every one is set on every user so keyset pages stay stable
+SEARCH_SORTS = {
+    'created_at': 'created_at',
+    'username': 'username_lower',
+    'email': 'email_lower',
+    'name': 'name_lower',
+    'iq_score': 'iq_score'
+}
+
+SEARCH_STATUSES = {
+    'active': True,
+    'suspended': False
+}
+
 class User:
     def __init__(self, user_data):
         self.id = str(user_data.get('_id'))
@@ -111,8 +135,11 @@ class User:
             "badge_level": "Bronze",
             "performance_history": []
         }
+        user_doc.update(User.search_keys(user_doc))
         
         result = db.users.insert_one(user_doc)
+        DailyRollup.record_registration(user_doc['created_at'])
+        Activity.record_registration(result.inserted_id, user_doc['name'], user_doc['created_at'])
         return str(result.inserted_id)
 
     @staticmethod
@@ -145,6 +172,34 @@ class User:
         user = db.users.find_one({"_id": ObjectId(user_id)})
         return User(user) if user else None
 
+    @staticmethod
+    def get_names(user_ids):
+        """Get display names for several users in a single query"""
+        db = get_db()
+        object_ids = [ObjectId(user_id) for user_id in user_ids if user_id and ObjectId.is_valid(user_id)]
+        if not object_ids:
+            return {}
+        
+        users = db.users.find({"_id": {"$in": object_ids}}, {"name": 1})
+        return {str(user['_id']): user.get('name') for user in users}
+
+    @staticmethod
+    def get_summaries(user_ids):
+        """Get name and username for several users in a single query"""
+        db = get_db()
+        object_ids = [ObjectId(user_id) for user_id in user_ids if user_id and ObjectId.is_valid(user_id)]
+        if not object_ids:
+            return {}
+        
+        users = db.users.find({"_id": {"$in": object_ids}}, {"name": 1, "username": 1})
+        return {
+            str(user['_id']): {
+                'name': user.get('name'),
+                'username': user.get('username')
+            }
+            for user in users
+        }
+
     @staticmethod
     def get_by_email(email):
         """Get user by email"""
@@ -160,11 +215,71 @@ class User:
         return User(user) if user else None
 
     @staticmethod
-    def get_all_users():
-        """Get all users (for admin)"""
+    def get_users_page(limit=None, cursor=None):
+        """One page of users (for admin), oldest first; returns (users, next_cursor)"""
         db = get_db()
-        users = list(db.users.find({}))
-        return [User(user) for user in users]
+        # List views never need the hash or the full score history
+        users, next_cursor = paginate(db.users, sort=[("_id", 1)], limit=limit, cursor=cursor,
+                                      projection={"password": 0, "performance_history": 0})
+        return [User(user) for user in users], next_cursor
+
+    @staticmethod
+    def search_keys(fields):
+        """Lowercased search fields for whichever of SEARCH_FIELDS are in `fields`"""
+        return {f"{field}_lower": (fields[field] or '').lower() for field in SEARCH_FIELDS if field in fields}
+
+    @staticmethod
+    def search(query=None, field=None, role=None, status=None, sort='created_at', order='desc', limit=None, cursor=None):
+        """Prefix search over username/email/name with role and status filters; returns (users, next_cursor)"""
+        if field and field not in SEARCH_FIELDS:
+            raise ValueError(f"Invalid search field: {field}")
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Invalid sort: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Invalid order: {order}")
+        if status and status not in SEARCH_STATUSES:
+            raise ValueError(f"Invalid status: {status}")
+
+        conditions = []
+        if query:
+            # Anchored, case-sensitive regexes on the lowercased fields become index range scans
+            prefix = {"$regex": f"^{re.escape(query.strip().lower())}"}
+            fields = [field] if field else SEARCH_FIELDS
+            conditions.append({"$or": [{f"{name}_lower": prefix} for name in fields]})
+        if role:
+            conditions.append({"role": role})
+        if status:
+            conditions.append({"is_active": SEARCH_STATUSES[status]})
+
+        filters = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+        direction = 1 if order == 'asc' else -1
+
+        db = get_db()
+        users, next_cursor = paginate(db.users, filters, sort=[(SEARCH_SORTS[sort], direction), ("_id", direction)],
+                                      limit=limit, cursor=cursor,
+                                      projection={"password": 0, "performance_history": 0})
+        return [User(user) for user in users], next_cursor
+
+    @staticmethod
+    def backfill_search_keys(batch_size=1000):
+        """Add lowercased search fields to users created before they existed"""
+        db = get_db()
+        missing = db.users.find(
+            {"$or": [{f"{field}_lower": {"$exists": False}} for field in SEARCH_FIELDS]},
+            {field: 1 for field in SEARCH_FIELDS}
+        )
+
+        updated = 0
+        batch = []
+        for user in missing:
+            keys = User.search_keys({field: user.get(field) for field in SEARCH_FIELDS})
+            batch.append(UpdateOne({"_id": user['_id']}, {"$set": keys}))
+            if len(batch) >= batch_size:
+                updated += db.users.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += db.users.bulk_write(batch, ordered=False).modified_count
+        return updated
 
     @staticmethod
     def get_active_users():
@@ -182,7 +297,7 @@ class User:
         if update_fields:
             db.users.update_one(
                 {"_id": ObjectId(self.id)},
-                {"$set": update_fields}
+                {"$set": dict(update_fields, **User.search_keys(update_fields))}
             )
             return True
         return False
@@ -224,7 +339,7 @@ class User:
             
             db.users.update_one(
                 {"_id": ObjectId(self.id)},
-                {"$set": update_fields}
+                {"$set": dict(update_fields, **User.search_keys(update_fields))}
             )
             
             # Update instance attributes
@@ -234,16 +349,15 @@ class User:
             return True
         return False
 
-    def update_iq_score(self, new_score, quiz_difficulty='Medium', user_age=18):
-        """Update user's IQ score using proper calculation formula"""
-        db = get_db()
-        
+    @staticmethod
+    def calculate_iq(new_score, previous_entries, quiz_difficulty='Medium', user_age=18):
+        """IQ score and z-score for a raw score, given the performance entries before it"""
         # Calculate IQ using proper formula
         # IQ = 100 + (15 * Z-score)
         # Z-score = (Raw Score - Mean) / Standard Deviation
         
-        # Get user's performance history for baseline calculation
-        performance_history = self.performance_history[-10:] if self.performance_history else []  # Last 10 attempts
+        # Baseline from the user's performance history
+        performance_history = previous_entries[-10:]  # Last 10 attempts
         
         if performance_history:
             # Calculate baseline from recent performance
@@ -285,6 +399,13 @@ class User:
         # Clamp IQ score to reasonable range (70-130 for most users, up to 160 for exceptional)
         iq_score = max(70, min(160, iq_score))
         
+        return iq_score, z_score
+
+    def update_iq_score(self, new_score, quiz_difficulty='Medium', user_age=18, attempt_id=None):
+        """Update user's IQ score using proper calculation formula"""
+        db = get_db()
+        iq_score, z_score = User.calculate_iq(new_score, self.performance_history or [], quiz_difficulty, user_age)
+        
         # Update badge level based on IQ score
         badge_level = User.calculate_badge_level(iq_score)
         
@@ -298,6 +419,10 @@ class User:
             "z_score": z_score
         }
         
+        # Link the entry to its quiz attempt so regrades can correct it
+        if attempt_id:
+            performance_entry["attempt_id"] = str(attempt_id)
+        
         db.users.update_one(
             {"_id": ObjectId(self.id)},
             {
@@ -311,6 +436,8 @@ class User:
             }
         )
         
+        DailyRollup.record_iq_score(performance_entry['date'], iq_score)
+        
         # Update instance
         self.iq_score = iq_score
         self.badge_level = badge_level
@@ -318,6 +445,85 @@ class User:
         
         return iq_score
 
+    @staticmethod
+    def apply_regrade(user_id, regraded):
+        """Correct a user's performance history after a quiz regrade and recompute their IQ.
+
+        regraded maps attempt_id -> {'old', 'new', 'completed_at'} (percentages
+        before and after). Entries written before history was linked to attempts
+        are matched by their old score and completion time, then linked. Every
+        entry from the first corrected one on is re-scored, as are iq_score and
+        badge_level. Returns (updated, unmatched): whether the user changed and
+        how many regraded attempts had no history entry.
+        """
+        db = get_db()
+        for _ in range(REGRADE_RETRIES):
+            user = db.users.find_one({"_id": ObjectId(user_id)}, {"performance_history": 1})
+            if not user:
+                return False, len(regraded)
+            history = user.get('performance_history') or []
+            pending = dict(regraded)
+            changed = []
+            
+            for index, entry in enumerate(history):
+                change = pending.pop(entry.get('attempt_id'), None)
+                if change and entry.get('raw_score') != change['new']:
+                    entry['raw_score'] = change['new']
+                    changed.append(index)
+            for attempt_id, change in list(pending.items()):
+                index = User._unlinked_entry(history, change)
+                if index is not None:
+                    del pending[attempt_id]
+                    history[index].update(attempt_id=attempt_id, raw_score=change['new'])
+                    changed.append(index)
+            
+            if not changed:
+                return False, len(pending)
+            
+            # Each entry's IQ depends on the 10 before it, so replay from the first change
+            iq_deltas = []
+            for index in range(min(changed), len(history)):
+                entry = history[index]
+                iq_score, z_score = User.calculate_iq(entry.get('raw_score', 0), history[:index],
+                                                      entry.get('quiz_difficulty', 'Medium'))
+                iq_deltas.append((entry.get('date'), iq_score - (entry.get('iq_score') or 0)))
+                entry.update(iq_score=iq_score, z_score=z_score, badge_level=User.calculate_badge_level(iq_score))
+            
+            # Only write if no attempt was added to the history meanwhile
+            result = db.users.update_one(
+                {"_id": ObjectId(user_id), "performance_history": {"$size": len(history)}},
+                {"$set": {
+                    "performance_history": history,
+                    "iq_score": history[-1]['iq_score'],
+                    "badge_level": history[-1]['badge_level']
+                }}
+            )
+            if result.matched_count:
+                for date, delta in iq_deltas:
+                    if date and delta:
+                        DailyRollup.adjust_iq_score(date, delta)
+                return True, len(pending)
+        
+        print(f"Gave up regrading performance history for user {user_id}")
+        return False, len(regraded)
+
+    @staticmethod
+    def _unlinked_entry(history, change):
+        """Index of the history entry without an attempt_id that was written for a regraded attempt"""
+        completed_at = change.get('completed_at')
+        if not completed_at or change.get('old') is None:
+            return None
+        best, best_gap = None, LEGACY_ENTRY_WINDOW
+        for index, entry in enumerate(history):
+            if entry.get('attempt_id') or not entry.get('date'):
+                continue
+            if abs((entry.get('raw_score') or 0) - change['old']) > 1e-9:
+                continue
+            gap = abs((entry['date'] - completed_at).total_seconds())
+            if gap <= best_gap:
+                best, best_gap = index, gap
+        return best
+
     @staticmethod
     def calculate_badge_level(iq_score):
         """Calculate badge level based on IQ score"""
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from models.user import User
 from models.quiz import Quiz
 from models.game import Game
+from models.report import Report, REPORT_FORMATS
+from models.activity import Activity
+from services.exports import EXPORT_MIMETYPES
+from services.analytics_snapshot import get_snapshot, SnapshotUnavailable
+from services.dashboard_metrics import dashboard_metrics
+from services.pagination import page_args, pagination_info, InvalidCursor
+from routes.user_search import search_users_response
 from middleware.auth_middleware import admin_required, super_admin_required, get_current_user, protect_super_admin
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -12,9 +19,6 @@ admin_bp = Blueprint('admin', __name__)
 
 def get_analytics_data(time_range='week'):
     """Helper function to get analytics data for export"""
-    from models.database import get_db
-    db = get_db()
-    
     # Calculate date range
     end_date = datetime.utcnow()
     if time_range == 'week':
@@ -26,38 +30,34 @@ def get_analytics_data(time_range='week'):
     else:
         start_date = end_date - timedelta(days=7)
     
+    # Read from the columnar analytics snapshot instead of the live collections
+    snapshot = get_snapshot()
+    
     # Get user statistics
-    user_stats = list(db.users.aggregate([
-        {'$match': {'created_at': {'$gte': start_date, '$lte': end_date}}},
-        {'$group': {
+    user_stats = []
+    new_users = snapshot.since('users', 'created_at', start_date, end_date)
+    if new_users.any():
+        user_stats.append({
             '_id': None,
-            'total_users': {'$sum': 1},
-            'active_users': {'$sum': {'$cond': ['$is_active', 1, 0]}},
-            'avg_iq_score': {'$avg': '$iq_score'}
-        }}
-    ]))
+            'total_users': int(new_users.sum()),
+            'active_users': int((snapshot.column('users', 'is_active') & new_users).sum()),
+            'avg_iq_score': snapshot.mean('users', 'iq_score', new_users)
+        })
     
     # Get quiz statistics
-    quiz_stats = list(db.quiz_attempts.aggregate([
-        {'$match': {'created_at': {'$gte': start_date, '$lte': end_date}}},
-        {'$group': {
-            '_id': '$quiz_id',
-            'total_attempts': {'$sum': 1},
-            'avg_score': {'$avg': '$score'},
-            'max_score': {'$max': '$score'}
-        }}
-    ]))
+    recent_attempts = snapshot.since('attempts', 'created_at', start_date, end_date)
+    quiz_stats = [
+        {'_id': group['key'], 'total_attempts': group['count'], 'avg_score': group['avg'], 'max_score': group['max']}
+        for group in snapshot.group('attempts', 'quiz_id', 'score', recent_attempts)
+    ]
     
-    # Get game statistics
-    game_stats = list(db.game_scores.aggregate([
-        {'$match': {'created_at': {'$gte': start_date, '$lte': end_date}}},
-        {'$group': {
-            '_id': '$game_type',
-            'total_games': {'$sum': 1},
-            'avg_score': {'$avg': '$score'},
-            'max_score': {'$max': '$score'}
-        }}
-    ]))
+    # Get game statistics from completed game sessions
+    recent_sessions = snapshot.since('sessions', 'start_time', start_date, end_date)
+    recent_sessions &= snapshot.equals('sessions', 'status', 'completed')
+    game_stats = [
+        {'_id': group['key'], 'total_games': group['count'], 'avg_score': group['avg'], 'max_score': group['max']}
+        for group in snapshot.group('sessions', 'game_id', 'score', recent_sessions)
+    ]
     
     return {
         'user_stats': user_stats,
@@ -69,20 +69,33 @@ def get_analytics_data(time_range='week'):
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_all_users():
-    """Get all users (admin only)"""
+    """Get a page of users (admin only)"""
     try:
-        users = User.get_all_users()
+        limit, cursor = page_args()
+        users, next_cursor = User.get_users_page(limit, cursor)
         return jsonify({
             'success': True,
             'message': 'Users retrieved successfully',
-            'data': [user.to_dict() for user in users]
+            'data': [user.to_dict() for user in users],
+            'pagination': pagination_info(next_cursor)
         }), 200
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Failed to retrieve users: {str(e)}'
         }), 500
 
+@admin_bp.route('/users/search', methods=['GET'])
+@admin_required
+def search_users():
+    """Search users by username/email/name prefix, role and status (admin only)"""
+    return search_users_response()
+
 @admin_bp.route('/users/check-username', methods=['POST'])
 @admin_required
 def check_username_availability():
@@ -322,14 +335,21 @@ def toggle_user_status(user_id):
 @admin_bp.route('/quizzes', methods=['GET'])
 @admin_required
 def get_all_quizzes():
-    """Get all quizzes (admin only)"""
+    """Get a page of quizzes (admin only)"""
     try:
-        quizzes = Quiz.get_all_quizzes()
+        limit, cursor = page_args()
+        quizzes, next_cursor = Quiz.get_quizzes_page(limit, cursor)
         return jsonify({
             'success': True,
             'message': 'Quizzes retrieved successfully',
-            'data': [quiz.to_dict() for quiz in quizzes]
+            'data': [quiz.to_dict() for quiz in quizzes],
+            'pagination': pagination_info(next_cursor)
         }), 200
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -446,63 +466,53 @@ def toggle_quiz_status(quiz_id):
             'message': f'Failed to toggle quiz status: {str(e)}'
         }), 500
 
+@admin_bp.route('/quizzes/<quiz_id>/regrade', methods=['POST'])
+@admin_required
+def regrade_quiz(quiz_id):
+    """Queue a re-grade of all completed attempts against the current answer key (admin only)"""
+    try:
+        quiz = Quiz.get_by_id(quiz_id)
+        if not quiz:
+            return jsonify({
+                'success': False,
+                'message': 'Quiz not found'
+            }), 404
+        
+        # A report worker runs it; poll /reports/<report_id> for progress and the summary
+        current_user = get_current_user()
+        report_id = Report.create_job(f"Regrade: {quiz.title}", 'quiz_regrade', {'quiz_id': quiz_id}, current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Quiz regrade queued',
+            'data': {'report_id': report_id, 'status': 'queued'}
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to regrade quiz: {str(e)}'
+        }), 500
+
 # Dashboard Routes
 @admin_bp.route('/dashboard/stats', methods=['GET'])
 @admin_required
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        from models.database import get_db
-        db = get_db()
-        
-        # Get basic stats
-        total_users = db.users.count_documents({})
-        active_users = db.users.count_documents({"is_active": True})
-        total_quizzes = db.quizzes.count_documents({})
-        total_games = db.games.count_documents({}) if 'games' in db.list_collection_names() else 0
-        
-        # Calculate total attempts with error handling
-        try:
-            total_attempts_result = list(db.quizzes.aggregate([
-                {"$group": {"_id": None, "total": {"$sum": "$total_attempts"}}}
-            ]))
-            total_attempts = total_attempts_result[0].get('total', 0) if total_attempts_result else 0
-        except Exception:
-            total_attempts = 0
-        
-        # Calculate average IQ with error handling
-        try:
-            avg_iq_result = list(db.users.aggregate([
-                {"$group": {"_id": None, "avg_iq": {"$avg": "$iq_score"}}}
-            ]))
-            average_iq = round(avg_iq_result[0].get('avg_iq', 0), 1) if avg_iq_result else 0
-        except Exception:
-            average_iq = 0
-        
-        # Calculate average score with error handling
-        try:
-            avg_score_result = list(db.quizzes.aggregate([
-                {"$group": {"_id": None, "avg_score": {"$avg": "$average_score"}}}
-            ]))
-            average_score = round(avg_score_result[0].get('avg_score', 0), 1) if avg_score_result else 0
-        except Exception:
-            average_score = 0
-        
-        # Get recent activity users (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_users = db.users.count_documents({
-            "last_login": {"$gte": thirty_days_ago}
-        })
+        # Served from the shared, periodically refreshed dashboard metrics
+        metrics = dashboard_metrics.get()
         
         stats = {
-            'totalUsers': total_users,
-            'activeUsers': active_users,
-            'totalQuizzes': total_quizzes,
-            'totalGames': total_games,
-            'totalAttempts': total_attempts,
-            'averageIQ': average_iq,
-            'averageScore': average_score,
-            'recentUsers': recent_users
+            'totalUsers': metrics['total_users'],
+            'activeUsers': metrics['active_users'],
+            'totalQuizzes': metrics['total_quizzes'],
+            'totalGames': metrics['total_games'],
+            'totalAttempts': metrics['total_attempts'],
+            'averageIQ': metrics['average_iq'],
+            'averageScore': metrics['average_score'],
+            'recentUsers': metrics['recent_users'],
+            'computedAt': metrics['computed_at'].isoformat()
         }
         
         return jsonify({
@@ -522,60 +532,26 @@ def get_dashboard_stats():
 def get_dashboard_activity():
     """Get recent activity for admin dashboard"""
     try:
-        from models.database import get_db
-        db = get_db()
+        limit = min(max(1, int(request.args.get('limit', 10))), 50)
+        cursor = request.args.get('cursor')
         
-        # Get recent user registrations
-        recent_users = list(db.users.find().sort("created_at", -1).limit(5))
+        if cursor and not ObjectId.is_valid(cursor):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid cursor'
+            }), 400
         
-        # Get recent activity from actual database records
-        activities = []
-        
-        # Add user registration activities
-        for user in recent_users:
-            activities.append({
-                'title': f'New user registered',
-                'description': f'{user.get("name", "Unknown")} joined the platform',
-                'time': user.get('created_at', datetime.utcnow()).strftime('%H:%M')
-            })
-        
-        # Get recent quiz attempts if available
-        try:
-            recent_attempts = list(db.quiz_attempts.find().sort("created_at", -1).limit(3))
-            for attempt in recent_attempts:
-                user = db.users.find_one({'_id': attempt.get('user_id')})
-                quiz = db.quizzes.find_one({'_id': attempt.get('quiz_id')})
-                if user and quiz:
-                    activities.append({
-                        'title': 'Quiz completed',
-                        'description': f'{user.get("name", "Unknown")} completed {quiz.get("title", "Unknown Quiz")}',
-                        'time': attempt.get('created_at', datetime.utcnow()).strftime('%H:%M')
-                    })
-        except Exception:
-            pass  # Quiz attempts collection might not exist yet
-        
-        # Get recent game activities if available
-        try:
-            recent_games = list(db.game_sessions.find().sort("created_at", -1).limit(3))
-            for game_session in recent_games:
-                user = db.users.find_one({'_id': game_session.get('user_id')})
-                game = db.games.find_one({'_id': game_session.get('game_id')})
-                if user and game:
-                    activities.append({
-                        'title': 'Game played',
-                        'description': f'{user.get("name", "Unknown")} played {game.get("name", "Unknown Game")}',
-                        'time': game_session.get('created_at', datetime.utcnow()).strftime('%H:%M')
-                    })
-        except Exception:
-            pass  # Game sessions collection might not exist yet
-        
-        # Sort activities by time (most recent first)
-        activities.sort(key=lambda x: x['time'], reverse=True)
+        # One indexed, time-ordered read of the denormalized activity feed
+        events, next_cursor = Activity.get_feed(limit, cursor)
         
         return jsonify({
             'success': True,
             'message': 'Activity data retrieved successfully',
-            'data': activities[:10]  # Limit to 10 most recent activities
+            'data': [Activity.to_dict(event) for event in events],
+            'pagination': {
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
         }), 200
         
     except Exception as e:
@@ -595,65 +571,28 @@ def get_analytics():
         
         time_range = request.args.get('timeRange', 'week')
         
-        # Calculate date range
-        now = datetime.utcnow()
-        if time_range == 'day':
-            start_date = now - timedelta(days=1)
-        elif time_range == 'week':
-            start_date = now - timedelta(days=7)
-        elif time_range == 'month':
-            start_date = now - timedelta(days=30)
-        elif time_range == 'quarter':
-            start_date = now - timedelta(days=90)
-        elif time_range == 'year':
-            start_date = now - timedelta(days=365)
-        else:
-            start_date = now - timedelta(days=7)
-        
-        # Get overview stats
-        total_users = db.users.count_documents({})
-        active_users = db.users.count_documents({
-            "last_login": {"$gte": start_date}
-        })
-        total_quizzes = db.quizzes.count_documents({})
-        
-        # Calculate total attempts with error handling
-        try:
-            total_attempts_result = list(db.quizzes.aggregate([
-                {"$group": {"_id": None, "total": {"$sum": "$total_attempts"}}}
-            ]))
-            total_attempts = total_attempts_result[0].get('total', 0) if total_attempts_result else 0
-        except Exception:
-            total_attempts = 0
-        
-        # Calculate average IQ with error handling
-        try:
-            avg_iq_result = list(db.users.aggregate([
-                {"$group": {"_id": None, "avg_iq": {"$avg": "$iq_score"}}}
-            ]))
-            average_iq = round(avg_iq_result[0].get('avg_iq', 0), 1) if avg_iq_result else 0
-        except Exception:
-            average_iq = 0
-        
-        # Calculate average score with error handling
-        try:
-            avg_score_result = list(db.quizzes.aggregate([
-                {"$group": {"_id": None, "avg_score": {"$avg": "$average_score"}}}
-            ]))
-            average_score = round(avg_score_result[0].get('avg_score', 0), 1) if avg_score_result else 0
-        except Exception:
-            average_score = 0
-        
-        # Get top scorers
-        top_scorers = list(db.users.find().sort("iq_score", -1).limit(10))
+        # Overview stats come from the shared dashboard metrics; active users are
+        # pre-counted for each time range (day, week, month, quarter, year)
+        metrics = dashboard_metrics.get()
+        active_users = metrics['logged_in'].get(time_range, metrics['logged_in']['week'])
+        
+        # Get top scorers from the columnar analytics snapshot (names for the ten ids in one query)
+        snapshot = get_snapshot()
+        top_ids = [str(user_id) for user_id in snapshot.column('users', 'id')[snapshot.top('users', 'iq_score', 10)]]
+        top_users = {
+            str(user['_id']): user
+            for user in db.users.find({"_id": {"$in": [ObjectId(user_id) for user_id in top_ids]}}, {"name": 1, "username": 1, "iq_score": 1})
+        }
         top_scorers_data = []
-        for user in top_scorers:
-            top_scorers_data.append({
-                'id': str(user['_id']),
-                'name': user.get('name', 'Unknown'),
-                'username': user.get('username', 'unknown'),
-                'iq_score': user.get('iq_score', 0)
-            })
+        for user_id in top_ids:
+            user = top_users.get(user_id)
+            if user:
+                top_scorers_data.append({
+                    'id': user_id,
+                    'name': user.get('name', 'Unknown'),
+                    'username': user.get('username', 'unknown'),
+                    'iq_score': user.get('iq_score', 0)
+                })
         
         # Get participation by category
         participation_by_category = [
@@ -666,12 +605,13 @@ def get_analytics():
         
         analytics_data = {
             'overview': {
-                'totalUsers': total_users,
+                'totalUsers': metrics['total_users'],
                 'activeUsers': active_users,
-                'totalQuizzes': total_quizzes,
-                'totalAttempts': total_attempts,
-                'averageIQ': average_iq,
-                'averageScore': average_score
+                'totalQuizzes': metrics['total_quizzes'],
+                'totalAttempts': metrics['total_attempts'],
+                'averageIQ': metrics['average_iq'],
+                'averageScore': metrics['average_score'],
+                'computedAt': metrics['computed_at'].isoformat()
             },
             'topScorers': top_scorers_data,
             'participation': {
@@ -693,7 +633,8 @@ def get_analytics():
                 'monthly': []
             },
             'iqGrowth': [],
-            'userEngagement': []
+            'userEngagement': [],
+            'snapshotAt': snapshot.created_at.isoformat()
         }
         
         return jsonify({
@@ -702,6 +643,11 @@ def get_analytics():
             'data': analytics_data
         }), 200
         
+    except SnapshotUnavailable as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -752,6 +698,11 @@ def export_analytics():
                 'message': f'{format_type.upper()} export format not supported. Use "excel" format.'
             }), 400
             
+    except SnapshotUnavailable as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -764,14 +715,8 @@ def export_analytics():
 def get_reports():
     """Get all reports"""
     try:
-        from models.database import get_db
-        db = get_db()
-        
-        # TODO: Implement actual reports collection and retrieval
-        # This should query a reports collection in the database
-        
-        # For now, return empty list since no reports system is implemented
-        reports = []
+        limit = min(max(1, int(request.args.get('limit', 50))), 200)
+        reports = [Report.to_dict(report) for report in Report.list_recent(limit)]
         
         return jsonify({
             'success': True,
@@ -791,6 +736,7 @@ def generate_report():
     """Generate a new report"""
     try:
         data = request.get_json()
+        current_user = get_current_user()
         
         # Validate required fields
         if not data.get('name'):
@@ -799,17 +745,24 @@ def generate_report():
                 'message': 'Report name is required'
             }), 400
         
-        # In a real implementation, you would:
-        # 1. Create a report record in the database
-        # 2. Queue the report generation job
-        # 3. Return the report ID
-        
-        report_id = str(ObjectId())
+        # Queue the job; a report worker process picks it up
+        try:
+            report_id = Report.create(
+                data['name'],
+                data.get('type', 'user_analytics'),
+                data.get('format', 'xlsx'),
+                current_user.id
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
         
         return jsonify({
             'success': True,
             'message': 'Report generation started',
-            'data': {'report_id': report_id}
+            'data': {'report_id': report_id, 'status': 'queued'}
         }), 201
         
     except Exception as e:
@@ -818,23 +771,68 @@ def generate_report():
             'message': f'Failed to generate report: {str(e)}'
         }), 500
 
+@admin_bp.route('/reports/<report_id>', methods=['GET'])
+@admin_required
+def get_report(report_id):
+    """Get a report's status and progress"""
+    try:
+        report = Report.get(report_id)
+        if not report:
+            return jsonify({
+                'success': False,
+                'message': 'Report not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'message': 'Report retrieved successfully',
+            'data': Report.to_dict(report)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve report: {str(e)}'
+        }), 500
+
 @admin_bp.route('/reports/<report_id>/download', methods=['GET'])
 @admin_required
 def download_report(report_id):
     """Download a report"""
     try:
-        format_type = request.args.get('format', 'pdf')
+        report = Report.get(report_id)
+        if not report:
+            return jsonify({
+                'success': False,
+                'message': 'Report not found'
+            }), 404
         
-        # TODO: Implement actual report download functionality
-        # This should:
-        # 1. Check if the report exists and is completed
-        # 2. Generate the file in the requested format
-        # 3. Return the file as a download
+        if report.get('status') != 'completed':
+            return jsonify({
+                'success': False,
+                'message': f"Report is {report.get('status')}",
+                'data': Report.to_dict(report)
+            }), 409
         
-        return jsonify({
-            'success': False,
-            'message': f'Report download functionality not implemented yet'
-        }), 501  # Not Implemented
+        format_type = REPORT_FORMATS.get(request.args.get('format', report['format']))
+        if format_type != report['format']:
+            return jsonify({
+                'success': False,
+                'message': f"Report is only available as {report['format']}"
+            }), 400
+        
+        if not os.path.exists(report.get('file_path', '')):
+            return jsonify({
+                'success': False,
+                'message': 'Report file has expired'
+            }), 410
+        
+        return send_file(
+            report['file_path'],
+            mimetype=EXPORT_MIMETYPES[report['format']],
+            as_attachment=True,
+            download_name=f"{report['name']}.{report['format']}"
+        )
         
     except Exception as e:
         return jsonify({
@@ -847,7 +845,11 @@ def download_report(report_id):
 def delete_report(report_id):
     """Delete a report"""
     try:
-        # In a real implementation, you would delete the report from the database
+        if not ObjectId.is_valid(report_id) or not Report.delete(report_id):
+            return jsonify({
+                'success': False,
+                'message': 'Report not found'
+            }), 404
         
         return jsonify({
             'success': True,
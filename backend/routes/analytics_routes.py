@@ -1,17 +1,18 @@
-from flask import Blueprint, request, jsonify, send_file
-from models.user import User
-from models.quiz import Quiz
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models.content import Content
+from models.rollup import DailyRollup
+from services.exports import stream_export, EXPORTS, EXPORT_MIMETYPES
+from models.report import Report
+from services.analytics_snapshot import get_snapshot, SnapshotUnavailable
+from services import leaderboards
 from middleware.auth_middleware import admin_required, get_current_user
 from models.database import get_db
 from datetime import datetime, timedelta
-import pandas as pd
 import io
 import json
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from io import BytesIO
 import base64
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -23,34 +24,26 @@ def get_performance_analytics():
     try:
         db = get_db()
         
-        # Get basic statistics
-        total_users = db.users.count_documents({})
-        active_users = db.users.count_documents({"is_active": True})
-        total_quizzes = db.quizzes.count_documents({})
-        total_quiz_attempts = db.quiz_attempts.count_documents({})
-        total_game_scores = db.game_scores.count_documents({})
-        
-        # Get average IQ score
-        avg_iq = db.users.aggregate([
-            {"$group": {"_id": None, "avg_iq": {"$avg": "$iq_score"}}}
-        ]).next().get('avg_iq', 0)
+        # Totals and averages come from the columnar analytics snapshot
+        snapshot = get_snapshot()
+        total_users = snapshot.rows('users')
+        active_users = int(snapshot.column('users', 'is_active').sum())
+        total_quizzes = snapshot.rows('quizzes')
+        total_quiz_attempts = snapshot.rows('attempts')
+        total_game_scores = snapshot.rows('game_scores')
+        avg_iq = snapshot.mean('users', 'iq_score') or 0
         
         # Get performance by category
-        quiz_categories = db.quizzes.aggregate([
-            {"$group": {"_id": "$category", "count": {"$sum": 1}, "avg_score": {"$avg": "$average_score"}}}
-        ])
-        
-        category_stats = []
-        for category in quiz_categories:
-            category_stats.append({
-                "category": category["_id"],
-                "quiz_count": category["count"],
-                "avg_score": category["avg_score"]
-            })
+        category_stats = [
+            {"category": group['key'], "quiz_count": group['count'], "avg_score": group['avg']}
+            for group in snapshot.group('quizzes', 'category', 'average_score')
+        ]
         
         # Get recent activity
         recent_attempts = list(db.quiz_attempts.find().sort("created_at", -1).limit(10))
         recent_games = list(db.game_scores.find().sort("completed_at", -1).limit(10))
+        for document in recent_attempts + recent_games:
+            document['_id'] = str(document['_id'])
         
         return jsonify({
             'success': True,
@@ -64,10 +57,16 @@ def get_performance_analytics():
                 'average_iq': round(avg_iq, 2),
                 'category_stats': category_stats,
                 'recent_attempts': recent_attempts,
-                'recent_games': recent_games
+                'recent_games': recent_games,
+                'snapshot_at': snapshot.created_at.isoformat()
             }
         }), 200
         
+    except SnapshotUnavailable as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -84,57 +83,84 @@ def get_iq_growth_analytics():
         # Get IQ growth data for the last 30 days
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
-        # Get all users with their performance history
-        users = list(db.users.find({
-            "performance_history": {"$exists": True, "$ne": []}
-        }))
+        # Server-side pagination and optional trend downsampling
+        page = max(1, int(request.args.get('page', 1)))
+        limit = min(max(1, int(request.args.get('limit', 50))), 500)
+        trend_points = max(0, int(request.args.get('trend_points', 0)))  # 0 = full trend
+        
+        # Project only the recent history so whole user documents never leave the database
+        pipeline = [
+            {"$match": {"performance_history.date": {"$gte": thirty_days_ago}}},
+            {"$project": {
+                "name": 1,
+                "recent": {
+                    "$filter": {
+                        "input": "$performance_history",
+                        "as": "entry",
+                        "cond": {"$gte": ["$$entry.date", thirty_days_ago]}
+                    }
+                }
+            }},
+            # History is appended in date order, so the filtered array is already sorted
+            {"$project": {
+                "name": 1,
+                "recent.date": 1,
+                "recent.iq_score": 1,
+                "recent.raw_score": 1,
+                "initial_iq": {"$ifNull": [{"$arrayElemAt": ["$recent.iq_score", 0]}, 100]},
+                "final_iq": {"$ifNull": [{"$arrayElemAt": ["$recent.iq_score", -1]}, 100]},
+                "attempts_count": {"$size": "$recent"}
+            }},
+            {"$addFields": {"iq_growth": {"$subtract": ["$final_iq", "$initial_iq"]}}},
+            {"$facet": {
+                "summary": [
+                    {"$group": {"_id": None, "total": {"$sum": 1}, "average_iq_growth": {"$avg": "$iq_growth"}}}
+                ],
+                "page": [
+                    {"$sort": {"iq_growth": -1, "_id": 1}},
+                    {"$skip": (page - 1) * limit},
+                    {"$limit": limit}
+                ]
+            }}
+        ]
+        
+        result = list(db.users.aggregate(pipeline, allowDiskUse=True))
+        result = result[0] if result else {"summary": [], "page": []}
+        summary = result['summary'][0] if result['summary'] else {"total": 0, "average_iq_growth": 0}
         
         iq_growth_data = []
-        for user in users:
-            performance_history = user.get('performance_history', [])
-            if performance_history:
-                # Get recent performance entries
-                recent_performance = [
-                    entry for entry in performance_history 
-                    if entry.get('date') and entry['date'] >= thirty_days_ago
+        for user in result['page']:
+            trend = downsample(user.get('recent', []), trend_points)
+            iq_growth_data.append({
+                'user_id': str(user['_id']),
+                'user_name': user.get('name', 'Unknown'),
+                'initial_iq': user['initial_iq'],
+                'final_iq': user['final_iq'],
+                'iq_growth': user['iq_growth'],
+                'attempts_count': user['attempts_count'],
+                'performance_trend': [
+                    {
+                        'date': entry['date'].strftime('%Y-%m-%d'),
+                        'iq_score': entry.get('iq_score', 100),
+                        'raw_score': entry.get('raw_score', 0)
+                    }
+                    for entry in trend
                 ]
-                
-                if recent_performance:
-                    # Sort by date
-                    recent_performance.sort(key=lambda x: x['date'])
-                    
-                    # Calculate IQ growth
-                    initial_iq = recent_performance[0].get('iq_score', 100)
-                    final_iq = recent_performance[-1].get('iq_score', 100)
-                    iq_growth = final_iq - initial_iq
-                    
-                    iq_growth_data.append({
-                        'user_id': str(user['_id']),
-                        'user_name': user.get('name', 'Unknown'),
-                        'initial_iq': initial_iq,
-                        'final_iq': final_iq,
-                        'iq_growth': iq_growth,
-                        'attempts_count': len(recent_performance),
-                        'performance_trend': [
-                            {
-                                'date': entry['date'].strftime('%Y-%m-%d'),
-                                'iq_score': entry.get('iq_score', 100),
-                                'raw_score': entry.get('raw_score', 0)
-                            }
-                            for entry in recent_performance
-                        ]
-                    })
-        
-        # Sort by IQ growth
-        iq_growth_data.sort(key=lambda x: x['iq_growth'], reverse=True)
+            })
         
         return jsonify({
             'success': True,
             'message': 'IQ growth analytics retrieved successfully',
             'data': {
                 'iq_growth_data': iq_growth_data,
-                'total_users_tracked': len(iq_growth_data),
-                'average_iq_growth': sum(item['iq_growth'] for item in iq_growth_data) / len(iq_growth_data) if iq_growth_data else 0
+                'total_users_tracked': summary['total'],
+                'average_iq_growth': summary['average_iq_growth'] or 0,
+                'pagination': {
+                    'page': page,
+                    'limit': limit,
+                    'total': summary['total'],
+                    'pages': (summary['total'] + limit - 1) // limit
+                }
             }
         }), 200
         
@@ -149,45 +175,21 @@ def get_iq_growth_analytics():
 def get_performance_heatmap():
     """Get performance heatmap data"""
     try:
-        db = get_db()
+        # Hour-of-week counters come from the pre-aggregated daily rollups
+        score_sums = [[0 for _ in range(24)] for _ in range(7)]
+        score_counts = [[0 for _ in range(24)] for _ in range(7)]
         
-        # Get performance data for heatmap
-        # Group by hour of day and day of week
-        pipeline = [
-            {
-                "$match": {
-                    "created_at": {
-                        "$gte": datetime.utcnow() - timedelta(days=30)
-                    }
-                }
-            },
-            {
-                "$addFields": {
-                    "hour": {"$hour": "$created_at"},
-                    "dayOfWeek": {"$dayOfWeek": "$created_at"}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "hour": "$hour",
-                        "dayOfWeek": "$dayOfWeek"
-                    },
-                    "count": {"$sum": 1},
-                    "avg_score": {"$avg": "$percentage"}
-                }
-            }
-        ]
-        
-        heatmap_data = list(db.quiz_attempts.aggregate(pipeline))
+        for rollup in DailyRollup.get_range(30):
+            day = rollup['day_of_week'] - 1  # Convert to 0-based index
+            for hour, counters in rollup.get('hours', {}).items():
+                score_sums[day][int(hour)] += counters.get('score_sum', 0)
+                score_counts[day][int(hour)] += counters.get('score_count', 0)
         
         # Convert to heatmap format
-        heatmap_matrix = [[0 for _ in range(24)] for _ in range(7)]
-        
-        for item in heatmap_data:
-            day = item['_id']['dayOfWeek'] - 1  # Convert to 0-based index
-            hour = item['_id']['hour']
-            heatmap_matrix[day][hour] = item['avg_score']
+        heatmap_matrix = [
+            [score_sums[day][hour] / score_counts[day][hour] if score_counts[day][hour] else 0 for hour in range(24)]
+            for day in range(7)
+        ]
         
         return jsonify({
             'success': True,
@@ -210,96 +212,24 @@ def get_performance_heatmap():
 def get_filtered_leaderboard():
     """Get filtered leaderboard data"""
     try:
-        db = get_db()
-        
         # Get filter parameters
         quiz_id = request.args.get('quiz_id')
         game_type = request.args.get('game_type')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
-        limit = int(request.args.get('limit', 50))
+        limit = min(max(1, int(request.args.get('limit', 50))), 500)
         
-        # Build query based on filters
-        query = {}
+        start = datetime.fromisoformat(date_from.replace('Z', '+00:00')) if date_from else None
+        end = datetime.fromisoformat(date_to.replace('Z', '+00:00')) if date_to else None
         
+        # Get leaderboard data (cached per filter for a short TTL)
         if quiz_id:
-            query['quiz_id'] = quiz_id
-        if game_type:
-            query['game_type'] = game_type
-        if date_from:
-            query['created_at'] = query.get('created_at', {})
-            query['created_at']['$gte'] = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-        if date_to:
-            query['created_at'] = query.get('created_at', {})
-            query['created_at']['$lte'] = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-        
-        # Get leaderboard data
-        if quiz_id:
-            # Quiz leaderboard
-            pipeline = [
-                {"$match": query},
-                {
-                    "$lookup": {
-                        "from": "users",
-                        "localField": "user_id",
-                        "foreignField": "_id",
-                        "as": "user"
-                    }
-                },
-                {"$unwind": "$user"},
-                {
-                    "$group": {
-                        "_id": "$user_id",
-                        "user_name": {"$first": "$user.name"},
-                        "username": {"$first": "$user.username"},
-                        "best_score": {"$max": "$percentage"},
-                        "attempts": {"$sum": 1},
-                        "avg_time": {"$avg": "$time_taken"}
-                    }
-                },
-                {"$sort": {"best_score": -1}},
-                {"$limit": limit}
-            ]
-            leaderboard_data = list(db.quiz_attempts.aggregate(pipeline))
+            leaderboard_data = leaderboards.quiz_leaderboard(quiz_id, start, end, limit)
         elif game_type:
-            # Game leaderboard
-            pipeline = [
-                {"$match": query},
-                {
-                    "$lookup": {
-                        "from": "users",
-                        "localField": "user_id",
-                        "foreignField": "_id",
-                        "as": "user"
-                    }
-                },
-                {"$unwind": "$user"},
-                {
-                    "$group": {
-                        "_id": "$user_id",
-                        "user_name": {"$first": "$user.name"},
-                        "username": {"$first": "$user.username"},
-                        "best_score": {"$max": "$score"},
-                        "attempts": {"$sum": 1},
-                        "avg_time": {"$avg": "$time_taken"}
-                    }
-                },
-                {"$sort": {"best_score": -1}},
-                {"$limit": limit}
-            ]
-            leaderboard_data = list(db.game_scores.aggregate(pipeline))
+            leaderboard_data = leaderboards.game_leaderboard(game_type, start, end, limit)
         else:
             # Overall IQ leaderboard
-            leaderboard_data = list(db.users.find().sort("iq_score", -1).limit(limit))
-            leaderboard_data = [
-                {
-                    "user_name": user.get('name', 'Unknown'),
-                    "username": user.get('username', 'unknown'),
-                    "iq_score": user.get('iq_score', 0),
-                    "badge_level": user.get('badge_level', 'Novice Cubist')
-                }
-                for user in leaderboard_data
-            ]
+            leaderboard_data = leaderboards.iq_leaderboard(limit)
         
         return jsonify({
             'success': True,
@@ -324,91 +254,43 @@ def get_filtered_leaderboard():
 @analytics_bp.route('/export/<export_type>', methods=['GET'])
 @admin_required
 def export_data(export_type):
-    """Export data in various formats"""
+    """Export data as CSV (streamed) or XLSX (queued report job).
+
+    CSV rows are read from a cursor and sent chunk by chunk. An XLSX file
+    can only be written once complete, so it is built by a report worker:
+    the response is 202 with a report_id to poll at /api/admin/reports/<id>
+    and download from /api/admin/reports/<id>/download.
+    """
     try:
-        db = get_db()
+        export_format = request.args.get('format', 'xlsx').lower()
         
-        if export_type == 'users':
-            # Export user data
-            users = list(db.users.find())
-            data = []
-            for user in users:
-                data.append({
-                    'ID': str(user['_id']),
-                    'Name': user.get('name', ''),
-                    'Email': user.get('email', ''),
-                    'Username': user.get('username', ''),
-                    'Role': user.get('role', ''),
-                    'IQ Score': user.get('iq_score', 0),
-                    'Badge Level': user.get('badge_level', ''),
-                    'Total Quizzes': user.get('total_quizzes', 0),
-                    'Total Games': user.get('total_games', 0),
-                    'Is Active': user.get('is_active', True),
-                    'Created At': user.get('created_at', '').strftime('%Y-%m-%d %H:%M:%S') if user.get('created_at') else '',
-                    'Last Login': user.get('last_login', '').strftime('%Y-%m-%d %H:%M:%S') if user.get('last_login') else ''
-                })
-            
-            df = pd.DataFrame(data)
-            
-        elif export_type == 'quiz_results':
-            # Export quiz results
-            attempts = list(db.quiz_attempts.find())
-            data = []
-            for attempt in attempts:
-                quiz = Quiz.get_by_id(attempt['quiz_id'])
-                user = User.get_by_id(attempt['user_id'])
-                data.append({
-                    'Attempt ID': str(attempt['_id']),
-                    'Quiz Title': quiz.title if quiz else 'Unknown',
-                    'User Name': user.name if user else 'Unknown',
-                    'Score': attempt.get('score', 0),
-                    'Percentage': attempt.get('percentage', 0),
-                    'Time Taken (seconds)': attempt.get('time_taken', 0),
-                    'Status': attempt.get('status', ''),
-                    'Created At': attempt.get('created_at', '').strftime('%Y-%m-%d %H:%M:%S') if attempt.get('created_at') else ''
-                })
-            
-            df = pd.DataFrame(data)
-            
-        elif export_type == 'iq_analytics':
-            # Export IQ analytics
-            users = list(db.users.find({"performance_history": {"$exists": True, "$ne": []}}))
-            data = []
-            for user in users:
-                performance_history = user.get('performance_history', [])
-                if performance_history:
-                    for entry in performance_history:
-                        data.append({
-                            'User ID': str(user['_id']),
-                            'User Name': user.get('name', 'Unknown'),
-                            'Date': entry.get('date', '').strftime('%Y-%m-%d %H:%M:%S') if entry.get('date') else '',
-                            'Raw Score': entry.get('raw_score', 0),
-                            'IQ Score': entry.get('iq_score', 0),
-                            'Badge Level': entry.get('badge_level', ''),
-                            'Quiz Difficulty': entry.get('quiz_difficulty', ''),
-                            'Z Score': entry.get('z_score', 0)
-                        })
-            
-            df = pd.DataFrame(data)
-            
-        else:
+        if export_format not in EXPORT_MIMETYPES:
             return jsonify({
                 'success': False,
-                'message': 'Invalid export type'
+                'message': 'Invalid export format'
             }), 400
         
-        # Create Excel file
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Data', index=False)
+        if export_type not in EXPORTS:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid export type'
+            }), 400
         
-        output.seek(0)
+        filename = f'{export_type}_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}'
         
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'{export_type}_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        if export_format == 'xlsx':
+            current_user = get_current_user()
+            report_id = Report.create(filename, export_type, export_format, current_user.id)
+            return jsonify({
+                'success': True,
+                'message': 'Export queued',
+                'data': {'report_id': report_id, 'status': 'queued'}
+            }), 202
+        
+        return Response(
+            stream_with_context(stream_export(export_type)),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'}
         )
         
     except Exception as e:
@@ -422,41 +304,22 @@ def export_data(export_type):
 def get_daily_stats():
     """Get daily statistics for the last 30 days"""
     try:
-        db = get_db()
-        
-        # Calculate date range
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        # Get daily user registrations
-        daily_registrations = list(db.users.aggregate([
-            {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]))
-        
-        # Get daily quiz attempts
-        daily_quiz_attempts = list(db.quiz_attempts.aggregate([
-            {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]))
-        
-        # Get daily game scores
-        daily_game_scores = list(db.game_scores.aggregate([
-            {"$match": {"completed_at": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$completed_at"}}, "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}
-        ]))
-        
-        # Get daily average IQ scores
-        daily_avg_iq = list(db.users.aggregate([
-            {"$match": {"performance_history": {"$exists": True, "$ne": []}}},
-            {"$unwind": "$performance_history"},
-            {"$match": {"performance_history.date": {"$gte": start_date, "$lte": end_date}}},
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$performance_history.date"}}, "avg_iq": {"$avg": "$performance_history.iq_score"}}},
-            {"$sort": {"_id": 1}}
-        ]))
+        # Read the last 30 days of pre-aggregated rollups instead of scanning raw collections
+        daily_registrations = []
+        daily_quiz_attempts = []
+        daily_game_scores = []
+        daily_avg_iq = []
+        
+        for rollup in DailyRollup.get_range(30):
+            day = rollup['_id']
+            if rollup.get('registrations'):
+                daily_registrations.append({"_id": day, "count": rollup['registrations']})
+            if rollup.get('quiz_attempts'):
+                daily_quiz_attempts.append({"_id": day, "count": rollup['quiz_attempts']})
+            if rollup.get('game_scores'):
+                daily_game_scores.append({"_id": day, "count": rollup['game_scores']})
+            if rollup.get('iq_count'):
+                daily_avg_iq.append({"_id": day, "avg_iq": rollup['iq_sum'] / rollup['iq_count']})
         
         return jsonify({
             'success': True,
@@ -475,6 +338,43 @@ def get_daily_stats():
             'message': f'Failed to get daily statistics: {str(e)}'
         }), 500
 
+@analytics_bp.route('/rollups/backfill', methods=['POST'])
+@admin_required
+def backfill_rollups():
+    """Rebuild daily analytics rollups from the raw collections"""
+    try:
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 30))
+        
+        if days < 1 or days > 366:
+            return jsonify({
+                'success': False,
+                'message': 'days must be between 1 and 366'
+            }), 400
+        
+        days_rebuilt = DailyRollup.backfill(days)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Daily rollups rebuilt successfully',
+            'data': {'days': days, 'days_with_activity': days_rebuilt}
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to rebuild daily rollups: {str(e)}'
+        }), 500
+
+def downsample(points, max_points):
+    """Evenly pick at most max_points points, always keeping the first and last"""
+    if not max_points or len(points) <= max_points:
+        return points
+    if max_points == 1:
+        return [points[-1]]
+    step = (len(points) - 1) / (max_points - 1)
+    return [points[round(i * step)] for i in range(max_points)]
+
 def calculate_performance_trends(quiz_attempts, game_scores):
     """Calculate performance trends over time"""
     trends = {
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models.content import Content
+from services.pagination import page_args, pagination_info, InvalidCursor
 from middleware.auth_middleware import admin_required, get_current_user
 from datetime import datetime
 
@@ -27,16 +28,23 @@ def get_active_content():
 @content_bp.route('/admin', methods=['GET'])
 @admin_required
 def get_all_content():
-    """Get all content (admin only)"""
+    """Get a page of content (admin only)"""
     try:
-        content_list = Content.get_all_content()
+        limit, cursor = page_args()
+        content_list, next_cursor = Content.get_content_page(limit, cursor)
         
         return jsonify({
             'success': True,
             'message': 'All content retrieved successfully',
-            'data': [content.to_dict() for content in content_list]
+            'data': [content.to_dict() for content in content_list],
+            'pagination': pagination_info(next_cursor)
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
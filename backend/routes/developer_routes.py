@@ -8,6 +8,17 @@ from models.tournament import Tournament
 from models.quiz import Quiz
 from models.content import Content
 from models.match import Match
+from services.quiz_admission import quiz_admission
+from services.session_registry import session_registry
+from services.leaderboard_broadcaster import leaderboard_broadcaster
+from services.handler_executor import handler_executor
+from services.presence import presence
+from services.chat import chat_service
+from services.match_engine import match_engine
+from services.analytics_snapshot import get_snapshot, SnapshotUnavailable
+from services.dashboard_metrics import dashboard_metrics
+from services.pagination import page_args, pagination_info, InvalidCursor
+from routes.user_search import search_users_response
 from datetime import datetime, timedelta
 import os
 import json
@@ -26,13 +37,8 @@ def developer_dashboard():
     try:
         db = get_db()
         
-        # System statistics
-        total_users = db.users.count_documents({})
-        active_users = db.users.count_documents({"is_active": True})
-        total_games = db.games.count_documents({})
-        total_tournaments = db.tournaments.count_documents({})
-        total_quizzes = db.quizzes.count_documents({})
-        total_matches = db.matches.count_documents({})
+        # System statistics from the shared dashboard metrics
+        metrics = dashboard_metrics.get()
         
         # Recent activity
         recent_users = list(db.users.find().sort("created_at", -1).limit(5))
@@ -54,12 +60,13 @@ def developer_dashboard():
             'success': True,
             'data': {
                 'statistics': {
-                    'total_users': total_users,
-                    'active_users': active_users,
-                    'total_games': total_games,
-                    'total_tournaments': total_tournaments,
-                    'total_quizzes': total_quizzes,
-                    'total_matches': total_matches
+                    'total_users': metrics['total_users'],
+                    'active_users': metrics['active_users'],
+                    'total_games': metrics['total_games'],
+                    'total_tournaments': metrics['total_tournaments'],
+                    'total_quizzes': metrics['total_quizzes'],
+                    'total_matches': metrics['total_matches'],
+                    'computed_at': metrics['computed_at'].isoformat()
                 },
                 'recent_activity': {
                     'users': [User(user).to_dict() for user in recent_users],
@@ -115,7 +122,14 @@ def system_status():
                 "memory_info": current_process.memory_info()._asdict(),
                 "cpu_percent": current_process.cpu_percent(),
                 "create_time": current_process.create_time()
-            }
+            },
+            "quiz_admission": quiz_admission.stats(),
+            "websocket_sessions": session_registry.stats(),
+            "leaderboard_broadcaster": leaderboard_broadcaster.stats(),
+            "socket_handlers": handler_executor.stats(),
+            "presence": presence.stats(),
+            "chat": chat_service.stats(),
+            "match_engine": match_engine.stats()
         }
         
         return jsonify({
@@ -132,20 +146,33 @@ def system_status():
 @developer_bp.route('/users/manage', methods=['GET'])
 @developer_required
 def get_all_users_developer():
-    """Get all users with developer privileges"""
+    """Get a page of users with developer privileges"""
     try:
-        users = User.get_all_users()
+        limit, cursor = page_args()
+        users, next_cursor = User.get_users_page(limit, cursor)
         return jsonify({
             'success': True,
-            'data': [user.to_dict() for user in users]
+            'data': [user.to_dict() for user in users],
+            'pagination': pagination_info(next_cursor)
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Failed to get users: {str(e)}'
         }), 500
 
+@developer_bp.route('/users/search', methods=['GET'])
+@developer_required
+def search_users():
+    """Search users by username/email/name prefix, role and status"""
+    return search_users_response()
+
 @developer_bp.route('/users/<user_id>/modify', methods=['PUT'])
 @developer_required
 def modify_user_developer(user_id):
@@ -413,36 +440,35 @@ def export_logs():
 def advanced_analytics():
     """Get advanced analytics data"""
     try:
-        db = get_db()
+        snapshot = get_snapshot()
         
         # User analytics
-        user_roles = list(db.users.aggregate([
-            {"$group": {"_id": "$role", "count": {"$sum": 1}}}
-        ]))
+        user_roles = [{"_id": group['key'], "count": group['count']} for group in snapshot.group('users', 'role')]
         
         # Game analytics
-        game_stats = list(db.games.aggregate([
-            {"$group": {"_id": "$game_type", "count": {"$sum": 1}}}
-        ]))
+        game_stats = [{"_id": group['key'], "count": group['count']} for group in snapshot.group('games', 'game_type')]
         
         # Performance analytics
-        performance_data = list(db.users.aggregate([
-            {"$group": {
-                "_id": "$badge_level",
-                "avg_iq": {"$avg": "$iq_score"},
-                "count": {"$sum": 1}
-            }}
-        ]))
+        performance_data = [
+            {"_id": group['key'], "avg_iq": group['avg'], "count": group['count']}
+            for group in snapshot.group('users', 'badge_level', 'iq_score')
+        ]
         
         return jsonify({
             'success': True,
             'data': {
                 'user_roles': user_roles,
                 'game_stats': game_stats,
-                'performance_data': performance_data
+                'performance_data': performance_data,
+                'snapshot_at': snapshot.created_at.isoformat()
             }
         }), 200
         
+    except SnapshotUnavailable as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from models.user import User
 from models.game import Game
 from models.match import Match
+from models.activity import Activity
+from services.pagination import page_args, pagination_info, InvalidCursor
+from services.presence import presence, game_key, tournament_key, PRESENCE_MAX_ROOMS
+from services.match_engine import live_kind
 from middleware.auth_middleware import auth_required, admin_required, get_current_user
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -274,6 +278,7 @@ def start_game_level(game_id, level_id):
         
         # Start the game session
         session_data = game.start_level(level_id, current_user.id)
+        Activity.record_game_played(current_user.id, current_user.name, game.name)
         
         return jsonify({
             'success': True,
@@ -602,6 +607,13 @@ def submit_match_solution(match_id):
                 'message': 'You are not part of this match'
             }), 403
         
+        game = Game.get_by_id(match.game_id)
+        if live_kind(game.type if game else None, match.cube_type):
+            return jsonify({
+                'success': False,
+                'message': 'This match is played live; send moves over the join_match socket events'
+            }), 409
+        
         solution = data.get('solution')
         time_taken = data.get('time_taken', 0)
         
@@ -632,14 +644,21 @@ def get_user_matches():
     """Get matches for current user"""
     try:
         current_user = get_current_user()
-        matches = Match.get_user_matches(current_user.id)
+        limit, cursor = page_args()
+        matches, next_cursor = Match.get_user_matches(current_user.id, limit, cursor)
         
         return jsonify({
             'success': True,
             'message': 'Matches retrieved successfully',
-            'data': [match.to_dict() for match in matches]
+            'data': [match.to_dict() for match in matches],
+            'pagination': pagination_info(next_cursor)
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -752,6 +771,39 @@ def get_global_leaderboard():
             'message': f'Failed to retrieve global leaderboard: {str(e)}'
         }), 500
 
+@game_bp.route('/presence', methods=['GET'])
+@auth_required
+def get_presence():
+    """Users online across all workers, optionally per game/tournament (?game_id=a,b&tournament_id=c)"""
+    try:
+        game_ids = [value for value in request.args.get('game_id', '').split(',') if value]
+        tournament_ids = [value for value in request.args.get('tournament_id', '').split(',') if value]
+        if len(game_ids) + len(tournament_ids) > PRESENCE_MAX_ROOMS:
+            return jsonify({
+                'success': False,
+                'message': f'At most {PRESENCE_MAX_ROOMS} games and tournaments per request'
+            }), 400
+        
+        rooms = [game_key(game_id) for game_id in game_ids] + [tournament_key(tournament_id) for tournament_id in tournament_ids]
+        online = presence.online(rooms)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Presence retrieved successfully',
+            'data': {
+                'online_users': online['online_users'],
+                'online_sockets': online['online_sockets'],
+                'games': {game_id: online['rooms'][game_key(game_id)] for game_id in game_ids},
+                'tournaments': {tournament_id: online['rooms'][tournament_key(tournament_id)] for tournament_id in tournament_ids}
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to retrieve presence: {str(e)}'
+        }), 500
+
 # Health check for debugging
 @game_bp.route('/health', methods=['GET'])
 def game_health_check():
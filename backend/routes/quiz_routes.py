@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
 from models.quiz import Quiz
 from models.user import User
+from models.quiz_attempt import QuizAttempt
+from models.activity import Activity
+from services.quiz_autosave import answer_autosave
+from services.quiz_admission import quiz_admission
+from services import leaderboards
+from services.pagination import page_args, pagination_info, InvalidCursor
 from middleware.auth_middleware import user_required, get_current_user
 from models.database import get_db
 from datetime import datetime
@@ -14,7 +20,47 @@ def start_quiz(quiz_id):
     """Start a quiz attempt"""
     try:
         current_user = get_current_user()
-        quiz = Quiz.get_by_id(quiz_id)
+        
+        # Admission control: limit concurrent starts per quiz and queue the surplus.
+        # The queue is shared by all workers and keyed by user, so a retry keeps its place anywhere
+        admission = quiz_admission.admit(quiz_id, current_user.id)
+        if not admission['admitted']:
+            if admission.get('full'):
+                return jsonify({
+                    'success': False,
+                    'message': 'Too many students are starting this quiz, please retry shortly',
+                    'data': {'retry_after': admission['retry_after']}
+                }), 503
+            
+            return jsonify({
+                'success': True,
+                'message': 'Quiz start queued',
+                'data': {
+                    'queued': True,
+                    'ticket': admission['ticket'],
+                    'seq': admission['seq'],
+                    'serving': admission['serving'],
+                    'position': admission['position'],
+                    'waiting': admission['waiting'],
+                    'retry_after': admission['retry_after']
+                }
+            }), 202
+        
+        try:
+            return _start_quiz_attempt(quiz_id, current_user)
+        finally:
+            quiz_admission.release(quiz_id, admission['slot'])
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to start quiz: {str(e)}'
+        }), 500
+
+def _start_quiz_attempt(quiz_id, current_user):
+    """Create (or resume) the attempt once admitted"""
+    try:
+        quiz = Quiz.get_cached(quiz_id)
         
         if not quiz:
             return jsonify({
@@ -28,33 +74,32 @@ def start_quiz(quiz_id):
                 'message': 'Quiz is not available'
             }), 400
         
-        # Check if user has already attempted this quiz recently
-        db = get_db()
-        recent_attempt = db.quiz_attempts.find_one({
-            "user_id": current_user.id,
-            "quiz_id": quiz_id,
-            "created_at": {"$gte": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)}
-        })
-        
-        if recent_attempt:
+        # Create quiz attempt (one per day, enforced by a unique index)
+        try:
+            attempt_id = QuizAttempt.start(current_user.id, quiz_id)
+        except ValueError as e:
+            # Let the user resume today's attempt if it was never submitted
+            attempt = QuizAttempt.get_today(current_user.id, quiz_id)
+            if attempt and attempt.get('status') == 'in_progress':
+                elapsed = (datetime.utcnow() - attempt['started_at']).total_seconds()
+                
+                return jsonify({
+                    'success': True,
+                    'message': 'Quiz attempt resumed',
+                    'data': {
+                        'attempt_id': str(attempt['_id']),
+                        'quiz': quiz.to_dict_for_user(),
+                        'time_limit': max(0, int(quiz.time_limit * 60 - elapsed)),
+                        'answers': attempt.get('answers', []),
+                        'resumed': True
+                    }
+                }), 200
+            
             return jsonify({
                 'success': False,
-                'message': 'You have already attempted this quiz today'
+                'message': str(e)
             }), 400
         
-        # Create quiz attempt
-        attempt_data = {
-            "user_id": current_user.id,
-            "quiz_id": quiz_id,
-            "started_at": datetime.utcnow(),
-            "status": "in_progress",
-            "answers": [],
-            "score": 0,
-            "time_taken": 0
-        }
-        
-        attempt_id = db.quiz_attempts.insert_one(attempt_data).inserted_id
-        
         return jsonify({
             'success': True,
             'message': 'Quiz started successfully',
@@ -86,7 +131,7 @@ def submit_quiz(quiz_id):
             }), 404
         
         data = request.get_json()
-        answers = data.get('answers', [])
+        answers = data.get('answers')
         attempt_id = data.get('attempt_id')
         time_taken = data.get('time_taken', 0)
         
@@ -96,14 +141,14 @@ def submit_quiz(quiz_id):
                 'message': 'Attempt ID is required'
             }), 400
         
-        # Get the quiz attempt
-        db = get_db()
-        attempt = db.quiz_attempts.find_one({
-            "_id": ObjectId(attempt_id),
-            "user_id": current_user.id,
-            "quiz_id": quiz_id,
-            "status": "in_progress"
-        })
+        if not ObjectId.is_valid(str(attempt_id)):
+            return jsonify({
+                'success': False,
+                'message': 'Invalid quiz attempt'
+            }), 400
+        
+        # Get the quiz attempt (autosaved answers are already written)
+        attempt = QuizAttempt.get_in_progress(attempt_id, current_user.id, quiz_id)
         
         if not attempt:
             return jsonify({
@@ -111,23 +156,18 @@ def submit_quiz(quiz_id):
                 'message': 'Invalid quiz attempt'
             }), 400
         
+        # Without an answers payload, submit the autosaved answers
+        if answers is None:
+            answers = attempt.get('answers') or []
+        
         # Calculate score
         score_result = quiz.calculate_score(answers)
         
         # Update attempt
-        db.quiz_attempts.update_one(
-            {"_id": ObjectId(attempt_id)},
-            {
-                "$set": {
-                    "answers": answers,
-                    "score": score_result['score'],
-                    "percentage": score_result['percentage'],
-                    "time_taken": time_taken,
-                    "completed_at": datetime.utcnow(),
-                    "status": "completed"
-                }
-            }
-        )
+        QuizAttempt.complete(attempt_id, answers, score_result, time_taken)
+        answer_autosave.forget(attempt_id)
+        Activity.record_quiz_completed(current_user.id, current_user.name, quiz.title)
+        leaderboards.invalidate_quiz(quiz_id)
         
         # Update quiz statistics
         quiz.increment_attempts()
@@ -140,7 +180,8 @@ def submit_quiz(quiz_id):
         new_iq_score = current_user.update_iq_score(
             score_result['percentage'], 
             quiz.difficulty, 
-            user_age=18  # Default age, can be enhanced to get from user profile
+            user_age=18,  # Default age, can be enhanced to get from user profile
+            attempt_id=attempt_id
         )
         
         return jsonify({
@@ -162,29 +203,61 @@ def submit_quiz(quiz_id):
             'message': f'Failed to submit quiz: {str(e)}'
         }), 500
 
+@quiz_bp.route('/<quiz_id>/attempts/<attempt_id>/answers', methods=['POST'])
+@user_required
+def save_quiz_answers(quiz_id, attempt_id):
+    """Autosave answers for an in-progress attempt (per-question deltas)"""
+    try:
+        current_user = get_current_user()
+        data = request.get_json() or {}
+        answers = data.get('answers')
+        
+        if not isinstance(answers, dict) or not answers:
+            return jsonify({
+                'success': False,
+                'message': 'Answers must map question indexes to answers'
+            }), 400
+        
+        saved = answer_autosave.save(attempt_id, current_user.id, quiz_id, answers)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Answers saved',
+            'data': {'saved': saved}
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to save answers: {str(e)}'
+        }), 500
+
 @quiz_bp.route('/attempts', methods=['GET'])
 @user_required
 def get_quiz_attempts():
     """Get user's quiz attempts"""
     try:
         current_user = get_current_user()
-        db = get_db()
-        
-        attempts = list(db.quiz_attempts.find({"user_id": current_user.id}).sort("created_at", -1))
-        
-        # Add quiz details to attempts
-        for attempt in attempts:
-            quiz = Quiz.get_by_id(attempt['quiz_id'])
-            if quiz:
-                attempt['quiz_title'] = quiz.title
-                attempt['quiz_category'] = quiz.category
+        limit, cursor = page_args()
+        attempts, next_cursor = QuizAttempt.get_user_attempts(current_user.id, limit, cursor)
         
         return jsonify({
             'success': True,
             'message': 'Quiz attempts retrieved successfully',
-            'data': attempts
+            'data': attempts,
+            'pagination': pagination_info(next_cursor)
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -2,7 +2,9 @@ from flask import Blueprint, request, jsonify
 from models.tournament import Tournament
 from models.user import User
 from models.game import Game
+from services.pagination import page_args, pagination_info, InvalidCursor
 from middleware.auth_middleware import auth_required, admin_required, get_current_user
+from websocket_service import broadcast_tournament_delta
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -12,14 +14,21 @@ tournament_bp = Blueprint('tournament', __name__)
 @tournament_bp.route('/admin/tournaments', methods=['GET'])
 @admin_required
 def get_all_tournaments():
-    """Get all tournaments (admin only)"""
+    """Get a page of tournaments (admin only)"""
     try:
-        tournaments = Tournament.get_all_tournaments()
+        limit, cursor = page_args()
+        tournaments, next_cursor = Tournament.get_tournaments_page(limit, cursor)
         return jsonify({
             'success': True,
             'message': 'Tournaments retrieved successfully',
-            'data': [tournament.to_dict() for tournament in tournaments]
+            'data': [tournament.to_dict() for tournament in tournaments],
+            'pagination': pagination_info(next_cursor)
         }), 200
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -124,9 +133,10 @@ def update_tournament_match(tournament_id):
                 'message': 'Match ID and winner ID are required'
             }), 400
         
-        success = tournament.update_match_result(match_id, winner_id, player1_score, player2_score)
+        delta = tournament.update_match_result(match_id, winner_id, player1_score, player2_score)
         
-        if success:
+        if delta:
+            broadcast_tournament_delta(delta)
             return jsonify({
                 'success': True,
                 'message': 'Match result updated successfully',
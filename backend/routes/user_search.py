@@ -0,0 +1,34 @@
+from flask import request, jsonify
+from models.user import User
+from services.pagination import page_args, pagination_info
+
+def search_users_response():
+    """User search shared by the admin and developer blueprints (callers apply their own auth)"""
+    try:
+        limit, cursor = page_args()
+        users, next_cursor = User.search(
+            query=request.args.get('q'),
+            field=request.args.get('field'),
+            role=request.args.get('role'),
+            status=request.args.get('status'),
+            sort=request.args.get('sort', 'created_at'),
+            order=request.args.get('order', 'desc'),
+            limit=limit,
+            cursor=cursor
+        )
+        return jsonify({
+            'success': True,
+            'message': 'Users retrieved successfully',
+            'data': [user.to_dict() for user in users],
+            'pagination': pagination_info(next_cursor)
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Failed to search users: {str(e)}'
+        }), 500
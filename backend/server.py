@@ -24,68 +24,100 @@ from routes.maintenance_routes import maintenance_bp
 # Import database initialization
 from models.database import init_db
 
+# Import background services
+from services.quiz_admission import quiz_admission
+from services import leaderboards
+from services.socket_broker import message_queue_options
+from services.socket_codec import compression_options
+
 load_dotenv()
 
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
-
-# Validate required environment variables
-if not app.config['SECRET_KEY']:
-    raise ValueError("SECRET_KEY environment variable is required")
-if not app.config['JWT_SECRET_KEY']:
-    raise ValueError("JWT_SECRET_KEY environment variable is required")
-
-# JWT Configuration - Use environment variables
-access_token_expires = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # Default 1 hour
-refresh_token_expires = int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 604800))  # Default 7 days
-
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=access_token_expires)
-app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=refresh_token_expires)
-
-# MongoDB Configuration
-app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/tnca_iq_platform')
-
-# Initialize extensions
-# CORS configuration for production
-allowed_origins = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173,http://localhost:5174').split(',')
-CORS(app, origins=allowed_origins)
-jwt = JWTManager(app)
-socketio.init_app(app)
-
-# Initialize database
-init_db(app)
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-app.register_blueprint(user_bp, url_prefix='/api/user')
-app.register_blueprint(quiz_bp, url_prefix='/api/quiz')
-app.register_blueprint(game_bp, url_prefix='/api/game')
-app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
-app.register_blueprint(content_bp, url_prefix='/api/content')
-app.register_blueprint(tournament_bp, url_prefix='/api/tournament')
-app.register_blueprint(developer_bp, url_prefix='/api/developer')
-app.register_blueprint(maintenance_bp, url_prefix='/api/maintenance')
-
-@app.route('/')
-def home():
-    return jsonify({
-        "message": "TNCA & Cubeskool Iqualizer API",
-        "version": "1.0.0",
-        "status": "running"
-    })
-
-@app.route('/health')
-def health_check():
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat()
-    })
+def create_app():
+    """Build the Flask app: config, extensions, database, blueprints and routes.
+
+    Kept out of module scope so processes that import this module without
+    serving (spawned report workers re-import it as __mp_main__) skip the setup.
+    """
+    app = Flask(__name__)
+
+    # Configuration
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
+
+    # Validate required environment variables
+    if not app.config['SECRET_KEY']:
+        raise ValueError("SECRET_KEY environment variable is required")
+    if not app.config['JWT_SECRET_KEY']:
+        raise ValueError("JWT_SECRET_KEY environment variable is required")
+
+    # JWT Configuration - Use environment variables
+    access_token_expires = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # Default 1 hour
+    refresh_token_expires = int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 604800))  # Default 7 days
+
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=access_token_expires)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(seconds=refresh_token_expires)
+
+    # MongoDB Configuration
+    app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/tnca_iq_platform')
+
+    # Initialize extensions
+    # CORS configuration for production
+    allowed_origins = os.getenv('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173,http://localhost:5174').split(',')
+    CORS(app, origins=allowed_origins)
+    JWTManager(app)
+    # Cross-worker fan-out when SOCKETIO_MESSAGE_QUEUE is set
+    socketio.init_app(app, **message_queue_options(), **compression_options())
+
+    # Initialize database
+    init_db(app)
+
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(user_bp, url_prefix='/api/user')
+    app.register_blueprint(quiz_bp, url_prefix='/api/quiz')
+    app.register_blueprint(game_bp, url_prefix='/api/game')
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+    app.register_blueprint(content_bp, url_prefix='/api/content')
+    app.register_blueprint(tournament_bp, url_prefix='/api/tournament')
+    app.register_blueprint(developer_bp, url_prefix='/api/developer')
+    app.register_blueprint(maintenance_bp, url_prefix='/api/maintenance')
+
+    @app.before_request
+    def start_background_services():
+        """Start per-worker background loops on the first request (after gunicorn forks)"""
+        quiz_admission.start()
+        leaderboards.install_invalidation()
+
+    @app.route('/')
+    def home():
+        return jsonify({
+            "message": "TNCA & Cubeskool Iqualizer API",
+            "version": "1.0.0",
+            "status": "running"
+        })
+
+    @app.route('/health')
+    def health_check():
+        return jsonify({
+            "status": "healthy",
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     port = int(os.getenv('PORT', 5000))
+    
+    # Gunicorn starts these from its when_ready hook; do it here for local runs.
+    # In debug mode the reloader imports this module twice, so only start them
+    # in the reloaded child that actually serves requests
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from services.report_worker import start_workers
+        from services.socket_broker import start_broker
+        start_workers(app.config['MONGO_URI'])
+        start_broker()
+    
     socketio.run(app, debug=debug_mode, host='0.0.0.0', port=port) 
\ No newline at end of file
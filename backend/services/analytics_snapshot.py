@@ -0,0 +1,246 @@
+from models.database import get_db
+from datetime import datetime
+import numpy as np
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+SNAPSHOT_DIR = os.getenv('ANALYTICS_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'tnca_analytics'))
+SNAPSHOT_INTERVAL = int(os.getenv('ANALYTICS_SNAPSHOT_INTERVAL', 600))  # seconds between snapshot builds
+SNAPSHOT_KEEP = 2                                                       # snapshot versions kept on disk
+BATCH_SIZE = 5000
+
+# table -> (collection, filter, {column: (field, kind)})
+# kinds: id = str(_id), code = categorical (int32 codes + vocabulary), float, int, bool, datetime
+TABLES = {
+    'users': ('users', {}, {
+        'id': ('_id', 'id'),
+        'role': ('role', 'code'),
+        'is_active': ('is_active', 'bool'),
+        'iq_score': ('iq_score', 'float'),
+        'badge_level': ('badge_level', 'code'),
+        'created_at': ('created_at', 'datetime'),
+        'last_login': ('last_login', 'datetime')
+    }),
+    'quizzes': ('quizzes', {}, {
+        'id': ('_id', 'id'),
+        'category': ('category', 'code'),
+        'total_attempts': ('total_attempts', 'int'),
+        'average_score': ('average_score', 'float')
+    }),
+    'attempts': ('quiz_attempts', {}, {
+        'quiz_id': ('quiz_id', 'code'),
+        'status': ('status', 'code'),
+        'score': ('score', 'float'),
+        'percentage': ('percentage', 'float'),
+        'created_at': ('created_at', 'datetime')
+    }),
+    'sessions': ('game_sessions', {}, {
+        'game_id': ('game_id', 'code'),
+        'status': ('status', 'code'),
+        'score': ('score', 'float'),
+        'start_time': ('start_time', 'datetime')
+    }),
+    'matches': ('matches', {}, {
+        'status': ('status', 'code'),
+        'match_type': ('match_type', 'code'),
+        'created_at': ('created_at', 'datetime')
+    }),
+    'games': ('games', {}, {
+        'game_type': ('game_type', 'code')
+    }),
+    'game_scores': ('game_scores', {}, {
+        'game_type': ('game_type', 'code'),
+        'completed_at': ('completed_at', 'datetime')
+    })
+}
+
+class ColumnBuilder:
+    """Accumulates one column while the cursor is read"""
+    def __init__(self, kind):
+        self.kind = kind
+        self.values = []
+        self.vocabulary = {} if kind == 'code' else None
+
+    def append(self, value):
+        if self.kind == 'code':
+            if value is None:
+                self.values.append(-1)
+            else:
+                value = str(value)
+                self.values.append(self.vocabulary.setdefault(value, len(self.vocabulary)))
+        elif self.kind == 'id':
+            self.values.append(str(value))
+        elif self.kind in ('float', 'int'):
+            self.values.append(value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan)
+        elif self.kind == 'bool':
+            self.values.append(bool(value) if value is not None else True)
+        else:
+            self.values.append(value if isinstance(value, datetime) else None)
+
+    def array(self):
+        if self.kind == 'code':
+            return np.array(self.values, dtype=np.int32)
+        if self.kind == 'id':
+            return np.array(self.values, dtype='<U24')
+        if self.kind == 'float':
+            return np.array(self.values, dtype=np.float64)
+        if self.kind == 'int':
+            return np.nan_to_num(np.array(self.values, dtype=np.float64)).astype(np.int64)
+        if self.kind == 'bool':
+            return np.array(self.values, dtype=bool)
+        return np.array(self.values, dtype='datetime64[ms]')
+
+def build_snapshot():
+    """Extract every table into a new snapshot directory and make it current"""
+    db = get_db()
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    version = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(SNAPSHOT_DIR, f'snapshot-{version}')
+    os.makedirs(path)
+
+    meta = {'created_at': datetime.utcnow().isoformat(), 'tables': {}}
+    for table, (collection, query, columns) in TABLES.items():
+        builders = {name: ColumnBuilder(kind) for name, (field, kind) in columns.items()}
+        projection = {field: 1 for field, kind in columns.values()}
+        cursor = db[collection].find(query, projection).batch_size(BATCH_SIZE)
+
+        rows = 0
+        for document in cursor:
+            for name, (field, kind) in columns.items():
+                builders[name].append(document.get(field))
+            rows += 1
+
+        vocabularies = {}
+        for name, builder in builders.items():
+            np.save(os.path.join(path, f'{table}.{name}.npy'), builder.array())
+            if builder.vocabulary is not None:
+                vocabularies[name] = list(builder.vocabulary)
+        meta['tables'][table] = {'rows': rows, 'vocabularies': vocabularies}
+
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Publish atomically, then drop old versions
+    pointer = os.path.join(SNAPSHOT_DIR, 'CURRENT')
+    with open(f'{pointer}.tmp', 'w') as f:
+        f.write(os.path.basename(path))
+    os.replace(f'{pointer}.tmp', pointer)
+
+    versions = sorted(name for name in os.listdir(SNAPSHOT_DIR) if name.startswith('snapshot-'))
+    for name in versions[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+    return path
+
+class AnalyticsSnapshot:
+    """Read-only view of one snapshot; columns are memory-mapped on first use"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.created_at = datetime.fromisoformat(self.meta['created_at'])
+        self._columns = {}
+
+    def rows(self, table):
+        return self.meta['tables'][table]['rows']
+
+    def column(self, table, name):
+        key = f'{table}.{name}'
+        if key not in self._columns:
+            self._columns[key] = np.load(os.path.join(self.path, f'{key}.npy'), mmap_mode='r')
+        return self._columns[key]
+
+    def vocabulary(self, table, name):
+        return self.meta['tables'][table]['vocabularies'].get(name, [])
+
+    def since(self, table, name, start, end=None):
+        """Mask of rows whose datetime column falls in [start, end]"""
+        values = self.column(table, name)
+        mask = values >= np.datetime64(start, 'ms')
+        if end is not None:
+            mask &= values <= np.datetime64(end, 'ms')
+        return mask
+
+    def equals(self, table, name, label):
+        """Mask of rows whose categorical column has the given label"""
+        labels = self.vocabulary(table, name)
+        if label not in labels:
+            return np.zeros(self.rows(table), dtype=bool)
+        return np.asarray(self.column(table, name)) == labels.index(label)
+
+    def mean(self, table, name, mask=None):
+        values = self.column(table, name)
+        values = values[mask] if mask is not None else values
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) else None
+
+    def group(self, table, key, value=None, mask=None):
+        """Group rows by a categorical column: count, and mean/max of an optional float column"""
+        labels = self.vocabulary(table, key)
+        codes = np.asarray(self.column(table, key))
+        selected = codes >= 0
+        if mask is not None:
+            selected &= mask
+        codes = codes[selected]
+
+        counts = np.bincount(codes, minlength=len(labels))
+        groups = []
+        if value is None:
+            for code, label in enumerate(labels):
+                if counts[code]:
+                    groups.append({'key': label, 'count': int(counts[code])})
+            return groups
+
+        values = np.asarray(self.column(table, value))[selected]
+        present = ~np.isnan(values)
+        sums = np.bincount(codes[present], weights=values[present], minlength=len(labels))
+        value_counts = np.bincount(codes[present], minlength=len(labels))
+        maxima = np.full(len(labels), -np.inf)
+        np.maximum.at(maxima, codes[present], values[present])
+
+        for code, label in enumerate(labels):
+            if counts[code]:
+                has_values = value_counts[code] > 0
+                groups.append({
+                    'key': label,
+                    'count': int(counts[code]),
+                    'avg': float(sums[code] / value_counts[code]) if has_values else None,
+                    'max': float(maxima[code]) if has_values else None
+                })
+        return groups
+
+    def top(self, table, name, limit):
+        """Row indexes of the largest values of a float column, largest first"""
+        values = np.nan_to_num(np.asarray(self.column(table, name)), nan=-np.inf)
+        if len(values) > limit:
+            indexes = np.argpartition(values, -limit)[-limit:]
+        else:
+            indexes = np.arange(len(values))
+        return indexes[np.argsort(-values[indexes], kind='stable')]
+
+_lock = threading.Lock()
+_current = None
+
+class SnapshotUnavailable(Exception):
+    """No snapshot has been published yet (the report worker builds one at startup)"""
+
+def get_snapshot():
+    """Latest published snapshot; raises SnapshotUnavailable until the first build is published"""
+    global _current
+    pointer = os.path.join(SNAPSHOT_DIR, 'CURRENT')
+    if not os.path.exists(pointer):
+        raise SnapshotUnavailable('Analytics are still being prepared, try again in a minute')
+
+    with open(pointer) as f:
+        path = os.path.join(SNAPSHOT_DIR, f.read().strip())
+
+    with _lock:
+        if _current is None or _current.path != path:
+            snapshot = AnalyticsSnapshot(path)
+            if set(TABLES) - set(snapshot.meta['tables']):
+                # Built before a table was added; the report worker rebuilds it at startup
+                raise SnapshotUnavailable('Analytics are still being prepared, try again in a minute')
+            _current = snapshot
+        return _current
@@ -0,0 +1,29 @@
+import os
+import threading
+
+# Background loops already started, keyed by (name, pid) so forked workers start their own
+_started = {}
+_lock = threading.Lock()
+
+def start_periodic(name, interval, task):
+    """Run task every interval seconds in a background task (once per worker process)"""
+    key = (name, os.getpid())
+    if key in _started:
+        return
+    
+    with _lock:
+        if key in _started:
+            return
+        
+        # Imported lazily: the Socket.IO server picks the right async mode (eventlet/threading)
+        from websocket_service import socketio
+        
+        def loop():
+            while True:
+                socketio.sleep(interval)
+                try:
+                    task()
+                except Exception as e:
+                    print(f"Background task '{name}' failed: {e}")
+        
+        _started[key] = socketio.start_background_task(loop)
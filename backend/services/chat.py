@@ -0,0 +1,187 @@
+from models.chat import ChatMessage
+from services.background import start_periodic
+from services.cache import TTLCache
+from collections import OrderedDict, deque
+from datetime import datetime
+from bson import ObjectId
+import os
+import threading
+import time
+
+CHAT_RATE = float(os.getenv('CHAT_RATE_PER_SECOND', 1))         # sustained messages per sender per room
+CHAT_BURST = int(os.getenv('CHAT_BURST', 5))                     # messages a sender may send at once
+CHAT_MAX_LENGTH = int(os.getenv('CHAT_MAX_LENGTH', 500))         # characters
+CHAT_HISTORY = int(os.getenv('CHAT_HISTORY_SIZE', 50))           # messages kept per room
+CHAT_HISTORY_ROOMS = int(os.getenv('CHAT_HISTORY_ROOMS', 1000))  # rooms kept in memory per worker
+CHAT_HISTORY_REFRESH = float(os.getenv('CHAT_HISTORY_REFRESH_SECONDS', 30))  # reload to pick up other workers
+CHAT_FLUSH_INTERVAL = float(os.getenv('CHAT_FLUSH_INTERVAL', 2))  # seconds between batched inserts
+CHAT_NAME_TTL = int(os.getenv('CHAT_NAME_TTL', 300))             # seconds a display name is cached
+
+class RateLimited(Exception):
+    """Sender is out of tokens; retry_after is in seconds"""
+    def __init__(self, retry_after):
+        super().__init__('Sending too fast')
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def full(self):
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+class RoomHistory:
+    def __init__(self, messages, loaded_at):
+        self.messages = deque(messages, maxlen=CHAT_HISTORY)
+        self.loaded_at = loaded_at
+
+class ChatService:
+    """Chat for game session rooms.
+
+    Display names come from a TTL cache, each sender gets a token bucket per
+    room, and every room keeps its last CHAT_HISTORY messages in a ring
+    buffer for late joiners. Messages are written to chat_messages in one
+    insert_many per flush. With several workers a room's buffer only sees
+    this worker's messages as they happen, so it is reloaded from Mongo
+    (plus unflushed messages) when older than CHAT_HISTORY_REFRESH_SECONDS.
+    """
+    def __init__(self, flush_interval=CHAT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._names = TTLCache(ttl=CHAT_NAME_TTL, max_entries=10000)
+        self._buckets = {}             # (room, user_id) -> TokenBucket
+        self._history = OrderedDict()  # room -> RoomHistory, least recently used first
+        self._pending = []             # documents waiting for the next insert_many
+        self._flushing = []            # documents being inserted right now
+        self._rate_limited = 0
+        self._written = 0
+
+    def name_for(self, user_id):
+        name = self._names.get(user_id)
+        if name is None:
+            from models.user import User
+            name = User.get_names([user_id]).get(user_id) or 'Unknown'
+            self._names.set(user_id, name)
+        return name
+
+    @staticmethod
+    def to_event(message):
+        """Socket payload for a stored message"""
+        return {
+            'session_id': message['session_id'],
+            'message': message['message'],
+            'user_id': message['user_id'],
+            'user_name': message['user_name'],
+            'timestamp': message['created_at'],
+            'message_id': str(message['_id'])
+        }
+
+    def post(self, room, user_id, text):
+        """Accept a message from an authenticated sender; returns the message to broadcast.
+
+        Raises ValueError for empty or oversized messages and RateLimited when
+        the sender's bucket for this room is empty.
+        """
+        text = (text or '').strip() if isinstance(text, str) else ''
+        if not text:
+            raise ValueError('Message is empty')
+        if len(text) > CHAT_MAX_LENGTH:
+            raise ValueError(f'Message is longer than {CHAT_MAX_LENGTH} characters')
+
+        with self._lock:
+            bucket = self._buckets.get((room, user_id))
+            if bucket is None:
+                bucket = self._buckets[(room, user_id)] = TokenBucket(CHAT_RATE, CHAT_BURST)
+            retry_after = bucket.take()
+            if retry_after:
+                self._rate_limited += 1
+                raise RateLimited(round(retry_after, 2))
+
+        message = {
+            '_id': ObjectId(),
+            'session_id': room,
+            'user_id': user_id,
+            'user_name': self.name_for(user_id),
+            'message': text,
+            'created_at': datetime.utcnow()
+        }
+        with self._lock:
+            history = self._history.get(room)
+            if history is not None:
+                history.messages.append(message)
+                self._history.move_to_end(room)
+            self._pending.append(message)
+
+        start_periodic('chat_flush', self.flush_interval, self.flush)
+        return message
+
+    def history(self, room):
+        """Recent messages for a room, oldest first"""
+        with self._lock:
+            history = self._history.get(room)
+            if history is not None and time.monotonic() - history.loaded_at < CHAT_HISTORY_REFRESH:
+                self._history.move_to_end(room)
+                return list(history.messages)
+
+        stored = ChatMessage.get_recent(room, CHAT_HISTORY)
+        with self._lock:
+            # Messages accepted here but not flushed yet are not in Mongo
+            seen = {message['_id'] for message in stored}
+            unsaved = [message for message in self._flushing + self._pending
+                       if message['session_id'] == room and message['_id'] not in seen]
+            messages = sorted(stored + unsaved, key=lambda message: (message['created_at'], message['_id']))
+            history = self._history[room] = RoomHistory(messages, time.monotonic())
+            self._history.move_to_end(room)
+            while len(self._history) > CHAT_HISTORY_ROOMS:
+                self._history.popitem(last=False)
+            return list(history.messages)
+
+    def flush(self):
+        """Write pending messages in one batch and drop idle rate-limit buckets"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._flushing = pending
+            for key in [key for key, bucket in self._buckets.items() if bucket.full()]:
+                del self._buckets[key]
+
+        if not pending:
+            return 0
+        try:
+            written = ChatMessage.insert_many(pending)
+        except Exception as e:
+            print(f"Error saving chat messages: {e}")
+            with self._lock:
+                # Keep them for the next flush, bounded so a long outage cannot grow memory forever
+                self._pending = (pending + self._pending)[-CHAT_HISTORY * CHAT_HISTORY_ROOMS:]
+                self._flushing = []
+            return 0
+
+        with self._lock:
+            self._flushing = []
+            self._written += written
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._history),
+                'senders': len(self._buckets),
+                'pending': len(self._pending),
+                'written': self._written,
+                'rate_limited': self._rate_limited
+            }
+
+chat_service = ChatService()
@@ -0,0 +1,265 @@
+"""Chess move validation for live matches.
+
+Positions are 64-character lists indexed rank * 8 + file (a1 = 0, h8 = 63),
+white pieces upper case, black lower case and '.' for empty squares. Moves
+use UCI notation (e2e4, e7e8q, e1g1 for castling).
+"""
+
+FILES = 'abcdefgh'
+START_BOARD = list('RNBQKBNR' + 'P' * 8 + '.' * 32 + 'p' * 8 + 'rnbqkbnr')
+
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+PROMOTIONS = 'qrbn'
+
+# Castling: right -> (king from, king to, rook from, rook to, squares that must be empty)
+CASTLING = {
+    'K': (4, 6, 7, 5, (5, 6)),
+    'Q': (4, 2, 0, 3, (1, 2, 3)),
+    'k': (60, 62, 63, 61, (61, 62)),
+    'q': (60, 58, 56, 59, (57, 58, 59))
+}
+# Squares whose rook or king moving (or being captured) removes a castling right
+CASTLING_SQUARES = {0: 'Q', 4: 'KQ', 7: 'K', 56: 'q', 60: 'kq', 63: 'k'}
+
+def square_name(index):
+    return f'{FILES[index % 8]}{index // 8 + 1}'
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in FILES or name[1] not in '12345678':
+        raise ValueError(f'Invalid square: {name}')
+    return (int(name[1]) - 1) * 8 + FILES.index(name[0])
+
+def parse_move(move):
+    """UCI string -> (from, to, promotion or None)"""
+    if not isinstance(move, str) or len(move) not in (4, 5):
+        raise ValueError(f'Invalid move: {move}')
+    promotion = move[4].lower() if len(move) == 5 else None
+    if promotion is not None and promotion not in PROMOTIONS:
+        raise ValueError(f'Invalid promotion: {move}')
+    return parse_square(move[:2]), parse_square(move[2:4]), promotion
+
+def is_white(piece):
+    return piece.isupper()
+
+def on_board(file, rank):
+    return 0 <= file < 8 and 0 <= rank < 8
+
+class ChessPosition:
+    """A position plus the state needed to validate the next move"""
+    __slots__ = ('board', 'white_to_move', 'castling', 'en_passant', 'halfmove', 'fullmove')
+
+    def __init__(self):
+        self.board = list(START_BOARD)
+        self.white_to_move = True
+        self.castling = 'KQkq'
+        self.en_passant = None
+        self.halfmove = 0
+        self.fullmove = 1
+
+    def copy(self):
+        other = ChessPosition.__new__(ChessPosition)
+        other.board = list(self.board)
+        other.white_to_move = self.white_to_move
+        other.castling = self.castling
+        other.en_passant = self.en_passant
+        other.halfmove = self.halfmove
+        other.fullmove = self.fullmove
+        return other
+
+    def own(self, piece):
+        return piece != '.' and is_white(piece) == self.white_to_move
+
+    def attacked(self, square, by_white):
+        """Whether side by_white attacks square"""
+        board = self.board
+        file, rank = square % 8, square // 8
+
+        pawn_rank = rank - 1 if by_white else rank + 1
+        pawn = 'P' if by_white else 'p'
+        for df in (-1, 1):
+            if on_board(file + df, pawn_rank) and board[pawn_rank * 8 + file + df] == pawn:
+                return True
+
+        knight, king = ('N', 'K') if by_white else ('n', 'k')
+        for steps, piece in ((KNIGHT_STEPS, knight), (KING_STEPS, king)):
+            for df, dr in steps:
+                if on_board(file + df, rank + dr) and board[(rank + dr) * 8 + file + df] == piece:
+                    return True
+
+        for directions, sliders in ((ROOK_DIRECTIONS, 'RQ'), (BISHOP_DIRECTIONS, 'BQ')):
+            if not by_white:
+                sliders = sliders.lower()
+            for df, dr in directions:
+                f, r = file + df, rank + dr
+                while on_board(f, r):
+                    piece = board[r * 8 + f]
+                    if piece != '.':
+                        if piece in sliders:
+                            return True
+                        break
+                    f, r = f + df, r + dr
+        return False
+
+    def king_square(self, white):
+        return self.board.index('K' if white else 'k')
+
+    def in_check(self):
+        return self.attacked(self.king_square(self.white_to_move), not self.white_to_move)
+
+    def pseudo_moves(self):
+        """Moves for the side to move, ignoring whether they leave the king in check"""
+        board = self.board
+        white = self.white_to_move
+        for square, piece in enumerate(board):
+            if not self.own(piece):
+                continue
+            file, rank = square % 8, square // 8
+            kind = piece.upper()
+
+            if kind == 'P':
+                step = 8 if white else -8
+                start_rank, last_rank = (1, 7) if white else (6, 0)
+                targets = []
+                ahead = square + step
+                if 0 <= ahead < 64 and board[ahead] == '.':
+                    targets.append(ahead)
+                    if rank == start_rank and board[ahead + step] == '.':
+                        targets.append(ahead + step)
+                for df in (-1, 1):
+                    if on_board(file + df, rank + (1 if white else -1)):
+                        target = ahead + df
+                        if (board[target] != '.' and not self.own(board[target])) or target == self.en_passant:
+                            targets.append(target)
+                for target in targets:
+                    if target // 8 == last_rank:
+                        for promotion in PROMOTIONS:
+                            yield square, target, promotion
+                    else:
+                        yield square, target, None
+
+            elif kind in 'NK':
+                for df, dr in (KNIGHT_STEPS if kind == 'N' else KING_STEPS):
+                    if on_board(file + df, rank + dr):
+                        target = (rank + dr) * 8 + file + df
+                        if not self.own(board[target]):
+                            yield square, target, None
+                if kind == 'K':
+                    for right in self.castling:
+                        if right.isupper() != white:
+                            continue
+                        king_from, king_to, rook_from, _, empty = CASTLING[right]
+                        if square == king_from and all(board[s] == '.' for s in empty):
+                            yield square, king_to, None
+
+            else:
+                directions = {'R': ROOK_DIRECTIONS, 'B': BISHOP_DIRECTIONS}.get(kind, ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+                for df, dr in directions:
+                    f, r = file + df, rank + dr
+                    while on_board(f, r):
+                        target = r * 8 + f
+                        if board[target] == '.':
+                            yield square, target, None
+                        else:
+                            if not self.own(board[target]):
+                                yield square, target, None
+                            break
+                        f, r = f + df, r + dr
+
+    def _castle_through_check(self, origin, target):
+        # The king may not castle out of, through or into check
+        step = 1 if target > origin else -1
+        return any(self.attacked(s, not self.white_to_move) for s in (origin, origin + step, target))
+
+    def is_legal(self, origin, target, promotion):
+        if (origin, target, promotion) not in set(self.pseudo_moves()):
+            return False
+        if self.board[origin].upper() == 'K' and abs(target - origin) == 2 and self._castle_through_check(origin, target):
+            return False
+        after = self.copy()
+        after._apply(origin, target, promotion)
+        return not after.attacked(after.king_square(self.white_to_move), after.white_to_move)
+
+    def has_legal_move(self):
+        for origin, target, promotion in self.pseudo_moves():
+            if self.board[origin].upper() == 'K' and abs(target - origin) == 2 and self._castle_through_check(origin, target):
+                continue
+            after = self.copy()
+            after._apply(origin, target, promotion)
+            if not after.attacked(after.king_square(self.white_to_move), after.white_to_move):
+                return True
+        return False
+
+    def push(self, move):
+        """Validate and play a UCI move; raises ValueError if it is illegal"""
+        origin, target, promotion = parse_move(move)
+        if not self.own(self.board[origin]):
+            raise ValueError(f'No piece of yours on {square_name(origin)}')
+        if self.board[origin].upper() == 'P' and target // 8 in (0, 7) and promotion is None:
+            promotion = 'q'
+        if not self.is_legal(origin, target, promotion):
+            raise ValueError(f'Illegal move: {move}')
+        self._apply(origin, target, promotion)
+        return square_name(origin) + square_name(target) + (promotion or '')
+
+    def _apply(self, origin, target, promotion):
+        board = self.board
+        piece = board[origin]
+        white = is_white(piece)
+        capture = board[target] != '.'
+
+        if piece.upper() == 'P' and target == self.en_passant:
+            board[target - 8 if white else target + 8] = '.'
+            capture = True
+        if piece.upper() == 'K' and abs(target - origin) == 2:
+            for right, (king_from, king_to, rook_from, rook_to, _) in CASTLING.items():
+                if king_from == origin and king_to == target:
+                    board[rook_to], board[rook_from] = board[rook_from], '.'
+
+        board[target] = piece
+        board[origin] = '.'
+        if promotion:
+            board[target] = promotion.upper() if white else promotion
+
+        lost = CASTLING_SQUARES.get(origin, '') + CASTLING_SQUARES.get(target, '')
+        if lost:
+            self.castling = ''.join(right for right in self.castling if right not in lost)
+        self.en_passant = (origin + target) // 2 if piece.upper() == 'P' and abs(target - origin) == 16 else None
+        self.halfmove = 0 if capture or piece.upper() == 'P' else self.halfmove + 1
+        if not white:
+            self.fullmove += 1
+        self.white_to_move = not white
+
+    def insufficient_material(self):
+        pieces = [piece for piece in self.board if piece not in '.Kk']
+        return not pieces or (len(pieces) == 1 and pieces[0] in 'NBnb')
+
+    def outcome(self):
+        """(result, reason) once the game is over, else None; result is 'white', 'black' or 'draw'"""
+        if not self.has_legal_move():
+            if self.in_check():
+                return ('black' if self.white_to_move else 'white'), 'checkmate'
+            return 'draw', 'stalemate'
+        if self.halfmove >= 100:
+            return 'draw', 'fifty_move_rule'
+        if self.insufficient_material():
+            return 'draw', 'insufficient_material'
+        return None
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for piece in self.board[rank * 8:rank * 8 + 8]:
+                if piece == '.':
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                row += piece
+            rows.append(row + (str(empty) if empty else ''))
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else '-'
+        return (f"{'/'.join(rows)} {'w' if self.white_to_move else 'b'} {self.castling or '-'} "
+                f"{en_passant} {self.halfmove} {self.fullmove}")
@@ -0,0 +1,126 @@
+"""NxN cube state and move validation for live matches.
+
+A cube is a bytes object of 6 * n * n sticker colours, faces in FACES
+order. Every move is a precomputed sticker permutation (shared by all
+matches on a worker), so applying one is a single pass over the stickers.
+Moves use standard notation: R U' F2, wide moves Rw or 3Rw, and whole-cube
+rotations x y z.
+"""
+import random
+import re
+
+FACES = 'URFDLB'
+SIZES = range(2, 9)
+
+# face -> (axis, sign) of its outward normal; x = 0, y = 1, z = 2
+FACE_AXES = {'U': (1, 1), 'D': (1, -1), 'R': (0, 1), 'L': (0, -1), 'F': (2, 1), 'B': (2, -1)}
+ROTATION_AXES = {'x': 'R', 'y': 'U', 'z': 'F'}
+MOVE_PATTERN = re.compile(r"^(?:(\d)?([URFDLB])(w)?|([xyz]))(2|')?$")
+SCRAMBLE_LENGTHS = {2: 11, 3: 20, 4: 40}
+
+_stickers = {}  # size -> (stickers, index)
+_moves = {}     # (size, move) -> permutation
+
+def cube_size(cube_type):
+    """Layers of an NxN cube type ('3x3' -> 3); raises ValueError for other puzzles"""
+    match = re.match(r'^(\d)x(\d)$', cube_type or '3x3')
+    if not match or match.group(1) != match.group(2) or int(match.group(1)) not in SIZES:
+        raise ValueError(f'Live matches support 2x2 to 8x8 cubes, not {cube_type}')
+    return int(match.group(1))
+
+def solved_state(size):
+    return bytes(face for face in range(6) for _ in range(size * size))
+
+def is_solved(state, size):
+    area = size * size
+    return all(state[face * area:(face + 1) * area].count(state[face * area]) == area for face in range(6))
+
+def _rotate(vector, axis, quarter_turns):
+    # Clockwise quarter turns seen from the + end of axis
+    x, y, z = vector
+    for _ in range(quarter_turns % 4):
+        if axis == 0:
+            x, y, z = x, z, -y
+        elif axis == 1:
+            x, y, z = -z, y, x
+        else:
+            x, y, z = y, -x, z
+    return x, y, z
+
+def _layout(size):
+    """Sticker list [(cubie centre, normal)] in state order, and its reverse index"""
+    if size not in _stickers:
+        coords = range(-(size - 1), size, 2)
+        stickers = []
+        for face in FACES:
+            axis, sign = FACE_AXES[face]
+            normal = tuple(sign if i == axis else 0 for i in range(3))
+            for a in coords:
+                for b in coords:
+                    centre = [a, b]
+                    centre.insert(axis, sign * (size - 1))
+                    stickers.append((tuple(centre), normal))
+        _stickers[size] = (stickers, {sticker: index for index, sticker in enumerate(stickers)})
+    return _stickers[size]
+
+def permutation(size, move):
+    """Sticker permutation for a move: new_state[i] = state[perm[i]]"""
+    key = (size, move)
+    if key in _moves:
+        return _moves[key]
+
+    match = MOVE_PATTERN.match(move)
+    if not match:
+        raise ValueError(f'Invalid move: {move}')
+    depth, face, wide, rotation, modifier = match.groups()
+    if rotation:
+        face, layers = ROTATION_AXES[rotation], size
+    else:
+        layers = int(depth) if depth else (2 if wide else 1)
+        if depth and not wide:
+            raise ValueError(f'Invalid move: {move}')
+        if layers > size:
+            raise ValueError(f'Move {move} turns more layers than a {size}x{size} has')
+
+    axis, sign = FACE_AXES[face]
+    quarter_turns = {None: 1, "'": 3, '2': 2}[modifier]
+    if sign < 0:
+        quarter_turns = 4 - quarter_turns  # clockwise seen from the - end
+    limit = (size - 1) - 2 * (layers - 1)
+
+    stickers, index = _layout(size)
+    perm = list(range(len(stickers)))
+    for source, (centre, normal) in enumerate(stickers):
+        if centre[axis] * sign >= limit:
+            target = index[(_rotate(centre, axis, quarter_turns), _rotate(normal, axis, quarter_turns))]
+            perm[target] = source
+    _moves[key] = perm
+    return perm
+
+def apply_move(state, size, move):
+    return bytes(map(state.__getitem__, permutation(size, move)))
+
+def scramble(size, seed):
+    """Random outer-face scramble, reproducible from seed"""
+    rng = random.Random(seed)
+    moves, last_axis = [], None
+    for _ in range(SCRAMBLE_LENGTHS.get(size, 60)):
+        face = rng.choice([face for face in FACES if FACE_AXES[face][0] != last_axis])
+        last_axis = FACE_AXES[face][0]
+        depth = rng.randint(1, size // 2) if size > 3 else 1
+        suffix = rng.choice(('', "'", '2'))
+        if depth == 1:
+            moves.append(face + suffix)
+        else:
+            moves.append(f"{depth if depth > 2 else ''}{face}w{suffix}")
+    return moves
+
+def scrambled_state(size, moves):
+    state = solved_state(size)
+    for move in moves:
+        state = apply_move(state, size, move)
+    return state
+
+def facelets(state):
+    """State as a URFDLB colour string"""
+    return ''.join(FACES[colour] for colour in state)
@@ -0,0 +1,124 @@
+from models.database import get_db
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+import os
+import threading
+
+REFRESH_INTERVAL = float(os.getenv('DASHBOARD_REFRESH_INTERVAL', 30))  # seconds a snapshot is fresh
+REFRESH_LEASE = float(os.getenv('DASHBOARD_REFRESH_LEASE', 60))        # seconds one worker may take to recompute
+SNAPSHOT_ID = 'current'
+
+# Windows for "users active since" counts used by the analytics time-range filter
+ACTIVE_WINDOWS = {
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+    'month': timedelta(days=30),
+    'quarter': timedelta(days=90),
+    'year': timedelta(days=365)
+}
+
+class DashboardMetrics:
+    """Headline numbers shared by the admin and developer dashboards.
+
+    One snapshot in the dashboard_metrics collection serves every worker.
+    It is only recomputed when someone asks for it after it went stale, and
+    then only by the worker that takes the refresh lease; the others keep
+    serving the previous snapshot meanwhile.
+    """
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._metrics = None
+
+    def _fresh(self, metrics, now):
+        return metrics is not None and now - metrics['computed_at'] < timedelta(seconds=self.refresh_interval)
+
+    def get(self):
+        """Latest metrics, recomputed (by one worker) only when the shared snapshot is stale"""
+        now = datetime.utcnow()
+        metrics = self._metrics
+        if self._fresh(metrics, now):
+            return metrics
+
+        db = get_db()
+        snapshot = db.dashboard_metrics.find_one({"_id": SNAPSHOT_ID})
+        if snapshot and snapshot.get('metrics'):
+            metrics = snapshot['metrics']
+            with self._lock:
+                self._metrics = metrics
+            if self._fresh(metrics, now):
+                return metrics
+
+        if self._claim_refresh(now):
+            return self.refresh()
+        # Another worker is recomputing; the stale snapshot will do until then
+        return metrics if metrics is not None else self.refresh(publish=False)
+
+    def _claim_refresh(self, now):
+        """Take the refresh lease; False if another worker holds it"""
+        db = get_db()
+        try:
+            db.dashboard_metrics.find_one_and_update(
+                {"_id": SNAPSHOT_ID, "$or": [{"refresh_until": None}, {"refresh_until": {"$lt": now}}]},
+                {"$set": {"refresh_until": now + timedelta(seconds=REFRESH_LEASE)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def refresh(self, publish=True):
+        """Recompute every metric (a handful of estimated counts and two aggregations) and share the snapshot"""
+        db = get_db()
+        now = datetime.utcnow()
+
+        # Whole-collection totals don't need to be exact; read them from collection metadata
+        metrics = {
+            'total_users': db.users.estimated_document_count(),
+            'total_quizzes': db.quizzes.estimated_document_count(),
+            'total_games': db.games.estimated_document_count(),
+            'total_tournaments': db.tournaments.estimated_document_count(),
+            'total_matches': db.matches.estimated_document_count()
+        }
+
+        # One pass over users for the filtered counts and the IQ average
+        user_group = {
+            "_id": None,
+            "active_users": {"$sum": {"$cond": [{"$eq": ["$is_active", True]}, 1, 0]}},
+            "average_iq": {"$avg": "$iq_score"}
+        }
+        for name, window in ACTIVE_WINDOWS.items():
+            user_group[f"logged_in_{name}"] = {"$sum": {"$cond": [{"$gte": ["$last_login", now - window]}, 1, 0]}}
+
+        users = list(db.users.aggregate([
+            {"$project": {"is_active": 1, "iq_score": 1, "last_login": 1}},
+            {"$group": user_group}
+        ]))
+        users = users[0] if users else {}
+
+        quizzes = list(db.quizzes.aggregate([
+            {"$group": {"_id": None, "total_attempts": {"$sum": "$total_attempts"}, "average_score": {"$avg": "$average_score"}}}
+        ]))
+        quizzes = quizzes[0] if quizzes else {}
+
+        metrics.update({
+            'active_users': users.get('active_users', 0),
+            'recent_users': users.get('logged_in_month', 0),
+            'logged_in': {name: users.get(f'logged_in_{name}', 0) for name in ACTIVE_WINDOWS},
+            'average_iq': round(users.get('average_iq') or 0, 1),
+            'total_attempts': quizzes.get('total_attempts', 0),
+            'average_score': round(quizzes.get('average_score') or 0, 1),
+            'computed_at': now
+        })
+
+        with self._lock:
+            self._metrics = metrics
+        if publish:
+            db.dashboard_metrics.update_one(
+                {"_id": SNAPSHOT_ID},
+                {"$set": {"metrics": metrics, "refresh_until": None}},
+                upsert=True
+            )
+        return metrics
+
+dashboard_metrics = DashboardMetrics()
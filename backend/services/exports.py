@@ -0,0 +1,150 @@
+from models.database import get_db
+from models.quiz import Quiz
+from models.user import User
+from openpyxl import Workbook
+import csv
+import io
+import os
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))  # documents per cursor batch
+CSV_FLUSH_ROWS = 500                                           # rows buffered per CSV chunk
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+def user_rows():
+    """Rows for the users export, read through a projected cursor"""
+    db = get_db()
+    cursor = db.users.find({}, {
+        "name": 1, "email": 1, "username": 1, "role": 1, "iq_score": 1, "badge_level": 1,
+        "total_quizzes": 1, "total_games": 1, "is_active": 1, "created_at": 1, "last_login": 1
+    }).batch_size(EXPORT_BATCH_SIZE)
+
+    for user in cursor:
+        yield [
+            str(user['_id']),
+            user.get('name', ''),
+            user.get('email', ''),
+            user.get('username', ''),
+            user.get('role', ''),
+            user.get('iq_score', 0),
+            user.get('badge_level', ''),
+            user.get('total_quizzes', 0),
+            user.get('total_games', 0),
+            user.get('is_active', True),
+            format_datetime(user.get('created_at')),
+            format_datetime(user.get('last_login'))
+        ]
+
+def quiz_result_rows():
+    """Rows for the quiz results export; titles and names are loaded once up front"""
+    db = get_db()
+
+    # Pre-pass: a fixed number of queries however many attempts there are
+    quiz_titles = {
+        quiz_id: summary['title']
+        for quiz_id, summary in Quiz.get_summaries(db.quiz_attempts.distinct('quiz_id')).items()
+    }
+    user_names = User.get_names(db.quiz_attempts.distinct('user_id'))
+
+    cursor = db.quiz_attempts.find({}, {
+        "quiz_id": 1, "user_id": 1, "score": 1, "percentage": 1,
+        "time_taken": 1, "status": 1, "created_at": 1
+    }).batch_size(EXPORT_BATCH_SIZE)
+
+    for attempt in cursor:
+        yield [
+            str(attempt['_id']),
+            quiz_titles.get(attempt.get('quiz_id')) or 'Unknown',
+            user_names.get(attempt.get('user_id')) or 'Unknown',
+            attempt.get('score', 0),
+            attempt.get('percentage', 0),
+            attempt.get('time_taken', 0),
+            attempt.get('status', ''),
+            format_datetime(attempt.get('created_at'))
+        ]
+
+def iq_analytics_rows():
+    """Rows for the IQ analytics export, one per performance history entry"""
+    db = get_db()
+    cursor = db.users.find(
+        {"performance_history": {"$exists": True, "$ne": []}},
+        {"name": 1, "performance_history": 1}
+    ).batch_size(EXPORT_BATCH_SIZE)
+
+    for user in cursor:
+        for entry in user.get('performance_history', []):
+            yield [
+                str(user['_id']),
+                user.get('name', 'Unknown'),
+                format_datetime(entry.get('date')),
+                entry.get('raw_score', 0),
+                entry.get('iq_score', 0),
+                entry.get('badge_level', ''),
+                entry.get('quiz_difficulty', ''),
+                entry.get('z_score', 0)
+            ]
+
+# export type -> (column headers, row generator)
+EXPORTS = {
+    'users': (
+        ['ID', 'Name', 'Email', 'Username', 'Role', 'IQ Score', 'Badge Level',
+         'Total Quizzes', 'Total Games', 'Is Active', 'Created At', 'Last Login'],
+        user_rows
+    ),
+    'quiz_results': (
+        ['Attempt ID', 'Quiz Title', 'User Name', 'Score', 'Percentage',
+         'Time Taken (seconds)', 'Status', 'Created At'],
+        quiz_result_rows
+    ),
+    'iq_analytics': (
+        ['User ID', 'User Name', 'Date', 'Raw Score', 'IQ Score',
+         'Badge Level', 'Quiz Difficulty', 'Z Score'],
+        iq_analytics_rows
+    )
+}
+
+def stream_csv(headers, rows):
+    """Yield CSV output in chunks of CSV_FLUSH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_FLUSH_ROWS:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue().encode('utf-8')
+
+def write_xlsx(headers, rows, path, sheet_name='Data'):
+    """Write rows to an XLSX file in openpyxl write-only mode (rows are not kept in memory)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+def stream_export(export_type):
+    """CSV chunk generator for an export, or None if the type is unknown.
+
+    XLSX is a zip archive that can only be written once every row is in, so
+    it can't be streamed; XLSX exports run as report jobs (see
+    services/report_worker.py) and are downloaded once built.
+    """
+    if export_type not in EXPORTS:
+        return None
+
+    headers, rows = EXPORTS[export_type]
+    return stream_csv(headers, rows())
@@ -0,0 +1,129 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import traceback
+
+HANDLER_WORKERS = int(os.getenv('SOCKET_HANDLER_WORKERS', 16))          # concurrent handler runs per process
+HANDLER_QUEUE_LIMIT = int(os.getenv('SOCKET_HANDLER_QUEUE_LIMIT', 1000)) # queued runs per process
+KEY_QUEUE_LIMIT = int(os.getenv('SOCKET_HANDLER_KEY_QUEUE_LIMIT', 32))   # queued runs per connection
+DRAIN_BATCH = 8                # runs per key before yielding the pool slot to other keys
+LATENCY_SAMPLES = 1000         # recent samples kept per handler for percentiles
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+class HandlerMetrics:
+    """Counters and recent wait/run times (seconds) for one handler"""
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait = deque(maxlen=LATENCY_SAMPLES)
+        self.run = deque(maxlen=LATENCY_SAMPLES)
+
+    def to_dict(self):
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'wait_ms': {'p50': percentile(self.wait, 0.5), 'p95': percentile(self.wait, 0.95)},
+            'run_ms': {
+                'p50': percentile(self.run, 0.5),
+                'p95': percentile(self.run, 0.95),
+                'p99': percentile(self.run, 0.99),
+                'max': round(max(self.run) * 1000, 2) if self.run else None
+            }
+        }
+
+class KeyedExecutor:
+    """Bounded pool that runs tasks for the same key one at a time, in submission order.
+
+    Different keys (Socket.IO connections) run concurrently up to `workers`;
+    submit() refuses work once the per-key or total queue is full so callers
+    can push back instead of piling up.
+    """
+    def __init__(self, workers=HANDLER_WORKERS, queue_limit=HANDLER_QUEUE_LIMIT, key_queue_limit=KEY_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.key_queue_limit = key_queue_limit
+        self._lock = threading.Lock()
+        self._pool = None
+        self._queues = {}   # key -> deque of (name, fn, args, queued_at)
+        self._pending = 0
+        self._metrics = {}  # name -> HandlerMetrics
+
+    def submit(self, key, name, fn, *args):
+        """Queue fn(*args) behind earlier work for key; returns False when over capacity"""
+        with self._lock:
+            metrics = self._metrics.setdefault(name, HandlerMetrics())
+            queue = self._queues.get(key)
+            if self._pending >= self.queue_limit or (queue is not None and len(queue) >= self.key_queue_limit):
+                metrics.rejected += 1
+                return False
+
+            self._pending += 1
+            if queue is None:
+                # No drain running for this key yet
+                queue = self._queues[key] = deque()
+                queue.append((name, fn, args, time.monotonic()))
+                self._executor().submit(self._drain, key)
+            else:
+                queue.append((name, fn, args, time.monotonic()))
+            return True
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='socket-handler')
+        return self._pool
+
+    def _drain(self, key):
+        for _ in range(DRAIN_BATCH):
+            with self._lock:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    return
+                name, fn, args, queued_at = queue[0]
+
+            started = time.monotonic()
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"Socket handler '{name}' failed: {e}")
+                traceback.print_exc()
+            finished = time.monotonic()
+
+            with self._lock:
+                queue.popleft()
+                self._pending -= 1
+                metrics = self._metrics[name]
+                metrics.wait.append(started - queued_at)
+                metrics.run.append(finished - started)
+                if failed:
+                    metrics.failed += 1
+                else:
+                    metrics.completed += 1
+                if not queue:
+                    self._queues.pop(key, None)
+                    return
+
+        # Still busy: requeue behind other connections instead of holding the slot
+        self._executor().submit(self._drain, key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'busy_connections': len(self._queues),
+                'handlers': {name: metrics.to_dict() for name, metrics in self._metrics.items()}
+            }
+
+handler_executor = KeyedExecutor()
@@ -0,0 +1,170 @@
+from models.database import get_db
+from services.background import start_periodic
+from bson import ObjectId
+from datetime import datetime
+import os
+import threading
+
+LEADERBOARD_TICK = float(os.getenv('LEADERBOARD_TICK_MS', 500)) / 1000   # seconds between pushes
+LEADERBOARD_TOP_K = int(os.getenv('LEADERBOARD_TOP_K', 10))
+
+def leaderboard_room(game_id):
+    return f'leaderboard_{game_id}'
+
+def diff_entries(previous, current):
+    """Entries that are new or changed, and user_ids that left the top-K"""
+    before = {entry['user_id']: entry for entry in previous}
+    after = {entry['user_id'] for entry in current}
+    changed = [entry for entry in current if before.get(entry['user_id']) != entry]
+    removed = [user_id for user_id in before if user_id not in after]
+    return changed, removed
+
+class GameBoard:
+    """Last top-K pushed for one game and the sockets on this worker watching it"""
+    def __init__(self):
+        self.entries = []
+        self.version = 0
+        self.checked_at = None
+        self.dirty = True
+        self.sids = set()
+        self.acked = {}  # sid -> last acknowledged version (only for clients that ack)
+
+class LeaderboardBroadcaster:
+    """Pushes per-game top-K leaderboard diffs to leaderboard_<game_id> rooms once per tick.
+
+    Any number of submissions within a tick become one recomputation and one
+    diff. Each worker serves its own sockets (emits skip the message queue);
+    changes made by other workers are picked up from user_game_stats.last_played.
+    Clients that acknowledge versions and fall behind skip the diffs in
+    between and get one snapshot once they catch up.
+    """
+    def __init__(self, tick=LEADERBOARD_TICK, top_k=LEADERBOARD_TOP_K):
+        self.tick = tick
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._boards = {}  # game_id -> GameBoard
+        self._sid_games = {}  # sid -> set(game_id)
+
+    def subscribe(self, sid, game_id, ack=False):
+        """Add a socket to a game's board; returns the snapshot to send it"""
+        start_periodic('leaderboard_broadcast', self.tick, self.flush)
+        with self._lock:
+            board = self._boards.setdefault(game_id, GameBoard())
+            board.sids.add(sid)
+            self._sid_games.setdefault(sid, set()).add(game_id)
+            need_load = board.version == 0
+
+        if need_load:
+            self._refresh(game_id, board, emit_diff=False)
+
+        with self._lock:
+            if ack:
+                board.acked[sid] = board.version
+            return self.snapshot(game_id, board)
+
+    def unsubscribe(self, sid, game_id):
+        with self._lock:
+            self._drop(sid, game_id)
+            games = self._sid_games.get(sid)
+            if games is not None:
+                games.discard(game_id)
+                if not games:
+                    del self._sid_games[sid]
+
+    def remove_sid(self, sid):
+        with self._lock:
+            for game_id in self._sid_games.pop(sid, ()):
+                self._drop(sid, game_id)
+
+    def _drop(self, sid, game_id):
+        board = self._boards.get(game_id)
+        if board:
+            board.sids.discard(sid)
+            board.acked.pop(sid, None)
+            if not board.sids:
+                del self._boards[game_id]
+
+    def ack(self, sid, game_id, version):
+        """Record a client acknowledgement; returns a snapshot if it missed diffs while lagging"""
+        with self._lock:
+            board = self._boards.get(game_id)
+            if not board or sid not in board.sids:
+                return None
+            board.acked[sid] = max(board.acked.get(sid, 0), version)
+            if board.acked[sid] < board.version:
+                # Diffs after this version were skipped; one snapshot replaces them
+                board.acked[sid] = board.version
+                return self.snapshot(game_id, board)
+            return None
+
+    def mark_dirty(self, game_id):
+        """Recompute this game's board on the next tick"""
+        with self._lock:
+            board = self._boards.get(str(game_id))
+            if board:
+                board.dirty = True
+
+    def snapshot(self, game_id, board):
+        return {'game_id': game_id, 'version': board.version, 'entries': board.entries}
+
+    def _is_lagging(self, board, sid):
+        # A client that acks and still hasn't acknowledged the previous diff is behind
+        return sid in board.acked and board.acked[sid] < board.version
+
+    def flush(self):
+        """One tick: recompute changed boards and push their diffs"""
+        with self._lock:
+            boards = list(self._boards.items())
+        for game_id, board in boards:
+            if board.dirty or self._changed_elsewhere(game_id, board):
+                self._refresh(game_id, board)
+
+    def _changed_elsewhere(self, game_id, board):
+        if board.checked_at is None:
+            return True
+        db = get_db()
+        return db.user_game_stats.find_one(
+            {'game_id': ObjectId(game_id), 'last_played': {'$gt': board.checked_at}},
+            {'_id': 1}
+        ) is not None
+
+    def _refresh(self, game_id, board, emit_diff=True):
+        from models.game import Game
+        from services.socket_codec import emit_room
+
+        checked_at = datetime.utcnow()
+        game = Game.get_by_id(game_id)
+        entries = game.get_leaderboard(limit=self.top_k) if game else []
+        entries = [{key: value for key, value in entry.items() if key != '_id'} for entry in entries]
+
+        with self._lock:
+            board.dirty = False
+            board.checked_at = checked_at
+            changed, removed = diff_entries(board.entries, entries)
+            if not changed and not removed and board.version:
+                return
+            lagging = [sid for sid in board.sids if self._is_lagging(board, sid)]
+            base_version = board.version
+            board.entries = entries
+            board.version += 1
+            update = {
+                'game_id': game_id,
+                'version': board.version,
+                'base_version': base_version,
+                'changed': changed,
+                'removed': removed
+            }
+
+        if emit_diff:
+            # Local sockets only: every worker pushes to its own subscribers
+            emit_room('leaderboard_update', update, leaderboard_room(game_id),
+                      skip_sid=lagging or None, ignore_queue=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'games': len(self._boards),
+                'subscribers': sum(len(board.sids) for board in self._boards.values())
+            }
+
+leaderboard_broadcaster = LeaderboardBroadcaster()
@@ -0,0 +1,133 @@
+from models.database import get_db
+from models.user import User
+from services.cache import TTLCache
+import os
+
+LEADERBOARD_CACHE_TTL = float(os.getenv('LEADERBOARD_CACHE_TTL', 30))  # seconds
+
+_cache = TTLCache(LEADERBOARD_CACHE_TTL, max_entries=512)
+
+# Invalidations reach the other web workers (and come from report workers) over the Socket.IO message queue
+INVALIDATE_EVENT = '__leaderboard_invalidate'
+INVALIDATE_ROOM = '__leaderboard_invalidate'  # never joined by clients
+
+_invalidation_installed = None
+_publisher = None
+
+def best_scores(collection, match, score_field, limit):
+    """Best score, attempt count and average time per user, top `limit` users only"""
+    db = get_db()
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$user_id",
+            "best_score": {"$max": f"${score_field}"},
+            "attempts": {"$sum": 1},
+            "avg_time": {"$avg": "$time_taken"}
+        }},
+        # The server coalesces $sort + $limit into a top-k sort over the grouped users
+        {"$sort": {"best_score": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+
+    rows = list(db[collection].aggregate(pipeline))
+
+    # user_id is stored as a string, so names are joined for the final rows only
+    users = User.get_summaries({str(row['_id']) for row in rows})
+    leaderboard = []
+    for row in rows:
+        user = users.get(str(row['_id']))
+        if not user:
+            continue
+        leaderboard.append({
+            "_id": str(row['_id']),
+            "user_name": user['name'],
+            "username": user['username'],
+            "best_score": row['best_score'],
+            "attempts": row['attempts'],
+            "avg_time": row['avg_time']
+        })
+    return leaderboard
+
+def date_filter(date_from, date_to):
+    created_at = {}
+    if date_from:
+        created_at['$gte'] = date_from
+    if date_to:
+        created_at['$lte'] = date_to
+    return {"created_at": created_at} if created_at else {}
+
+def quiz_leaderboard(quiz_id, date_from=None, date_to=None, limit=50):
+    key = ('quiz', quiz_id, date_from, date_to, limit)
+    leaderboard = _cache.get(key)
+    if leaderboard is None:
+        match = dict(date_filter(date_from, date_to), quiz_id=quiz_id)
+        leaderboard = best_scores('quiz_attempts', match, 'percentage', limit)
+        _cache.set(key, leaderboard)
+    return leaderboard
+
+def game_leaderboard(game_type, date_from=None, date_to=None, limit=50):
+    key = ('game', game_type, date_from, date_to, limit)
+    leaderboard = _cache.get(key)
+    if leaderboard is None:
+        match = dict(date_filter(date_from, date_to), game_type=game_type)
+        leaderboard = best_scores('game_scores', match, 'score', limit)
+        _cache.set(key, leaderboard)
+    return leaderboard
+
+def iq_leaderboard(limit=50):
+    key = ('iq', limit)
+    leaderboard = _cache.get(key)
+    if leaderboard is None:
+        db = get_db()
+        users = db.users.find({}, {"name": 1, "username": 1, "iq_score": 1, "badge_level": 1}).sort("iq_score", -1).limit(limit)
+        leaderboard = [
+            {
+                "user_name": user.get('name', 'Unknown'),
+                "username": user.get('username', 'unknown'),
+                "iq_score": user.get('iq_score', 0),
+                "badge_level": user.get('badge_level', 'Novice Cubist')
+            }
+            for user in users
+        ]
+        _cache.set(key, leaderboard)
+    return leaderboard
+
+def invalidate_quiz(quiz_id):
+    """Drop cached leaderboards affected by a new or regraded attempt at quiz_id, in every process.
+
+    Other workers are told through the Socket.IO message queue. Without one
+    there is a single web process, so clearing the local cache is enough.
+    """
+    _invalidate_local(quiz_id)
+    manager = _queue_manager()
+    if manager:
+        manager.emit(INVALIDATE_EVENT, {'quiz_id': quiz_id}, namespace='/', room=INVALIDATE_ROOM)
+
+def install_invalidation():
+    """Apply invalidations published by other processes (once per web worker)"""
+    global _invalidation_installed
+    from websocket_service import socketio
+    from services.socket_broker import route_internal_event
+
+    if _invalidation_installed == os.getpid() or socketio.server is None:
+        return
+    _invalidation_installed = os.getpid()
+    route_internal_event(socketio.server.manager, INVALIDATE_EVENT, lambda data, room: _invalidate_local(data['quiz_id']))
+
+def _invalidate_local(quiz_id):
+    _cache.invalidate(lambda key: key[0] == 'iq' or (key[0] == 'quiz' and key[1] == quiz_id))
+
+def _queue_manager():
+    """The message queue manager of this process: the Socket.IO server's, or a publisher in report workers"""
+    global _publisher
+    import socketio as socketio_module
+    from websocket_service import socketio
+    from services.socket_broker import publisher
+
+    if socketio.server is not None:
+        manager = socketio.server.manager
+        return manager if isinstance(manager, socketio_module.PubSubManager) else None
+    if _publisher is None:
+        _publisher = publisher() or False
+    return _publisher or None
@@ -0,0 +1,563 @@
+from models.match import Match
+from services.background import start_periodic
+from services.cache import TTLCache
+from services.chess_rules import ChessPosition
+from services import cube_rules
+from datetime import datetime, timedelta
+import heapq
+import os
+import random
+import threading
+import time
+import uuid
+
+MATCH_TICK = float(os.getenv('MATCH_TICK_MS', 200)) / 1000                  # clock checks
+MATCH_LEASE_SECONDS = int(os.getenv('MATCH_LEASE_SECONDS', 30))              # ownership without renewal
+MATCH_CHECKPOINT_SECONDS = float(os.getenv('MATCH_CHECKPOINT_SECONDS', 5))   # lease renewal and checkpoints
+MATCH_JOIN_TIMEOUT = int(os.getenv('MATCH_JOIN_TIMEOUT_SECONDS', 120))       # wait for the second player
+MATCH_RELAY_TIMEOUT = float(os.getenv('MATCH_RELAY_TIMEOUT_MS', 2000)) / 1000  # owner must ack a relayed action
+MATCH_MAX_MOVES = int(os.getenv('MATCH_MAX_MOVES', 2000))                    # per player
+CHESS_CLOCK_SECONDS = int(os.getenv('MATCH_CHESS_CLOCK_SECONDS', 300))
+CHESS_INCREMENT_SECONDS = int(os.getenv('MATCH_CHESS_INCREMENT_SECONDS', 2))
+
+RELAY_EVENT = '__match_relay'
+ACTIONS = ('join', 'move', 'resign', 'sync')
+
+def match_room(match_id):
+    return f'match_{match_id}'
+
+def relay_room(worker_id):
+    return f'__match_engine_{worker_id}'
+
+def live_kind(game_type, cube_type):
+    """'chess' or 'cube' when a match can be played live, else None"""
+    if game_type == 'chess':
+        return 'chess'
+    if game_type == 'cube':
+        try:
+            cube_rules.cube_size(cube_type)
+            return 'cube'
+        except ValueError:
+            return None
+    return None
+
+class MatchError(Exception):
+    """A rejected action; the message is sent to the player as match_error"""
+
+class LiveMatch:
+    """State of one match being played on this worker"""
+    __slots__ = ('id', 'kind', 'players', 'lock', 'status', 'version', 'joined', 'started', 'time_limit',
+                 'position', 'clock_ms', 'turn_started', 'moves', 'clock_log',
+                 'size', 'seed', 'scramble', 'cubes', 'cube_moves', 'cube_times', 'solved_ms',
+                 'deadline', 'checkpointed')
+
+    def __init__(self, match_id, kind, players):
+        self.id = match_id
+        self.kind = kind
+        self.players = players      # (challenger_id, opponent_id); challenger plays white
+        self.lock = threading.Lock()
+        self.status = 'waiting'     # waiting -> active -> finished
+        self.version = 0
+        self.joined = set()
+        self.started = None         # monotonic time both players were in
+        self.deadline = None        # monotonic time the current clock runs out
+        self.checkpointed = 0       # version saved in the last checkpoint
+
+    def player_index(self, user_id):
+        if user_id == self.players[0]:
+            return 0
+        if user_id == self.players[1]:
+            return 1
+        raise MatchError('You are not part of this match')
+
+    def elapsed_ms(self, now):
+        return int((now - self.started) * 1000) if self.started else 0
+
+class MatchEngine:
+    """Server-authoritative head-to-head matches.
+
+    Each active match is played on exactly one worker, the one holding its
+    lease in the matches collection. State lives in memory there: a chess
+    position with both clocks, or each player's cube built from a shared
+    scramble. Every move is validated on arrival and the change is pushed to
+    match_<id> as a match_update delta. Moves that reach another worker are
+    relayed to the owner over the Socket.IO message queue. Clock expiries
+    sit in a heap checked every MATCH_TICK_MS. Every MATCH_CHECKPOINT_SECONDS
+    one bulk write renews the leases and saves the move logs of matches that
+    changed, so another worker can replay a match if its owner dies. Only
+    the final result and the compact move log are kept once the match ends.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matches = {}   # match_id -> LiveMatch
+        self._deadlines = [] # heap of (deadline, match_id); stale once the match's deadline moves
+        self._owners = TTLCache(ttl=MATCH_CHECKPOINT_SECONDS, max_entries=10000)
+        self._last_checkpoint = 0
+        self._relay_installed = None
+        self._moves = 0
+        self._relayed = 0
+        self._relays = {}    # relay id -> (ack deadline, sid, match_id) for actions sent to other workers
+        self._relay_timeouts = 0
+        self._finished = 0
+
+    @property
+    def worker_id(self):
+        from services.presence import presence
+        return presence.worker_id
+
+    def start(self):
+        self.install_relay()
+        start_periodic('match_engine', MATCH_TICK, self.tick)
+
+    # Routing
+
+    def install_relay(self):
+        """Receive actions relayed by other workers through the Socket.IO message queue"""
+        from websocket_service import socketio
+        from services.socket_broker import route_internal_event
+
+        if self._relay_installed == os.getpid():
+            return
+
+        def handle_relay(data, room):
+            # Relay messages are for this engine, never for client sockets
+            if room != relay_room(self.worker_id):
+                return
+            if 'ack' in data:
+                with self._lock:
+                    self._relays.pop(data['ack'], None)
+            else:
+                self._received(data)
+
+        if route_internal_event(socketio.server.manager, RELAY_EVENT, handle_relay):
+            self._relay_installed = os.getpid()
+
+    def submit(self, sid, user_id, match_id, action, data=None, codec='json'):
+        """Run a player's action on the worker that owns the match (sid may be on another worker)"""
+        owner = self._owners.get(match_id)
+        if owner is None:
+            with self._lock:
+                local = match_id in self._matches
+            try:
+                owner = self.worker_id if local else self._claim(match_id)
+            except MatchError as e:
+                from websocket_service import socketio
+                socketio.emit('match_error', {'match_id': match_id, 'error': str(e)}, to=sid)
+                return
+            self._owners.set(match_id, owner)
+
+        request = {'sid': sid, 'user_id': user_id, 'match_id': match_id, 'action': action, 'data': data or {}, 'codec': codec}
+        if owner == self.worker_id:
+            self._run(request)
+        else:
+            from websocket_service import socketio
+            request.update(id=uuid.uuid4().hex, reply_to=self.worker_id)
+            with self._lock:
+                self._relays[request['id']] = (time.monotonic() + MATCH_RELAY_TIMEOUT, sid, match_id)
+            socketio.server.manager.emit(RELAY_EVENT, request, namespace='/', room=relay_room(owner))
+
+    def _received(self, request):
+        from services.handler_executor import handler_executor
+        with self._lock:
+            self._relayed += 1
+        # Off the queue listener thread, in order per match
+        handler_executor.submit(f"match:{request['match_id']}", 'match_relay', self._run_relayed, request)
+
+    def _run_relayed(self, request):
+        """Acknowledge a relayed action to the worker that sent it, then run it"""
+        from websocket_service import socketio
+        socketio.server.manager.emit(RELAY_EVENT, {'ack': request['id']}, namespace='/', room=relay_room(request['reply_to']))
+        self._run(request)
+
+    def _expire_relays(self, now):
+        """Tell players to retry actions their match's owner never acknowledged (it may have died)"""
+        from websocket_service import socketio
+
+        with self._lock:
+            expired = [(relay_id, sid, match_id) for relay_id, (deadline, sid, match_id) in self._relays.items() if deadline <= now]
+            for relay_id, _, _ in expired:
+                del self._relays[relay_id]
+            self._relay_timeouts += len(expired)
+        for _, sid, match_id in expired:
+            # Look the owner up again next time; once its lease runs out this worker takes the match over
+            self._owners.delete(match_id)
+            socketio.emit('match_error', {'match_id': match_id, 'error': 'Match server did not respond, please retry', 'retry': True}, to=sid)
+
+    def _claim(self, match_id):
+        """Load a match here if no other worker holds it; returns the owner's worker_id"""
+        match_data = Match.claim_live(match_id, self.worker_id, MATCH_LEASE_SECONDS)
+        if match_data is None:
+            owner = Match.get_live_owner(match_id)
+            if owner is None:
+                raise MatchError('Match is not active')
+            return owner
+
+        with self._lock:
+            loaded = match_id in self._matches
+        if not loaded:
+            match = self._load(match_data)
+            with self._lock:
+                self._matches.setdefault(match_id, match)
+            self._push_deadline(match)
+        return self.worker_id
+
+    def _load(self, match_data):
+        from models.game import Game
+
+        game = Game.get_by_id(str(match_data['game_id']))
+        kind = live_kind(game.type if game else None, match_data.get('cube_type'))
+        if kind is None:
+            raise MatchError('This match cannot be played live')
+
+        match = LiveMatch(str(match_data['_id']), kind, (str(match_data['challenger_id']), str(match_data['opponent_id'])))
+        checkpoint = match_data.get('live') or {}
+        if kind == 'chess':
+            match.position = ChessPosition()
+            match.clock_ms = list(checkpoint.get('clock_ms') or [CHESS_CLOCK_SECONDS * 1000] * 2)
+            match.time_limit = CHESS_CLOCK_SECONDS
+            match.moves, match.clock_log = [], []
+            for move in checkpoint.get('moves', []):
+                match.moves.append(match.position.push(move))
+            match.clock_log = list(checkpoint.get('clock_log', []))
+        else:
+            match.size = cube_rules.cube_size(match_data.get('cube_type'))
+            match.seed = checkpoint.get('seed', random.getrandbits(32))
+            match.scramble = cube_rules.scramble(match.size, match.seed)
+            start = cube_rules.scrambled_state(match.size, match.scramble)
+            match.time_limit = game.get_cube_time_limit(match_data.get('cube_type') or '3x3')
+            match.cube_moves = [list(moves) for moves in checkpoint.get('moves', [[], []])]
+            match.cube_times = [list(times) for times in checkpoint.get('times_ms', [[], []])]
+            match.cubes = [start, start]
+            for index in (0, 1):
+                for move in match.cube_moves[index]:
+                    match.cubes[index] = cube_rules.apply_move(match.cubes[index], match.size, move)
+            match.solved_ms = [None, None]
+
+        if checkpoint.get('started_at') is not None:
+            # Resumed after the previous owner stopped: both players were already in, and
+            # the clocks kept running while nobody owned the match
+            now = time.monotonic()
+            wall_now = datetime.utcnow()
+            match.joined = set(match.players)
+            match.status = 'active'
+            match.started = now - (wall_now - checkpoint['started_at']).total_seconds()
+            match.turn_started = now - (wall_now - checkpoint['turn_started_at']).total_seconds()
+            match.version = match.checkpointed = checkpoint.get('version', 0)
+            match.deadline = self._next_deadline(match)
+        else:
+            match.deadline = time.monotonic() + MATCH_JOIN_TIMEOUT
+        return match
+
+    # Actions (run on the owner)
+
+    def _run(self, request):
+        from websocket_service import socketio
+
+        with self._lock:
+            match = self._matches.get(request['match_id'])
+        try:
+            if match is None:
+                # Finished, or this worker lost the lease; route again
+                self._owners.delete(request['match_id'])
+                raise MatchError('Match is not active')
+            if request['action'] not in ACTIONS:
+                raise MatchError(f"Unknown action: {request['action']}")
+            with match.lock:
+                index = match.player_index(request['user_id'])
+                getattr(self, f"_{request['action']}")(match, index, request)
+        except (MatchError, ValueError) as e:
+            socketio.emit('match_error', {'match_id': request['match_id'], 'error': str(e)}, to=request['sid'])
+
+    def _join(self, match, index, request):
+        from services.socket_codec import emit_sid, emit_room
+
+        match.joined.add(match.players[index])
+        now = time.monotonic()
+        if match.status == 'waiting' and len(match.joined) == 2:
+            match.status = 'active'
+            match.started = match.turn_started = now
+            match.version += 1
+            self._schedule(match, now)
+            emit_room('match_started', self.snapshot(match, now), match_room(match.id))
+        else:
+            emit_sid('match_state', self.snapshot(match, now), request['sid'], request['codec'])
+
+    def _sync(self, match, index, request):
+        from services.socket_codec import emit_sid
+        emit_sid('match_state', self.snapshot(match, time.monotonic()), request['sid'], request['codec'])
+
+    def _resign(self, match, index, request):
+        if match.status == 'finished':
+            return
+        self._finish(match, 1 - index, 'resignation')
+
+    def _move(self, match, index, request):
+        if match.status != 'active':
+            raise MatchError('Match has not started' if match.status == 'waiting' else 'Match is over')
+        now = time.monotonic()
+        data = request['data']
+        if match.kind == 'chess':
+            self._chess_move(match, index, data.get('move'), now)
+        else:
+            moves = data.get('moves') or ([data['move']] if data.get('move') else [])
+            self._cube_moves(match, index, moves, now)
+
+    def _chess_move(self, match, index, move, now):
+        from services.socket_codec import emit_room
+
+        if index != (0 if match.position.white_to_move else 1):
+            raise MatchError('Not your turn')
+        if len(match.moves) >= MATCH_MAX_MOVES * 2:
+            self._finish(match, None, 'move_limit')
+            return
+
+        used = int((now - match.turn_started) * 1000)
+        if used >= match.clock_ms[index]:
+            match.clock_ms[index] = 0
+            self._finish(match, 1 - index, 'timeout')
+            return
+
+        played = match.position.push(move)  # ValueError if illegal
+        match.clock_ms[index] += CHESS_INCREMENT_SECONDS * 1000 - used
+        match.turn_started = now
+        match.moves.append(played)
+        match.clock_log.append(match.clock_ms[index])
+        match.version += 1
+        with self._lock:
+            self._moves += 1
+
+        emit_room('match_update', {
+            'match_id': match.id,
+            'version': match.version,
+            'player_id': match.players[index],
+            'move': played,
+            'check': match.position.in_check(),
+            'clock_ms': {match.players[0]: match.clock_ms[0], match.players[1]: match.clock_ms[1]},
+            'turn': match.players[1 - index]
+        }, match_room(match.id))
+
+        outcome = match.position.outcome()
+        if outcome:
+            result, reason = outcome
+            self._finish(match, None if result == 'draw' else (0 if result == 'white' else 1), reason)
+        else:
+            self._schedule(match, now)
+
+    def _cube_moves(self, match, index, moves, now):
+        from services.socket_codec import emit_room
+
+        if not moves or not all(isinstance(move, str) for move in moves):
+            raise MatchError('No moves')
+        if len(match.cube_moves[index]) + len(moves) > MATCH_MAX_MOVES:
+            raise MatchError('Move limit reached')
+        elapsed = match.elapsed_ms(now)
+        if elapsed >= match.time_limit * 1000:
+            self._finish(match, None, 'timeout')
+            return
+
+        state = match.cubes[index]
+        for move in moves:
+            state = cube_rules.apply_move(state, match.size, move)  # ValueError if invalid
+        match.cubes[index] = state
+        match.cube_moves[index].extend(moves)
+        match.cube_times[index].extend([elapsed] * len(moves))
+        match.version += 1
+        solved = cube_rules.is_solved(state, match.size)
+        with self._lock:
+            self._moves += len(moves)
+
+        emit_room('match_update', {
+            'match_id': match.id,
+            'version': match.version,
+            'player_id': match.players[index],
+            'moves': moves,
+            'move_count': len(match.cube_moves[index]),
+            'elapsed_ms': elapsed,
+            'solved': solved
+        }, match_room(match.id))
+
+        if solved:
+            match.solved_ms[index] = elapsed
+            self._finish(match, index, 'solved')
+
+    # Clocks
+
+    def _next_deadline(self, match):
+        if match.kind == 'chess':
+            turn = 0 if match.position.white_to_move else 1
+            return match.turn_started + match.clock_ms[turn] / 1000
+        return match.started + match.time_limit
+
+    def _schedule(self, match, now):
+        match.deadline = self._next_deadline(match)
+        self._push_deadline(match)
+
+    def _push_deadline(self, match):
+        with self._lock:
+            heapq.heappush(self._deadlines, (match.deadline, match.id))
+
+    def tick(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, match_id = heapq.heappop(self._deadlines)
+                match = self._matches.get(match_id)
+                if match is not None and match.deadline == deadline:
+                    due.append(match)
+
+        for match in due:
+            with match.lock:
+                if match.status == 'waiting':
+                    # Only one player showed up
+                    present = [index for index, player in enumerate(match.players) if player in match.joined]
+                    self._finish(match, present[0] if present else None, 'no_show')
+                elif match.status == 'active':
+                    if match.kind == 'chess':
+                        turn = 0 if match.position.white_to_move else 1
+                        match.clock_ms[turn] = 0
+                        self._finish(match, 1 - turn, 'timeout')
+                    else:
+                        self._finish(match, None, 'timeout')
+
+        if self._relays:
+            self._expire_relays(now)
+
+        if now - self._last_checkpoint >= MATCH_CHECKPOINT_SECONDS:
+            self._last_checkpoint = now
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Renew leases for every match here and save the ones that changed"""
+        now = time.monotonic()
+        with self._lock:
+            matches = list(self._matches.values())
+        checkpoints = {}
+        for match in matches:
+            with match.lock:
+                if match.status == 'active' and match.version != match.checkpointed:
+                    checkpoints[match.id] = self._checkpoint_state(match, now)
+                    match.checkpointed = match.version
+        try:
+            Match.checkpoint_live(self.worker_id, checkpoints, [match.id for match in matches], MATCH_LEASE_SECONDS)
+        except Exception as e:
+            print(f"Error checkpointing live matches: {e}")
+
+    def _checkpoint_state(self, match, now):
+        # Wall-clock times, so whichever worker resumes the match charges the time since
+        wall_now = datetime.utcnow()
+        state = {
+            'version': match.version,
+            'started_at': wall_now - timedelta(seconds=now - match.started),
+            'turn_started_at': wall_now - timedelta(seconds=now - match.turn_started)
+        }
+        if match.kind == 'chess':
+            state.update({'moves': list(match.moves), 'clock_ms': list(match.clock_ms), 'clock_log': list(match.clock_log)})
+        else:
+            state.update({'seed': match.seed, 'moves': [list(moves) for moves in match.cube_moves],
+                          'times_ms': [list(times) for times in match.cube_times]})
+        return state
+
+    # Results
+
+    def _finish(self, match, winner_index, reason):
+        """End a match (caller holds match.lock): store the result, tell both players, free the state"""
+        from services.socket_codec import emit_room
+
+        now = time.monotonic()
+        match.status = 'finished'
+        with self._lock:
+            self._matches.pop(match.id, None)
+            self._finished += 1
+        self._owners.delete(match.id)
+
+        results = ['draw', 'draw'] if winner_index is None else \
+            ['win' if index == winner_index else 'loss' for index in (0, 1)]
+        if match.kind == 'chess':
+            initial = match.time_limit * 1000
+            times = [max(0, initial + CHESS_INCREMENT_SECONDS * 1000 * len(match.moves[index::2]) - match.clock_ms[index]) / 1000
+                     for index in (0, 1)]
+            move_log = {'format': 'uci', 'moves': ' '.join(match.moves), 'clock_ms': match.clock_log}
+        else:
+            elapsed = match.elapsed_ms(now)
+            times = [(match.solved_ms[index] if match.solved_ms[index] is not None else elapsed) / 1000 for index in (0, 1)]
+            move_log = {
+                'format': 'cube',
+                'size': match.size,
+                'scramble': ' '.join(match.scramble),
+                'moves': [' '.join(moves) for moves in match.cube_moves],
+                'times_ms': match.cube_times
+            }
+
+        winner_id = match.players[winner_index] if winner_index is not None else None
+        result = {
+            'winner_id': winner_id,
+            'challenger_score': Match.live_score(results[0], times[0], match.time_limit),
+            'opponent_score': Match.live_score(results[1], times[1], match.time_limit),
+            'challenger_time': times[0],
+            'opponent_time': times[1],
+            'result_reason': reason,
+            'move_log': move_log
+        }
+        try:
+            stored = Match.finish_live(match.id, self.worker_id, result)
+        except Exception as e:
+            stored = None
+            print(f"Error saving live match result: {e}")
+        if stored is None:
+            print(f"Live match {match.id} finished here but its result was not saved (lease lost?)")
+
+        emit_room('match_finished', {
+            'match_id': match.id,
+            'version': match.version + 1,
+            'winner_id': winner_id,
+            'reason': reason,
+            'scores': {match.players[0]: result['challenger_score'], match.players[1]: result['opponent_score']},
+            'times': {match.players[0]: times[0], match.players[1]: times[1]}
+        }, match_room(match.id))
+
+    def snapshot(self, match, now):
+        """Full state for a player who joins or resyncs"""
+        state = {
+            'match_id': match.id,
+            'version': match.version,
+            'kind': match.kind,
+            'status': match.status,
+            'players': list(match.players),
+            'joined': sorted(match.joined),
+            'elapsed_ms': match.elapsed_ms(now)
+        }
+        if match.kind == 'chess':
+            clock_ms = list(match.clock_ms)
+            if match.status == 'active':
+                turn = 0 if match.position.white_to_move else 1
+                clock_ms[turn] = max(0, clock_ms[turn] - int((now - match.turn_started) * 1000))
+            state.update({
+                'fen': match.position.fen(),
+                'moves': list(match.moves),
+                'clock_ms': {match.players[0]: clock_ms[0], match.players[1]: clock_ms[1]},
+                'turn': match.players[0 if match.position.white_to_move else 1]
+            })
+        else:
+            state.update({
+                'size': match.size,
+                'scramble': list(match.scramble),
+                'time_limit': match.time_limit,
+                'cubes': {match.players[index]: cube_rules.facelets(match.cubes[index]) for index in (0, 1)},
+                'move_counts': {match.players[index]: len(match.cube_moves[index]) for index in (0, 1)}
+            })
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {
+                'live_matches': len(self._matches),
+                'pending_deadlines': len(self._deadlines),
+                'moves': self._moves,
+                'relayed': self._relayed,
+                'relays_pending': len(self._relays),
+                'relay_timeouts': self._relay_timeouts,
+                'finished': self._finished
+            }
+
+match_engine = MatchEngine()
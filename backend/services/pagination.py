@@ -0,0 +1,84 @@
+from bson import json_util
+from flask import request
+from pymongo import UpdateOne
+import base64
+import os
+
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(document, sort):
+    """Opaque cursor holding the sort-key values of the last document on a page"""
+    values = [document.get(field) for field, direction in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, sort):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+def after_filter(sort, values):
+    """Keyset filter for documents strictly after `values` in `sort` order"""
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        clause = {prefix: value for (prefix, _), value in zip(sort[:index], values)}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[index]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def page_size(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginate(collection, query=None, sort=None, limit=None, cursor=None, projection=None):
+    """One page of a keyset-paginated find; returns (documents, next_cursor).
+
+    `sort` should end with _id so the key is unique; every sort field needs a
+    value on every document, otherwise pages can skip or repeat rows.
+    """
+    sort = list(sort or [('_id', 1)])
+    if sort[-1][0] != '_id':
+        sort.append(('_id', sort[-1][1]))
+    limit = page_size(limit)
+
+    query = dict(query or {})
+    if cursor:
+        after = after_filter(sort, decode_cursor(cursor, sort))
+        query = {"$and": [query, after]} if query else after
+
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(documents[-1], sort) if has_more else None
+    return documents, next_cursor
+
+def backfill_created_at(collection, batch_size=1000):
+    """Give documents without created_at their _id timestamp so (created_at, _id) keysets reach them"""
+    updated = 0
+    batch = []
+    for document in collection.find({"created_at": None}, {"_id": 1}):
+        created_at = document['_id'].generation_time.replace(tzinfo=None)
+        batch.append(UpdateOne({"_id": document['_id']}, {"$set": {"created_at": created_at}}))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+def page_args():
+    """limit and cursor from the query string"""
+    return request.args.get('limit'), request.args.get('cursor') or None
+
+def pagination_info(next_cursor):
+    return {'next_cursor': next_cursor, 'has_more': next_cursor is not None}
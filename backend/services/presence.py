@@ -0,0 +1,200 @@
+from models.socket_state import SocketState
+from services.background import start_periodic
+from services.cache import TTLCache
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import time
+
+PRESENCE_INTERVAL = int(os.getenv('PRESENCE_INTERVAL_SECONDS', 10))            # reap and publish period
+PRESENCE_HEARTBEAT = int(os.getenv('PRESENCE_HEARTBEAT_SECONDS', 25))          # suggested client heartbeat
+PRESENCE_STALE_SECONDS = int(os.getenv('PRESENCE_STALE_SECONDS', 90))         # silence before a socket is dropped
+GAME_SESSION_GRACE_SECONDS = int(os.getenv('GAME_SESSION_GRACE_SECONDS', 300)) # unheld game sessions kept for reconnects
+PRESENCE_MAX_ROOMS = int(os.getenv('PRESENCE_MAX_ROOMS_PER_SOCKET', 32))
+
+def game_key(game_id):
+    return f'game:{game_id}'
+
+def tournament_key(tournament_id):
+    return f'tournament:{tournament_id}'
+
+class PresenceTracker:
+    """Heartbeats and per-room online counts for this worker's sockets.
+
+    Each tick drops sockets the Socket.IO server no longer knows about and
+    sockets whose heartbeat went silent, refreshes the shared game sessions
+    this worker still holds, deletes the ones nobody has held for
+    GAME_SESSION_GRACE_SECONDS (left behind by crashed workers), and
+    publishes this worker's counts to socket_presence. Reads add up every
+    worker that published within PRESENCE_STALE_SECONDS. Users are counted
+    once per worker, so a user with sockets on two workers counts twice.
+    """
+    def __init__(self, interval=PRESENCE_INTERVAL, stale_after=PRESENCE_STALE_SECONDS):
+        self.interval = interval
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._sockets = {}  # sid -> {'user', 'seen', 'heartbeat', 'rooms': {room: set(ref)}}
+        self._rooms = {}    # room -> {user: socket count}
+        self._reaped = 0
+        self._cache = TTLCache(ttl=interval, max_entries=256)
+
+    @property
+    def worker_id(self):
+        # Per process: workers forked from a preloaded app share this object
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def start(self):
+        start_periodic('presence', self.interval, self.tick)
+
+    def touch(self, sid, user_id=None, heartbeat=False):
+        """Record activity on a socket (connect, heartbeat or a join)"""
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if entry is None:
+                entry = self._sockets[sid] = {'user': f'sid:{sid}', 'seen': 0, 'heartbeat': False, 'rooms': {}}
+            if user_id and entry['user'].startswith('sid:'):
+                self._rekey(entry, str(user_id))
+            entry['seen'] = time.monotonic()
+            entry['heartbeat'] = entry['heartbeat'] or heartbeat
+
+    def _rekey(self, entry, user):
+        # An anonymous socket that identifies itself moves its room counts to the user
+        for room in entry['rooms']:
+            self._remove_user(room, entry['user'])
+            self._add_user(room, user)
+        entry['user'] = user
+
+    def join(self, sid, room, user_id=None, ref=None):
+        """Count a socket in a room until every ref it joined with leaves (ref defaults to the room).
+
+        Returns False once the socket is in PRESENCE_MAX_ROOMS rooms.
+        """
+        self.touch(sid, user_id)
+        with self._lock:
+            entry = self._sockets[sid]
+            if room not in entry['rooms']:
+                if len(entry['rooms']) >= PRESENCE_MAX_ROOMS:
+                    return False
+                entry['rooms'][room] = set()
+                self._add_user(room, entry['user'])
+            entry['rooms'][room].add(ref or room)
+            return True
+
+    def leave(self, sid, room, ref=None):
+        with self._lock:
+            entry = self._sockets.get(sid)
+            if not entry or room not in entry['rooms']:
+                return
+            entry['rooms'][room].discard(ref or room)
+            if not entry['rooms'][room]:
+                del entry['rooms'][room]
+                self._remove_user(room, entry['user'])
+
+    def remove(self, sid):
+        with self._lock:
+            entry = self._sockets.pop(sid, None)
+            if entry:
+                for room in entry['rooms']:
+                    self._remove_user(room, entry['user'])
+
+    def _add_user(self, room, user):
+        users = self._rooms.setdefault(room, {})
+        users[user] = users.get(user, 0) + 1
+
+    def _remove_user(self, room, user):
+        users = self._rooms.get(room)
+        if users is None or user not in users:
+            return
+        users[user] -= 1
+        if not users[user]:
+            del users[user]
+            if not users:
+                del self._rooms[room]
+
+    def tick(self):
+        self.reap()
+        self.publish()
+
+    def reap(self):
+        """Drop dead or silent sockets and expired shared game sessions; returns the sids dropped"""
+        from websocket_service import socketio, drop_socket
+        from services.session_registry import session_registry
+
+        manager = socketio.server.manager
+        deadline = time.monotonic() - self.stale_after
+        with self._lock:
+            silent = {sid for sid, entry in self._sockets.items() if entry['heartbeat'] and entry['seen'] < deadline}
+            candidates = set(self._sockets)
+        candidates |= session_registry.sids()
+
+        stale = [sid for sid in candidates if sid in silent or not manager.is_connected(sid, '/')]
+        for sid in stale:
+            drop_socket(sid)
+            if manager.is_connected(sid, '/'):
+                socketio.server.disconnect(sid)
+
+        SocketState.touch_game_sessions(session_registry.session_ids())
+        removed = SocketState.reap_game_sessions(datetime.utcnow() - timedelta(seconds=GAME_SESSION_GRACE_SECONDS))
+        with self._lock:
+            self._reaped += len(stale)
+        if stale or removed:
+            print(f"Presence: reaped {len(stale)} sockets and {removed} game sessions")
+        return stale
+
+    def local_counts(self):
+        with self._lock:
+            return {
+                'sockets': len(self._sockets),
+                'users': len({entry['user'] for entry in self._sockets.values()}),
+                'rooms': {room: len(users) for room, users in self._rooms.items()}
+            }
+
+    def publish(self):
+        counts = self.local_counts()
+        SocketState.publish_presence(
+            self.worker_id, counts['sockets'], counts['users'],
+            [{'room': room, 'users': users} for room, users in counts['rooms'].items()]
+        )
+
+    def withdraw(self):
+        """Remove this worker's published counts (on shutdown)"""
+        SocketState.remove_presence(self.worker_id)
+
+    def online(self, rooms=()):
+        """Online users across workers, overall and for the given rooms (cached for one interval)"""
+        rooms = tuple(sorted(set(rooms)))
+        cached = self._cache.get(rooms)
+        if cached is not None:
+            return cached
+
+        since = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        workers = SocketState.get_presence(since)
+        counts = {room: 0 for room in rooms}
+        for worker in workers:
+            for entry in worker.get('rooms', []):
+                if entry['room'] in counts:
+                    counts[entry['room']] += entry['users']
+
+        result = {
+            'online_users': sum(worker.get('users', 0) for worker in workers),
+            'online_sockets': sum(worker.get('sockets', 0) for worker in workers),
+            'workers': len(workers),
+            'rooms': counts
+        }
+        self._cache.set(rooms, result)
+        return result
+
+    def stats(self):
+        counts = self.local_counts()
+        with self._lock:
+            reaped = self._reaped
+        return {
+            'worker_id': self.worker_id,
+            'sockets': counts['sockets'],
+            'users': counts['users'],
+            'rooms': len(counts['rooms']),
+            'reaped_sockets': reaped
+        }
+
+presence = PresenceTracker()
@@ -0,0 +1,231 @@
+from models.database import get_db
+from services.background import start_periodic
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+import os
+import uuid
+
+START_CONCURRENCY = int(os.getenv('QUIZ_START_CONCURRENCY', 16))      # concurrent starts per quiz (all workers)
+QUEUE_LIMIT = int(os.getenv('QUIZ_START_QUEUE_LIMIT', 2000))          # waiting tickets per quiz
+TICKET_TTL = float(os.getenv('QUIZ_QUEUE_TICKET_TTL', 30))            # seconds a ticket lives without a retry
+READY_GRACE = float(os.getenv('QUIZ_QUEUE_READY_GRACE', 10))          # seconds a freed slot is held for its ticket
+START_LEASE = float(os.getenv('QUIZ_START_LEASE', 30))                # seconds a start may hold its slot before it is reclaimed
+RETRY_AFTER = 2                                                        # suggested client retry delay (seconds)
+PREWARM_LEAD = timedelta(minutes=int(os.getenv('QUIZ_PREWARM_LEAD_MINUTES', 10)))
+PREWARM_INTERVAL = 60
+
+class QuizAdmission:
+    """Per-quiz concurrency limit with a fair FIFO queue for quiz starts.
+
+    State is shared by every worker through MongoDB:
+    - quiz_admission_slots holds START_CONCURRENCY leased slot documents per
+      quiz, claimed with an atomic find_one_and_update
+    - quiz_admission_tickets holds the waiting tickets, one per user and quiz
+    - quiz_admission holds the per-quiz ticket sequence and serving counters
+    A retry is honoured on any worker, and a slot whose worker died is
+    reclaimed when its lease runs out.
+    """
+    def __init__(self, limit=START_CONCURRENCY):
+        self.limit = limit
+        self._slotted = set()  # quizzes whose slot documents exist
+
+    def start(self):
+        """Start the queue sweeper and scheduled-window prewarming for this worker"""
+        start_periodic('quiz_admission_sweep', 1, self.sweep)
+        start_periodic('quiz_prewarm', PREWARM_INTERVAL, self.prewarm)
+
+    def admit(self, quiz_id, user_id):
+        """Try to admit a quiz start; returns a dict with 'admitted' and its 'slot', or the queue position"""
+        db = get_db()
+        now = datetime.utcnow()
+        self._ensure_slots(quiz_id)
+
+        # A slot was reserved for this user's ticket when it reached the head of the queue
+        slot = db.quiz_admission_slots.find_one_and_update(
+            {"quiz_id": quiz_id, "state": "reserved", "user_id": user_id, "expires_at": {"$gt": now}},
+            {"$set": {"state": "active", "expires_at": now + timedelta(seconds=START_LEASE)}},
+            projection={"holder": 1}
+        )
+        if slot:
+            return {'admitted': True, 'slot': slot}
+
+        # Already waiting: refresh the ticket and report its position
+        fresh = {"$gt": now - timedelta(seconds=TICKET_TTL)}
+        ticket = db.quiz_admission_tickets.find_one_and_update(
+            {"quiz_id": quiz_id, "user_id": user_id, "last_seen": fresh},
+            {"$set": {"last_seen": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if ticket:
+            return self._queued(quiz_id, ticket, now)
+
+        # Fresh arrival: run now if nobody is waiting ahead and a slot is free
+        if not db.quiz_admission_tickets.find_one({"quiz_id": quiz_id, "last_seen": fresh}, {"_id": 1}):
+            slot = self._claim_slot(quiz_id, uuid.uuid4().hex, user_id, 'active', START_LEASE, now)
+            if slot:
+                return {'admitted': True, 'slot': slot}
+
+        if db.quiz_admission_tickets.count_documents({"quiz_id": quiz_id, "last_seen": fresh}) >= QUEUE_LIMIT:
+            return {'admitted': False, 'full': True, 'retry_after': RETRY_AFTER * 5}
+
+        counters = db.quiz_admission.find_one_and_update(
+            {"_id": quiz_id},
+            {"$inc": {"next_seq": 1}, "$setOnInsert": {"serving_seq": 0}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        ticket = {
+            "_id": uuid.uuid4().hex,
+            "quiz_id": quiz_id,
+            "user_id": user_id,
+            "seq": counters['next_seq'],
+            "last_seen": now
+        }
+        db.quiz_admission_tickets.delete_one({"quiz_id": quiz_id, "user_id": user_id, "last_seen": {"$lte": fresh["$gt"]}})
+        try:
+            db.quiz_admission_tickets.insert_one(ticket)
+        except DuplicateKeyError:
+            # A concurrent request from the same user queued first; share its ticket
+            ticket = db.quiz_admission_tickets.find_one({"quiz_id": quiz_id, "user_id": user_id})
+            if not ticket:
+                return {'admitted': False, 'full': True, 'retry_after': RETRY_AFTER}
+
+        # A slot may have freed up while the ticket was being written
+        self._notify(self._promote(quiz_id, now))
+        return self._queued(quiz_id, ticket, now)
+
+    def release(self, quiz_id, slot):
+        """Release a start slot and hand it to the next waiting ticket"""
+        self._free_slot(slot)
+        self._notify(self._promote(quiz_id, datetime.utcnow()))
+
+    def sweep(self):
+        """Expire abandoned tickets and hand expired reservations on so the queue keeps moving"""
+        db = get_db()
+        now = datetime.utcnow()
+        db.quiz_admission_tickets.delete_many({"last_seen": {"$lte": now - timedelta(seconds=TICKET_TTL)}})
+
+        notifications = []
+        for quiz_id in db.quiz_admission_tickets.distinct("quiz_id"):
+            notifications += self._promote(quiz_id, now)
+        self._notify(notifications)
+
+    def prewarm(self):
+        """Cache quizzes whose scheduled window opens soon"""
+        from models.quiz import Quiz
+        Quiz.prewarm_scheduled(PREWARM_LEAD)
+
+    def stats(self):
+        """Snapshot of admission state per quiz"""
+        db = get_db()
+        now = datetime.utcnow()
+        stats = {}
+        def entry(quiz_id):
+            return stats.setdefault(quiz_id, {'active': 0, 'waiting': 0, 'reserved': 0})
+
+        for slot in db.quiz_admission_slots.find({"holder": {"$ne": None}, "expires_at": {"$gt": now}}, {"quiz_id": 1, "state": 1}):
+            entry(slot['quiz_id'])['active' if slot['state'] == 'active' else 'reserved'] += 1
+        waiting = db.quiz_admission_tickets.aggregate([
+            {"$match": {"last_seen": {"$gt": now - timedelta(seconds=TICKET_TTL)}}},
+            {"$group": {"_id": "$quiz_id", "count": {"$sum": 1}}}
+        ])
+        for item in waiting:
+            entry(item['_id'])['waiting'] = item['count']
+        return stats
+
+    def _ensure_slots(self, quiz_id):
+        """Create the quiz's slot documents the first time this worker sees it"""
+        if quiz_id in self._slotted:
+            return
+        db = get_db()
+        db.quiz_admission_slots.bulk_write([
+            UpdateOne(
+                {"_id": f"{quiz_id}:{n}"},
+                {"$setOnInsert": {"quiz_id": quiz_id, "n": n, "holder": None, "expires_at": None}},
+                upsert=True
+            )
+            for n in range(self.limit)
+        ], ordered=False)
+        self._slotted.add(quiz_id)
+
+    def _claim_slot(self, quiz_id, holder, user_id, state, lease, now):
+        """Atomically take a free (or expired) slot; returns {'_id', 'holder'} or None"""
+        db = get_db()
+        return db.quiz_admission_slots.find_one_and_update(
+            {
+                "quiz_id": quiz_id,
+                "n": {"$lt": self.limit},
+                "$or": [{"holder": None}, {"expires_at": {"$lte": now}}]
+            },
+            {"$set": {
+                "holder": holder,
+                "user_id": user_id,
+                "state": state,
+                "expires_at": now + timedelta(seconds=lease)
+            }},
+            projection={"holder": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _free_slot(self, slot):
+        """Free a slot unless its lease already passed to someone else"""
+        db = get_db()
+        db.quiz_admission_slots.update_one(
+            {"_id": slot['_id'], "holder": slot['holder']},
+            {"$set": {"holder": None, "user_id": None, "state": None, "expires_at": None}}
+        )
+
+    def _queued(self, quiz_id, ticket, now):
+        db = get_db()
+        fresh = {"$gt": now - timedelta(seconds=TICKET_TTL)}
+        counters = db.quiz_admission.find_one({"_id": quiz_id}, {"serving_seq": 1}) or {}
+        return {
+            'admitted': False,
+            'ticket': ticket['_id'],
+            'seq': ticket['seq'],
+            'serving': counters.get('serving_seq', 0),
+            'position': db.quiz_admission_tickets.count_documents(
+                {"quiz_id": quiz_id, "seq": {"$lt": ticket['seq']}, "last_seen": fresh}) + 1,
+            'waiting': db.quiz_admission_tickets.count_documents({"quiz_id": quiz_id, "last_seen": fresh}),
+            'retry_after': RETRY_AFTER
+        }
+
+    def _promote(self, quiz_id, now):
+        """Reserve free slots for tickets at the head of the queue"""
+        db = get_db()
+        fresh = {"$gt": now - timedelta(seconds=TICKET_TTL)}
+        notifications = []
+        serving = 0
+        while True:
+            head = db.quiz_admission_tickets.find_one({"quiz_id": quiz_id, "last_seen": fresh}, sort=[("seq", 1)])
+            if not head:
+                break
+            slot = self._claim_slot(quiz_id, head['_id'], head['user_id'], 'reserved', READY_GRACE, now)
+            if not slot:
+                break
+            if not db.quiz_admission_tickets.delete_one({"_id": head['_id']}).deleted_count:
+                # Another worker promoted this ticket first; give the slot back
+                self._free_slot(slot)
+                continue
+            serving = head['seq']
+            notifications.append(('quiz_queue_ready', {'quiz_id': quiz_id, 'ticket': head['_id']}, f"quiz_ticket_{head['_id']}"))
+
+        if notifications:
+            db.quiz_admission.update_one({"_id": quiz_id}, {"$max": {"serving_seq": serving}})
+            # One message lets every waiting client work out its own position
+            notifications.append(('quiz_queue_update', {
+                'quiz_id': quiz_id,
+                'serving': serving,
+                'waiting': db.quiz_admission_tickets.count_documents({"quiz_id": quiz_id, "last_seen": fresh})
+            }, f'quiz_queue_{quiz_id}'))
+        return notifications
+
+    def _notify(self, notifications):
+        if not notifications:
+            return
+        from websocket_service import socketio
+        for event, payload, room in notifications:
+            socketio.emit(event, payload, room=room)
+
+quiz_admission = QuizAdmission()
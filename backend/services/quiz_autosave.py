@@ -0,0 +1,77 @@
+from models.database import get_db
+from services.cache import TTLCache
+from datetime import datetime
+from bson import ObjectId
+import os
+
+ATTEMPT_CACHE_TTL = int(os.getenv('QUIZ_AUTOSAVE_ATTEMPT_TTL', 3600))  # seconds an attempt's bounds are cached
+
+class AnswerAutosave:
+    """Saves per-question answer deltas for in-progress attempts.
+
+    Each save is one $set on answers.<i> for just the questions in the
+    request, acknowledged only after it is written, so any worker can grade
+    the attempt on submit. Attempt bounds are validated once and cached per
+    worker; abandoned attempts age out of the cache.
+    """
+    def __init__(self):
+        self._attempts = TTLCache(ttl=ATTEMPT_CACHE_TTL, max_entries=10000)  # attempt_id -> bounds
+
+    def _load_attempt(self, attempt_id, user_id, quiz_id):
+        """Validate an attempt and remember its bounds"""
+        from models.quiz import Quiz
+        from models.quiz_attempt import QuizAttempt
+
+        attempt = QuizAttempt.get_in_progress(attempt_id, user_id, quiz_id)
+        if not attempt:
+            return None
+
+        quiz = Quiz.get_by_id(quiz_id)
+        if not quiz:
+            return None
+
+        info = {
+            'user_id': user_id,
+            'quiz_id': quiz_id,
+            'question_count': len(quiz.questions)
+        }
+        self._attempts.set(attempt_id, info)
+        return info
+
+    def save(self, attempt_id, user_id, quiz_id, answers):
+        """Write answer deltas ({question_index: answer}) to an in-progress attempt"""
+        if not ObjectId.is_valid(str(attempt_id)):
+            raise ValueError('Invalid quiz attempt')
+
+        info = self._attempts.get(attempt_id) or self._load_attempt(attempt_id, user_id, quiz_id)
+        if not info or info['user_id'] != user_id or info['quiz_id'] != quiz_id:
+            raise ValueError('Invalid quiz attempt')
+
+        update_fields = {}
+        for index, answer in answers.items():
+            try:
+                index = int(index)
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid question index: {index}')
+            if index < 0 or index >= info['question_count']:
+                raise ValueError(f'Invalid question index: {index}')
+            update_fields[f"answers.{index}"] = answer
+        update_fields['last_saved_at'] = datetime.utcnow()
+
+        db = get_db()
+        result = db.quiz_attempts.update_one(
+            {"_id": ObjectId(attempt_id), "status": "in_progress"},
+            {"$set": update_fields}
+        )
+        if result.matched_count == 0:
+            # Submitted (possibly on another worker) since it was cached
+            self.forget(attempt_id)
+            raise ValueError('Invalid quiz attempt')
+
+        return len(update_fields) - 1
+
+    def forget(self, attempt_id):
+        """Drop the cached bounds for an attempt"""
+        self._attempts.delete(attempt_id)
+
+answer_autosave = AnswerAutosave()
@@ -0,0 +1,147 @@
+from models.report import Report, REPORT_TYPES, JOB_TYPES
+from datetime import timedelta
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+import traceback
+
+REPORTS_DIR = os.getenv('REPORTS_DIR', os.path.join(tempfile.gettempdir(), 'tnca_reports'))
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 1))
+REPORT_RETENTION_DAYS = int(os.getenv('REPORT_RETENTION_DAYS', 7))
+POLL_INTERVAL = 2                      # seconds between queue polls when idle
+PROGRESS_EVERY = 1000                  # rows between progress updates (heartbeats)
+STALE_AFTER = timedelta(minutes=5)     # running jobs without a heartbeat are requeued
+MAINTENANCE_INTERVAL = 300             # seconds between requeue/retention sweeps
+
+def estimate_rows(export_type):
+    """Rough row count used for the progress percentage (None if unknown)"""
+    from models.database import get_db
+    db = get_db()
+    if export_type == 'users':
+        return db.users.estimated_document_count()
+    if export_type == 'quiz_results':
+        return db.quiz_attempts.estimated_document_count()
+    return None
+
+def run_report(report):
+    """Generate one report file in REPORTS_DIR"""
+    from services.exports import EXPORTS, stream_csv, write_xlsx
+
+    report_id = str(report['_id'])
+    export_type = REPORT_TYPES[report['type']]
+    headers, rows = EXPORTS[export_type]
+    total = estimate_rows(export_type)
+    written = 0
+
+    def tracked(rows):
+        nonlocal written
+        for row in rows:
+            yield row
+            written += 1
+            if written % PROGRESS_EVERY == 0:
+                progress = min(99, int(written * 100 / total)) if total else 0
+                Report.update_progress(report_id, written, progress)
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    file_path = os.path.join(REPORTS_DIR, f"{report_id}.{report['format']}")
+    partial_path = f"{file_path}.partial"
+
+    try:
+        if report['format'] == 'csv':
+            with open(partial_path, 'wb') as f:
+                for chunk in stream_csv(headers, tracked(rows())):
+                    f.write(chunk)
+        else:
+            write_xlsx(headers, tracked(rows()), partial_path)
+        os.replace(partial_path, file_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    Report.complete(report_id, file_path, written)
+
+def run_regrade(job):
+    """Re-grade a quiz's completed attempts and store the summary on the job"""
+    from models.database import get_db
+    from models.quiz import Quiz
+    from services import leaderboards
+
+    job_id = str(job['_id'])
+    quiz_id = job['params']['quiz_id']
+    quiz = Quiz.get_by_id(quiz_id)
+    if not quiz:
+        raise ValueError('Quiz not found')
+
+    total = get_db().quiz_attempts.count_documents({"quiz_id": quiz_id, "status": "completed"})
+
+    def progress(regraded):
+        Report.update_progress(job_id, regraded, min(99, int(regraded * 100 / total)) if total else 0)
+
+    summary = quiz.regrade_attempts(progress=progress)
+    leaderboards.invalidate_quiz(quiz_id)
+    Report.complete_job(job_id, summary, summary['attempts_regraded'])
+
+JOBS = {
+    'quiz_regrade': run_regrade
+}
+
+def worker_main(mongo_uri, build_snapshots=False):
+    """Report worker process: claim queued jobs (exports and JOB_TYPES jobs) one at a time and run them.
+
+    One worker also rebuilds the analytics snapshot on ANALYTICS_SNAPSHOT_INTERVAL.
+    """
+    from models.database import connect
+    from services.analytics_snapshot import build_snapshot, SNAPSHOT_INTERVAL
+
+    connect(mongo_uri)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    last_maintenance = float('-inf')
+    last_snapshot = float('-inf')
+
+    while True:
+        try:
+            if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                Report.requeue_stale(STALE_AFTER)
+                Report.delete_expired(REPORT_RETENTION_DAYS)
+                last_maintenance = time.monotonic()
+
+            if build_snapshots and time.monotonic() - last_snapshot > SNAPSHOT_INTERVAL:
+                last_snapshot = time.monotonic()
+                build_snapshot()
+
+            report = Report.claim_next(worker_id)
+            if not report:
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            try:
+                if report['type'] in JOB_TYPES:
+                    JOBS[report['type']](report)
+                else:
+                    run_report(report)
+            except Exception as e:
+                print(f"Report {report['_id']} failed: {e}")
+                traceback.print_exc()
+                Report.fail(str(report['_id']), str(e))
+        except Exception as e:
+            print(f"Report worker error: {e}")
+            time.sleep(POLL_INTERVAL)
+
+def start_workers(mongo_uri, count=REPORT_WORKERS):
+    """Start report worker processes (fresh interpreters, separate from the web workers)"""
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for index in range(count):
+        process = context.Process(target=worker_main, args=(mongo_uri, index == 0), name='tnca-report-worker', daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+def stop_workers(processes):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout=5)
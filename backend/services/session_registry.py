@@ -0,0 +1,154 @@
+from datetime import datetime
+import heapq
+import threading
+
+def user_room(user_id):
+    """Personal room every socket of a user joins"""
+    return f'user_{user_id}'
+
+class SessionRegistry:
+    """Connected sockets and their game sessions, indexed by sid, user_id and session_id.
+
+    A user may hold several sockets (tabs, devices) and each socket several
+    game sessions; every lookup and removal is a dict operation. The user and
+    role come from the token verified at connect and stay fixed for the
+    socket's lifetime; token expiries are kept in a heap for the sweeper.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sockets = {}   # sid -> {'user_id', 'role', 'expires_at', 'sessions': set(session_id), 'codec', 'connected_at'}
+        self._users = {}     # user_id -> set(sid)
+        self._sessions = {}  # session_id -> {'socket_id', 'user_id', 'game_id', 'level_id', 'started_at'}
+        self._expiry = []    # heap of (expires_at, sid); entries are stale once the socket's expiry changes
+
+    def connect(self, sid, user_id=None, role=None, expires_at=None):
+        with self._lock:
+            socket = self._socket(sid)
+            socket['role'] = role
+            if user_id:
+                self._bind(sid, user_id)
+            self._set_expiry(sid, expires_at)
+
+    def set_expiry(self, sid, expires_at):
+        """Replace a socket's token expiry (after the client sends a fresh token)"""
+        with self._lock:
+            if sid in self._sockets:
+                self._set_expiry(sid, expires_at)
+
+    def _set_expiry(self, sid, expires_at):
+        self._sockets[sid]['expires_at'] = expires_at
+        if expires_at:
+            heapq.heappush(self._expiry, (expires_at, sid))
+
+    def expired(self, now=None):
+        """Pop sockets whose token has expired"""
+        now = now or datetime.utcnow()
+        sids = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, sid = heapq.heappop(self._expiry)
+                socket = self._sockets.get(sid)
+                if socket and socket['expires_at'] == expires_at:
+                    sids.append(sid)
+        return sids
+
+    def _socket(self, sid):
+        if sid not in self._sockets:
+            self._sockets[sid] = {'user_id': None, 'role': None, 'expires_at': None, 'sessions': set(),
+                                  'codec': 'json', 'connected_at': datetime.utcnow()}
+        return self._sockets[sid]
+
+    def _bind(self, sid, user_id):
+        self._sockets[sid]['user_id'] = user_id
+        self._users.setdefault(user_id, set()).add(sid)
+
+    def add_session(self, session_id, sid, user_id=None, game_id=None, level_id=None):
+        with self._lock:
+            # A session rejoined from a new socket moves off the old one
+            previous = self._sessions.get(session_id)
+            if previous and previous['socket_id'] in self._sockets:
+                self._sockets[previous['socket_id']]['sessions'].discard(session_id)
+
+            socket = self._socket(sid)
+            socket['sessions'].add(session_id)
+            if user_id and not socket['user_id']:
+                self._bind(sid, user_id)
+
+            self._sessions[session_id] = {
+                'socket_id': sid,
+                'user_id': user_id or socket['user_id'],
+                'game_id': game_id,
+                'level_id': level_id,
+                'started_at': datetime.utcnow()
+            }
+
+    def remove_session(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session and session['socket_id'] in self._sockets:
+                self._sockets[session['socket_id']]['sessions'].discard(session_id)
+            return session
+
+    def disconnect(self, sid):
+        """Forget a socket and every game session it held; returns the socket's user_id"""
+        with self._lock:
+            socket = self._sockets.pop(sid, None)
+            if not socket:
+                return None
+            for session_id in socket['sessions']:
+                session = self._sessions.get(session_id)
+                if session and session['socket_id'] == sid:
+                    del self._sessions[session_id]
+
+            user_id = socket['user_id']
+            if user_id:
+                sids = self._users.get(user_id)
+                if sids is not None:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._users[user_id]
+            return user_id
+
+    def set_codec(self, sid, codec):
+        with self._lock:
+            self._socket(sid)['codec'] = codec
+
+    def codec_for(self, sid):
+        socket = self._sockets.get(sid)
+        return socket['codec'] if socket else 'json'
+
+    def get_session(self, session_id):
+        return self._sessions.get(session_id)
+
+    def user_for(self, sid):
+        socket = self._sockets.get(sid)
+        return socket['user_id'] if socket else None
+
+    def role_for(self, sid):
+        socket = self._sockets.get(sid)
+        return socket['role'] if socket else None
+
+    def sids_for(self, user_id):
+        with self._lock:
+            return set(self._users.get(user_id, ()))
+
+    def sids(self):
+        with self._lock:
+            return set(self._sockets)
+
+    def session_ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def is_online(self, user_id):
+        return user_id in self._users
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sockets': len(self._sockets),
+                'users': len(self._users),
+                'game_sessions': len(self._sessions)
+            }
+
+session_registry = SessionRegistry()
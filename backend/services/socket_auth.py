@@ -0,0 +1,51 @@
+from flask import request
+from flask_jwt_extended import decode_token
+from datetime import datetime
+from bson import ObjectId
+import os
+
+SOCKET_AUTH_CHECK_INTERVAL = float(os.getenv('SOCKET_AUTH_CHECK_INTERVAL', 5))  # seconds between expiry sweeps
+
+class SocketAuthError(Exception):
+    """Token missing, invalid, expired or for an unknown/inactive user"""
+
+def connection_token(auth):
+    """Access token from the Socket.IO auth payload, ?token= or an Authorization header"""
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    if request.args.get('token'):
+        return request.args['token']
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return None
+
+def authenticate(token):
+    """Verify an access token once and return the identity bound to the connection.
+
+    Returns {'user_id', 'role', 'expires_at'}; expires_at is None for tokens
+    without an expiry. Must run inside the app context (for the JWT settings).
+    """
+    from models.user import User
+
+    if not token:
+        raise SocketAuthError('Missing access token')
+    try:
+        claims = decode_token(token)
+    except Exception as e:
+        raise SocketAuthError(f'Invalid access token: {e}')
+    if claims.get('type') != 'access':
+        raise SocketAuthError('An access token is required')
+
+    user_id = str(claims.get('sub'))
+    user = User.get_by_id(user_id) if ObjectId.is_valid(user_id) else None
+    if not user:
+        raise SocketAuthError('User not found')
+    if not user.is_active:
+        raise SocketAuthError('Account is deactivated')
+
+    return {
+        'user_id': user_id,
+        'role': user.role,
+        'expires_at': datetime.utcfromtimestamp(claims['exp']) if claims.get('exp') else None
+    }
@@ -0,0 +1,263 @@
+import multiprocessing
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import socketio
+
+# Cross-worker Socket.IO fan-out. Any URL Flask-SocketIO understands (redis://, amqp://,
+# kafka://, zmq+tcp://) is passed through; local://<socket path> uses the broker below.
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'tnca')
+DEFAULT_BROKER_PATH = os.path.join(tempfile.gettempdir(), 'tnca-socketio.sock')
+MAX_PENDING_BYTES = 16 * 1024 * 1024   # a subscriber this far behind is dropped and reconnects
+RECONNECT_DELAY = 1                    # seconds
+
+SUBSCRIBE = b'SUBSCRIBE'
+HEADER = struct.Struct('!I')
+
+def broker_path(url):
+    """Socket path of a local:// message queue URL"""
+    return url[len('local://'):] or DEFAULT_BROKER_PATH
+
+def is_local(url):
+    return bool(url) and url.startswith('local://')
+
+def frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+def read_frames(sock):
+    """Yield length-prefixed frames from a connected socket until it closes"""
+    buffer = bytearray()
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError('message broker closed the connection')
+        buffer += data
+        while len(buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(buffer)
+            if len(buffer) < HEADER.size + length:
+                break
+            payload = bytes(buffer[HEADER.size:HEADER.size + length])
+            del buffer[:HEADER.size + length]
+            yield payload
+
+class BrokerPeer:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+        self.subscriber = False
+
+class LocalBroker:
+    """Single-host pub/sub over a Unix socket: every published frame goes to every subscriber"""
+    def __init__(self, path=DEFAULT_BROKER_PATH):
+        self.path = path
+        self.selector = selectors.DefaultSelector()
+        self.peers = {}
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(128)
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ)
+
+        while True:
+            for key, events in self.selector.select():
+                if key.fileobj is server:
+                    self._accept(server)
+                    continue
+                peer = self.peers.get(key.fileobj)
+                if peer and events & selectors.EVENT_READ:
+                    self._read(peer)
+                if peer and peer.sock in self.peers and events & selectors.EVENT_WRITE:
+                    self._flush(peer)
+
+    def start(self):
+        """Serve from a daemon thread (tests and single-process runs)"""
+        thread = threading.Thread(target=self.serve_forever, name='tnca-socketio-broker', daemon=True)
+        thread.start()
+        return thread
+
+    def _accept(self, server):
+        sock, _ = server.accept()
+        sock.setblocking(False)
+        self.peers[sock] = BrokerPeer(sock)
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def _close(self, peer):
+        self.peers.pop(peer.sock, None)
+        try:
+            self.selector.unregister(peer.sock)
+        except (KeyError, ValueError):
+            pass
+        peer.sock.close()
+
+    def _read(self, peer):
+        try:
+            data = peer.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(peer)
+            return
+
+        peer.inbound += data
+        while len(peer.inbound) >= HEADER.size:
+            (length,) = HEADER.unpack_from(peer.inbound)
+            if len(peer.inbound) < HEADER.size + length:
+                break
+            message = bytes(peer.inbound[:HEADER.size + length])
+            del peer.inbound[:HEADER.size + length]
+            if message[HEADER.size:] == SUBSCRIBE:
+                peer.subscriber = True
+            else:
+                self._publish(message)
+
+    def _publish(self, message):
+        for peer in list(self.peers.values()):
+            if not peer.subscriber:
+                continue
+            if len(peer.outbound) + len(message) > MAX_PENDING_BYTES:
+                print(f"Socket.IO broker dropping slow subscriber ({len(peer.outbound)} bytes pending)")
+                self._close(peer)
+                continue
+            had_pending = bool(peer.outbound)
+            peer.outbound += message
+            if not had_pending:
+                self._flush(peer)
+
+    def _flush(self, peer):
+        try:
+            sent = peer.sock.send(peer.outbound)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._close(peer)
+            return
+        del peer.outbound[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if peer.outbound else 0)
+        self.selector.modify(peer.sock, events)
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """Socket.IO client manager that fans out through a LocalBroker"""
+    name = 'local'
+
+    def __init__(self, url='local://', channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = broker_path(url)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock
+
+    def _publish(self, data):
+        message = frame(self.json.dumps({'channel': self.channel, 'data': data}).encode())
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect()
+                    self._publisher.sendall(message)
+                    return
+                except OSError:
+                    if self._publisher is not None:
+                        self._publisher.close()
+                    self._publisher = None
+        self._get_logger().error('Socket.IO message broker unavailable, message dropped')
+
+    def _listen(self):
+        while True:
+            sock = None
+            try:
+                sock = self._connect()
+                sock.sendall(frame(SUBSCRIBE))
+                for payload in read_frames(sock):
+                    message = self.json.loads(payload)
+                    if message.get('channel') == self.channel:
+                        yield message['data']
+            except OSError as e:
+                self._get_logger().warning(f'Socket.IO message broker connection lost: {e}')
+            finally:
+                if sock is not None:
+                    sock.close()
+            time.sleep(RECONNECT_DELAY)
+
+def message_queue_options(url=SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL):
+    """Keyword arguments for socketio.init_app() selecting the configured backend"""
+    if not url:
+        return {}
+    if is_local(url):
+        return {'client_manager': LocalBrokerManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+def publisher(url=SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL):
+    """Write-only client manager for processes without a Socket.IO server (report workers); None without a queue"""
+    if not url:
+        return None
+    if is_local(url):
+        return LocalBrokerManager(url, channel=channel, write_only=True)
+    # Same backend selection Flask-SocketIO makes for message_queue URLs
+    if url.startswith(('redis://', 'rediss://')):
+        queue_class = socketio.RedisManager
+    elif url.startswith('kafka://'):
+        queue_class = socketio.KafkaManager
+    elif url.startswith('zmq'):
+        queue_class = socketio.ZmqManager
+    else:
+        queue_class = socketio.KombuManager
+    return queue_class(url, channel=channel, write_only=True)
+
+def route_internal_event(manager, event, handler):
+    """Hand `event` messages from the queue to handler(data, room) instead of client sockets.
+
+    Returns False when the manager has no message queue (single process).
+    """
+    if not isinstance(manager, socketio.PubSubManager):
+        return False
+    handle_emit = manager._handle_emit
+
+    def internal_handle_emit(message):
+        if message.get('event') != event:
+            return handle_emit(message)
+        # Emits carry their arguments as a list
+        data = message['data']
+        handler(data[0] if isinstance(data, list) and len(data) == 1 else data, message.get('room'))
+
+    manager._handle_emit = internal_handle_emit
+    return True
+
+def reset_host_id(socketio_app):
+    """Give a forked worker its own pub/sub identity (preload_app shares the master's)"""
+    manager = socketio_app.server.manager if socketio_app.server else None
+    if isinstance(manager, socketio.PubSubManager):
+        manager.host_id = uuid.uuid4().hex
+
+def run_broker(path):
+    LocalBroker(path).serve_forever()
+
+def start_broker(url=SOCKETIO_MESSAGE_QUEUE):
+    """Start the local broker process when a local:// queue is configured"""
+    if not is_local(url):
+        return None
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=run_broker, args=(broker_path(url),), name='tnca-socketio-broker', daemon=True)
+    process.start()
+    return process
+
+def stop_broker(process):
+    if process and process.is_alive():
+        process.terminate()
+        process.join(timeout=5)
@@ -0,0 +1,93 @@
+from datetime import datetime
+from bson import ObjectId
+import os
+
+try:
+    import msgpack
+except ImportError:  # binary mode is unavailable without msgpack; clients stay on JSON
+    msgpack = None
+
+SOCKETIO_BINARY = os.getenv('SOCKETIO_BINARY', 'true').lower() == 'true' and msgpack is not None
+COMPRESSION_THRESHOLD = int(os.getenv('SOCKETIO_COMPRESSION_THRESHOLD', 1024))  # bytes, long-polling responses
+
+BINARY_SUFFIX = '#bin'
+SCHEMA_VERSION = 1
+
+LEADERBOARD_ENTRY = ('user_id', 'username', 'name', 'total_score', 'total_plays', 'correct_answers', 'average_score', 'rank')
+
+# event -> (positional fields, {field: positional fields of each list item})
+# Binary payloads are [SCHEMA_VERSION, value, ...] in this order; datetimes are epoch milliseconds.
+SCHEMAS = {
+    'game_move_update': (('session_id', 'move', 'user_id', 'timestamp'), {}),
+    'game_solution_result': (('session_id', 'result', 'user_id', 'timestamp'), {}),
+    'chat_message': (('session_id', 'message', 'user_id', 'user_name', 'timestamp', 'message_id'), {}),
+    'leaderboard_update': (('game_id', 'version', 'base_version', 'changed', 'removed'), {'changed': LEADERBOARD_ENTRY}),
+    'leaderboard_snapshot': (('game_id', 'version', 'entries'), {'entries': LEADERBOARD_ENTRY})
+}
+
+def binary_room(room):
+    return f'{room}{BINARY_SUFFIX}'
+
+def plain(value, datetime_format):
+    """Copy of value with datetimes passed through datetime_format and ObjectIds as strings"""
+    if isinstance(value, dict):
+        return {key: plain(item, datetime_format) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item, datetime_format) for item in value]
+    if isinstance(value, datetime):
+        return datetime_format(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+def epoch_ms(value):
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+def to_json(data):
+    return plain(data, datetime.isoformat)
+
+def to_msgpack(event, data):
+    """Encode an event payload; events without a schema are packed as maps"""
+    data = plain(data, epoch_ms)
+    schema = SCHEMAS.get(event)
+    if schema and isinstance(data, dict):
+        fields, nested = schema
+        values = []
+        for field in fields:
+            value = data.get(field)
+            if field in nested and isinstance(value, list):
+                value = [[item.get(name) for name in nested[field]] for item in value]
+            values.append(value)
+        data = [SCHEMA_VERSION] + values
+    return msgpack.packb(data, use_bin_type=True)
+
+def describe_schemas():
+    """Field lists sent to clients when they select msgpack"""
+    return {
+        'version': SCHEMA_VERSION,
+        'events': {
+            event: {'fields': list(fields), 'nested': {field: list(names) for field, names in nested.items()}}
+            for event, (fields, nested) in SCHEMAS.items()
+        }
+    }
+
+def emit_room(event, data, room, **kwargs):
+    """Emit to a room once per codec: JSON to `room`, MessagePack to `room#bin`"""
+    from websocket_service import socketio
+    socketio.emit(event, to_json(data), room=room, **kwargs)
+    if SOCKETIO_BINARY:
+        socketio.emit(event, to_msgpack(event, data), room=binary_room(room), **kwargs)
+
+def emit_sid(event, data, sid, codec='json'):
+    """Emit to one connection in its negotiated codec"""
+    from websocket_service import socketio
+    payload = to_msgpack(event, data) if codec == 'msgpack' else to_json(data)
+    socketio.emit(event, payload, to=sid)
+
+def compression_options():
+    """Engine.IO options for compressing long-polling responses.
+
+    Websocket frames use permessage-deflate when the browser offers it and
+    the websocket server supports it.
+    """
+    return {'http_compression': COMPRESSION_THRESHOLD > 0, 'compression_threshold': COMPRESSION_THRESHOLD}
@@ -1,70 +1,204 @@
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, ConnectionRefusedError, emit, join_room, leave_room, rooms
 from flask import request
 from models.database import get_db
-from models.user import User
 from models.game import Game
 from models.tournament import Tournament
+from models.match import Match
+from models.socket_state import SocketState
+from services.session_registry import session_registry, user_room
+from services.leaderboard_broadcaster import leaderboard_broadcaster, leaderboard_room
+from services.handler_executor import handler_executor
+from services.presence import presence, game_key, tournament_key, PRESENCE_HEARTBEAT
+from services.chat import chat_service, RateLimited
+from services.socket_auth import authenticate, connection_token, SocketAuthError, SOCKET_AUTH_CHECK_INTERVAL
+from services.background import start_periodic
+from services.match_engine import match_engine, match_room
+from services.socket_codec import emit_room, emit_sid, binary_room, describe_schemas, SOCKETIO_BINARY, BINARY_SUFFIX
 from datetime import datetime
+from bson import ObjectId
+from functools import wraps
 import json
 
 socketio = SocketIO(cors_allowed_origins="*")
 
-# Store active game sessions
-active_sessions = {}
-active_tournaments = {}
+def offloaded(event):
+    """Run a DB-bound handler as fn(sid, data) in the handler pool, in order per connection.
+
+    The handler has no request context there, so it emits to an explicit
+    room or sid. When the pool is saturated the client gets
+    server_busy and should retry.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def handler(data):
+            if not handler_executor.submit(request.sid, event, fn, request.sid, data or {}):
+                emit('server_busy', {'event': event, 'message': 'Server busy, please retry'})
+        return handler
+    return decorator
+
+ADMIN_ROLES = ('admin', 'super_admin', 'developer')
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
+def handle_connect(auth=None):
+    """Verify the access token once and bind its user and role to this connection"""
+    try:
+        identity = authenticate(connection_token(auth))
+    except SocketAuthError as e:
+        print(f'Client rejected: {request.sid} ({e})')
+        raise ConnectionRefusedError(str(e))
+    
     print(f'Client connected: {request.sid}')
-    emit('connected', {'message': 'Connected to TNCA Game Server'})
+    user_id = identity['user_id']
+    session_registry.connect(request.sid, user_id, identity['role'], identity['expires_at'])
+    if request.args.get('codec') == 'msgpack' and SOCKETIO_BINARY:
+        session_registry.set_codec(request.sid, 'msgpack')
+    start_periodic('socket_auth_expiry', SOCKET_AUTH_CHECK_INTERVAL, disconnect_expired)
+    presence.start()
+    presence.touch(request.sid, user_id)
+    restore_rooms(user_id)
+    emit('connected', {
+        'message': 'Connected to TNCA Game Server',
+        'user_id': user_id,
+        'heartbeat_interval': PRESENCE_HEARTBEAT
+    })
+
+@socketio.on('refresh_token')
+def handle_refresh_token(data):
+    """Extend this connection with a fresh access token for the same user"""
+    try:
+        identity = authenticate(data.get('token'))
+    except SocketAuthError as e:
+        return {'success': False, 'message': str(e)}
+    if identity['user_id'] != session_registry.user_for(request.sid):
+        return {'success': False, 'message': 'Token belongs to another user'}
+    session_registry.set_expiry(request.sid, identity['expires_at'])
+    return {'success': True}
+
+def disconnect_expired():
+    """Disconnect sockets whose access token has expired"""
+    for sid in session_registry.expired():
+        socketio.emit('session_expired', {'message': 'Access token expired, reconnect with a new token'}, to=sid)
+        socketio.server.disconnect(sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'Client disconnected: {request.sid}')
-    # Clean up any active sessions
-    for session_id, session in active_sessions.items():
-        if session.get('socket_id') == request.sid:
-            del active_sessions[session_id]
-            break
+    # Rooms are left by Socket.IO
+    drop_socket(request.sid)
+
+def drop_socket(sid):
+    """Forget a socket, every game session it held and its presence"""
+    session_registry.disconnect(sid)
+    leaderboard_broadcaster.remove_sid(sid)
+    presence.remove(sid)
+
+@socketio.on('heartbeat')
+def handle_heartbeat(data=None):
+    """Keep this socket counted as online; clients that send heartbeats are dropped when they stop"""
+    presence.touch(request.sid, session_registry.user_for(request.sid), heartbeat=True)
+    return {'interval': PRESENCE_HEARTBEAT}
+
+def join(room):
+    """Join a room in the current connection's codec (binary clients use room#bin)"""
+    binary = session_registry.codec_for(request.sid) == 'msgpack'
+    join_room(binary_room(room) if binary else room)
+
+def enter_room(sid, room):
+    """join() for a connection outside its request context (offloaded handlers)"""
+    binary = session_registry.codec_for(sid) == 'msgpack'
+    socketio.server.enter_room(sid, binary_room(room) if binary else room)
+
+def leave(room):
+    leave_room(room)
+    leave_room(binary_room(room))
+
+@socketio.on('set_codec')
+def handle_set_codec(data):
+    """Switch this connection between JSON and MessagePack payloads"""
+    codec = data.get('codec')
+    if codec not in ('json', 'msgpack') or (codec == 'msgpack' and not SOCKETIO_BINARY):
+        codec = 'json'
+    
+    previous = session_registry.codec_for(request.sid)
+    if codec != previous:
+        session_registry.set_codec(request.sid, codec)
+        # Move codec-aware rooms to their twin (quiz queue rooms stay JSON)
+        for room in rooms():
+            if room == request.sid or room.startswith('quiz_'):
+                continue
+            base = room[:-len(BINARY_SUFFIX)] if room.endswith(BINARY_SUFFIX) else room
+            leave_room(room)
+            join(base)
+    
+    emit('codec_selected', {'codec': codec, 'schemas': describe_schemas() if codec == 'msgpack' else None})
+
+def restore_rooms(user_id):
+    """Join the user's personal room and the rooms and game sessions saved for them"""
+    join(user_room(user_id))
+
+    # Rooms joined before a reconnect (possibly on another worker) carry over
+    try:
+        rooms, sessions = SocketState.restore(user_id)
+        for room in rooms:
+            join(room)
+            if room.startswith('tournament_'):
+                presence.join(request.sid, tournament_key(room[len('tournament_'):]), user_id)
+        for session in sessions:
+            join(session['_id'])
+            session_registry.add_session(session['_id'], request.sid, user_id, session.get('game_id'), session.get('level_id'))
+            if session.get('game_id'):
+                presence.join(request.sid, game_key(session['game_id']), user_id, ref=session['_id'])
+    except Exception as e:
+        print(f"Error restoring socket state: {e}")
+
+def find_session(session_id):
+    """Game session from this worker's registry, else from the shared store"""
+    session = session_registry.get_session(session_id)
+    if session is None:
+        session = SocketState.get_game_session(session_id)
+    return session
 
 @socketio.on('join_game_session')
 def handle_join_game_session(data):
     """Join a game session room"""
     session_id = data.get('session_id')
-    user_id = data.get('user_id')
+    user_id = session_registry.user_for(request.sid)
     
     if session_id:
-        join_room(session_id)
-        active_sessions[session_id] = {
-            'socket_id': request.sid,
-            'user_id': user_id,
-            'game_id': data.get('game_id'),
-            'level_id': data.get('level_id'),
-            'started_at': datetime.utcnow()
-        }
+        join(session_id)
+        session_registry.add_session(session_id, request.sid, user_id,
+                                     data.get('game_id'), data.get('level_id'))
+        if data.get('game_id'):
+            presence.join(request.sid, game_key(data['game_id']), user_id, ref=session_id)
+        SocketState.save_game_session(session_id, user_id, data.get('game_id'), data.get('level_id'))
         emit('joined_session', {'session_id': session_id, 'message': 'Joined game session'})
+        # Late joiners get the room's recent chat
+        handler_executor.submit(request.sid, 'chat_history', send_chat_history, request.sid, session_id)
 
 @socketio.on('leave_game_session')
 def handle_leave_game_session(data):
     """Leave a game session room"""
     session_id = data.get('session_id')
     if session_id:
-        leave_room(session_id)
-        if session_id in active_sessions:
-            del active_sessions[session_id]
+        leave(session_id)
+        session = session_registry.remove_session(session_id)
+        if session and session['socket_id'] == request.sid and session.get('game_id'):
+            presence.leave(request.sid, game_key(session['game_id']), ref=session_id)
+        SocketState.remove_game_session(session_id)
         emit('left_session', {'session_id': session_id, 'message': 'Left game session'})
 
 @socketio.on('join_tournament')
 def handle_join_tournament(data):
     """Join a tournament room"""
     tournament_id = data.get('tournament_id')
-    user_id = data.get('user_id')
+    user_id = session_registry.user_for(request.sid)
     
     if tournament_id:
         room_name = f'tournament_{tournament_id}'
-        join_room(room_name)
+        join(room_name)
+        presence.join(request.sid, tournament_key(tournament_id), user_id)
+        SocketState.add_room(user_id, room_name)
         emit('joined_tournament', {
             'tournament_id': tournament_id,
             'message': 'Joined tournament room'
@@ -76,38 +210,134 @@ def handle_leave_tournament(data):
     tournament_id = data.get('tournament_id')
     if tournament_id:
         room_name = f'tournament_{tournament_id}'
-        leave_room(room_name)
+        leave(room_name)
+        presence.leave(request.sid, tournament_key(tournament_id))
+        SocketState.remove_room(session_registry.user_for(request.sid), room_name)
         emit('left_tournament', {
             'tournament_id': tournament_id,
             'message': 'Left tournament room'
         })
 
+@socketio.on('subscribe_leaderboard')
+def handle_subscribe_leaderboard(data):
+    """Follow a game's top-K leaderboard; pass ack=True to acknowledge each version"""
+    game_id = data.get('game_id')
+    if game_id and ObjectId.is_valid(str(game_id)):
+        join(leaderboard_room(game_id))
+        snapshot = leaderboard_broadcaster.subscribe(request.sid, str(game_id), bool(data.get('ack')))
+        emit_sid('leaderboard_snapshot', snapshot, request.sid, session_registry.codec_for(request.sid))
+
+@socketio.on('unsubscribe_leaderboard')
+def handle_unsubscribe_leaderboard(data):
+    """Stop following a game's leaderboard"""
+    game_id = data.get('game_id')
+    if game_id:
+        leave(leaderboard_room(game_id))
+        leaderboard_broadcaster.unsubscribe(request.sid, str(game_id))
+
+@socketio.on('leaderboard_ack')
+def handle_leaderboard_ack(data):
+    """Client has applied a leaderboard version; resync it if it skipped diffs"""
+    game_id = data.get('game_id')
+    if game_id:
+        snapshot = leaderboard_broadcaster.ack(request.sid, str(game_id), int(data.get('version', 0)))
+        if snapshot:
+            emit_sid('leaderboard_snapshot', snapshot, request.sid, session_registry.codec_for(request.sid))
+
+@socketio.on('join_quiz_queue')
+def handle_join_quiz_queue(data):
+    """Follow queue progress for a queued quiz start"""
+    quiz_id = data.get('quiz_id')
+    ticket = data.get('ticket')
+    
+    if quiz_id and ticket:
+        join_room(f'quiz_queue_{quiz_id}')
+        join_room(f'quiz_ticket_{ticket}')
+        emit('joined_quiz_queue', {'quiz_id': quiz_id, 'ticket': ticket})
+
+@socketio.on('leave_quiz_queue')
+def handle_leave_quiz_queue(data):
+    """Stop following a quiz start queue"""
+    quiz_id = data.get('quiz_id')
+    ticket = data.get('ticket')
+    
+    if quiz_id:
+        leave_room(f'quiz_queue_{quiz_id}')
+    if ticket:
+        leave_room(f'quiz_ticket_{ticket}')
+
 @socketio.on('game_move')
 def handle_game_move(data):
     """Handle game move updates"""
+    if data.get('match_id'):
+        # Head-to-head matches are validated by the match engine
+        return handle_match_move(data)
+    
     session_id = data.get('session_id')
     move_data = data.get('move')
-    user_id = data.get('user_id')
+    user_id = session_registry.user_for(request.sid)
     
-    if session_id and session_id in active_sessions:
+    if session_id and find_session(session_id):
         # Broadcast move to all players in the session
-        emit('game_move_update', {
+        emit_room('game_move_update', {
             'session_id': session_id,
             'move': move_data,
             'user_id': user_id,
-            'timestamp': datetime.utcnow().isoformat()
-        }, room=session_id)
+            'timestamp': datetime.utcnow()
+        }, session_id)
+
+def match_action(sid, data, action):
+    """Hand a player's action to the match engine (which relays it to the worker playing the match)"""
+    match_id = str(data.get('match_id') or '')
+    if not ObjectId.is_valid(match_id):
+        socketio.emit('match_error', {'match_id': match_id, 'error': 'Invalid match'}, to=sid)
+        return
+    match_engine.start()
+    match_engine.submit(sid, session_registry.user_for(sid), match_id, action, data, session_registry.codec_for(sid))
+
+@socketio.on('join_match')
+@offloaded('join_match')
+def handle_join_match(sid, data):
+    """Join a live head-to-head match; the clocks start once both players are in"""
+    match_id = str(data.get('match_id') or '')
+    user_id = session_registry.user_for(sid)
+    match = Match.get_by_id(match_id) if ObjectId.is_valid(match_id) else None
+    if not match or user_id not in (match.challenger_id, match.opponent_id):
+        socketio.emit('match_error', {'match_id': match_id, 'error': 'Match not found'}, to=sid)
+        return
+    
+    enter_room(sid, match_room(match_id))
+    match_action(sid, data, 'join')
+
+@socketio.on('match_move')
+@offloaded('match_move')
+def handle_match_move(sid, data):
+    """Play a move: {'match_id', 'move'} for chess, {'match_id', 'moves': [...]} for cube"""
+    match_action(sid, data, 'move')
+
+@socketio.on('match_resign')
+@offloaded('match_resign')
+def handle_match_resign(sid, data):
+    """Resign a live match"""
+    match_action(sid, data, 'resign')
+
+@socketio.on('match_sync')
+@offloaded('match_sync')
+def handle_match_sync(sid, data):
+    """Send the full match state to a client that missed updates"""
+    match_action(sid, data, 'sync')
 
 @socketio.on('game_solution_submit')
-def handle_game_solution(data):
+@offloaded('game_solution_submit')
+def handle_game_solution(sid, data):
     """Handle game solution submission"""
     session_id = data.get('session_id')
     solution = data.get('solution')
     time_taken = data.get('time_taken')
-    user_id = data.get('user_id')
+    user_id = session_registry.user_for(sid)
     
-    if session_id and session_id in active_sessions:
-        session = active_sessions[session_id]
+    session = find_session(session_id) if session_id else None
+    if session:
         
         # Process solution
         try:
@@ -116,115 +346,146 @@ def handle_game_solution(data):
                 result = game.submit_solution(session['level_id'], user_id, solution, time_taken)
                 
                 # Broadcast result to session
-                emit('game_solution_result', {
+                emit_room('game_solution_result', {
                     'session_id': session_id,
                     'result': result,
                     'user_id': user_id,
-                    'timestamp': datetime.utcnow().isoformat()
-                }, room=session_id)
+                    'timestamp': datetime.utcnow()
+                }, session_id)
                 
-                # Update leaderboard if needed
-                if result.get('is_correct'):
-                    emit('leaderboard_update', {
-                        'game_id': session['game_id'],
-                        'user_id': user_id,
-                        'score': result.get('score', 0)
-                    }, broadcast=True)
+                # Coalesced into the next leaderboard tick for this game
+                if result.get('correct'):
+                    leaderboard_broadcaster.mark_dirty(session['game_id'])
         
         except Exception as e:
-            emit('game_error', {
+            emit_room('game_error', {
                 'session_id': session_id,
                 'error': str(e)
-            }, room=session_id)
+            }, session_id)
 
 @socketio.on('tournament_match_update')
-def handle_tournament_match(data):
-    """Handle tournament match updates"""
+@offloaded('tournament_match_update')
+def handle_tournament_match(sid, data):
+    """Handle tournament match updates (admins only)"""
     tournament_id = data.get('tournament_id')
     match_id = data.get('match_id')
     winner_id = data.get('winner_id')
     player1_score = data.get('player1_score', 0)
     player2_score = data.get('player2_score', 0)
     
-    if tournament_id:
+    if tournament_id and session_registry.role_for(sid) not in ADMIN_ROLES:
+        socketio.emit('tournament_error', {'tournament_id': tournament_id, 'error': 'Admin access required'}, to=sid)
+    elif tournament_id:
         try:
             tournament = Tournament.get_by_id(tournament_id)
             if tournament:
-                success = tournament.update_match_result(match_id, winner_id, player1_score, player2_score)
-                
-                if success:
-                    # Broadcast tournament update
-                    room_name = f'tournament_{tournament_id}'
-                    emit('tournament_update', {
-                        'tournament_id': tournament_id,
-                        'match_id': match_id,
-                        'winner_id': winner_id,
-                        'tournament_data': tournament.to_dict()
-                    }, room=room_name)
-                    
-                    # Check if tournament is complete
-                    if tournament.status == 'completed':
-                        emit('tournament_completed', {
-                            'tournament_id': tournament_id,
-                            'winner_id': tournament.winner_id,
-                            'tournament_data': tournament.to_dict()
-                        }, room=room_name)
+                delta = tournament.update_match_result(match_id, winner_id, player1_score, player2_score)
+                if delta:
+                    broadcast_tournament_delta(delta)
         
         except Exception as e:
-            emit('tournament_error', {
+            socketio.emit('tournament_error', {
                 'tournament_id': tournament_id,
                 'error': str(e)
-            })
+            }, to=sid)
+
+@socketio.on('tournament_sync')
+@offloaded('tournament_sync')
+def handle_tournament_sync(sid, data):
+    """Send a full snapshot to a client whose tournament version is behind (missed deltas)"""
+    tournament_id = data.get('tournament_id')
+    if not tournament_id or not ObjectId.is_valid(str(tournament_id)):
+        return
+    
+    tournament = Tournament.get_by_id(tournament_id)
+    if not tournament:
+        socketio.emit('tournament_error', {'tournament_id': tournament_id, 'error': 'Tournament not found'}, to=sid)
+    elif int(data.get('version', -1)) < tournament.version:
+        tournament_data = tournament.to_dict()
+        tournament_data['progress'] = tournament.get_tournament_progress()
+        emit_sid('tournament_snapshot', {
+            'tournament_id': tournament_id,
+            'version': tournament.version,
+            'tournament_data': tournament_data
+        }, sid, session_registry.codec_for(sid))
+    else:
+        socketio.emit('tournament_synced', {'tournament_id': tournament_id, 'version': tournament.version}, to=sid)
+
+def in_room(sid, room):
+    joined = socketio.server.rooms(sid)
+    return room in joined or binary_room(room) in joined
+
+def send_chat_history(sid, session_id):
+    if not in_room(sid, session_id):
+        return
+    messages = [chat_service.to_event(message) for message in chat_service.history(session_id)]
+    emit_sid('chat_history', {'session_id': session_id, 'messages': messages}, sid, session_registry.codec_for(sid))
 
 @socketio.on('chat_message')
-def handle_chat_message(data):
-    """Handle chat messages"""
+@offloaded('chat_message')
+def handle_chat_message(sid, data):
+    """Handle chat messages from the connection's user to a session it has joined"""
     session_id = data.get('session_id')
-    message = data.get('message')
-    user_id = data.get('user_id')
+    user_id = session_registry.user_for(sid)
     
-    if session_id and message:
-        # Get user details
-        user = User.get_by_id(user_id)
-        user_name = user.name if user else 'Unknown'
-        
-        # Broadcast message to session
-        emit('chat_message', {
-            'session_id': session_id,
-            'message': message,
-            'user_id': user_id,
-            'user_name': user_name,
-            'timestamp': datetime.utcnow().isoformat()
-        }, room=session_id)
+    if not session_id:
+        return
+    if not user_id or not in_room(sid, session_id):
+        socketio.emit('chat_error', {'session_id': session_id, 'error': 'Join the session before chatting'}, to=sid)
+        return
+    
+    try:
+        message = chat_service.post(session_id, user_id, data.get('message'))
+    except RateLimited as e:
+        socketio.emit('chat_error', {'session_id': session_id, 'error': str(e), 'retry_after': e.retry_after}, to=sid)
+        return
+    except ValueError as e:
+        socketio.emit('chat_error', {'session_id': session_id, 'error': str(e)}, to=sid)
+        return
+    
+    # Broadcast message to session
+    emit_room('chat_message', chat_service.to_event(message), session_id)
+
+@socketio.on('chat_history')
+@offloaded('chat_history')
+def handle_chat_history(sid, data):
+    """Resend a session's recent chat"""
+    if data.get('session_id'):
+        send_chat_history(sid, data['session_id'])
 
 # Utility functions for broadcasting updates
 def broadcast_tournament_update(tournament_id, update_data):
     """Broadcast tournament update to all participants"""
     room_name = f'tournament_{tournament_id}'
-    socketio.emit('tournament_update', update_data, room=room_name)
+    emit_room('tournament_update', update_data, room_name)
+
+def broadcast_tournament_delta(delta):
+    """Send a match-result delta to the tournament room.
+
+    Clients apply deltas whose base_version equals their version and send
+    tournament_sync for a snapshot when they find a gap.
+    """
+    room_name = f"tournament_{delta['tournament_id']}"
+    emit_room('tournament_update', delta, room_name)
+    if delta['status'] == 'completed':
+        emit_room('tournament_completed', {
+            'tournament_id': delta['tournament_id'],
+            'version': delta['version'],
+            'winner_id': delta['winner_id']
+        }, room_name)
 
 def broadcast_game_update(session_id, update_data):
     """Broadcast game update to session participants"""
-    socketio.emit('game_update', update_data, room=session_id)
+    emit_room('game_update', update_data, session_id)
 
-def broadcast_leaderboard_update(game_id, leaderboard_data):
-    """Broadcast leaderboard update"""
-    socketio.emit('leaderboard_update', {
-        'game_id': game_id,
-        'leaderboard': leaderboard_data
-    }, broadcast=True)
+def broadcast_leaderboard_update(game_id):
+    """Push a game's leaderboard changes to its subscribers on the next tick"""
+    leaderboard_broadcaster.mark_dirty(game_id)
 
 def broadcast_notification(user_id, notification_data):
-    """Send notification to specific user"""
-    # Find user's socket connection
-    for session_id, session in active_sessions.items():
-        if session.get('user_id') == user_id:
-            socketio.emit('notification', notification_data, room=session_id)
-            break
+    """Send notification to every socket of a user"""
+    emit_room('notification', notification_data, user_room(user_id))
 
 def broadcast_achievement(user_id, achievement_data):
-    """Broadcast achievement to user"""
-    for session_id, session in active_sessions.items():
-        if session.get('user_id') == user_id:
-            socketio.emit('achievement_unlocked', achievement_data, room=session_id)
-            break 
\ No newline at end of file
+    """Broadcast achievement to every socket of a user"""
+    emit_room('achievement_unlocked', achievement_data, user_room(user_id))
@@ -1,6 +1,8 @@
 # WSGI entry point for TNCA IQ Platform
-from server import app, socketio
+from server import create_app, socketio
 import os
 
+app = create_app()
+
 if __name__ == "__main__":
-    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000))) 
\ No newline at end of file
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000))) 
@@ -0,0 +1,19 @@
+import React from 'react'
+
+const LoadMoreButton = ({ cursor, loading = false, onLoadMore }) => {
+  if (!cursor) return null
+
+  return (
+    <div className="flex justify-center pt-6">
+      <button
+        onClick={() => onLoadMore(cursor)}
+        disabled={loading}
+        className="px-6 py-2 bg-gray-100 text-gray-700 rounded-lg hover:bg-gray-200 disabled:opacity-50"
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  )
+}
+
+export default LoadMoreButton
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { sessionManager } from '../../utils/sessionManager';
 import { 
   Crown, 
   Clock, 
@@ -76,7 +77,10 @@ const ChessGame = ({ gameData, levelData, onComplete, onExit }) => {
   const user = JSON.parse(localStorage.getItem('user') || '{}');
 
   useEffect(() => {
-    const newSocket = io('http://localhost:5000');
+    const newSocket = io('http://localhost:5000', {
+      // Read on every (re)connect so a refreshed token is used
+      auth: (cb) => cb({ token: sessionManager.getAccessToken() })
+    });
     setSocket(newSocket);
 
     newSocket.on('connect', () => {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { io } from 'socket.io-client';
+import { sessionManager } from '../../utils/sessionManager';
 import { 
   Box, 
   Clock, 
@@ -40,7 +41,10 @@ const CubeGame = ({ gameData, levelData, onComplete, onExit }) => {
 
   useEffect(() => {
     // Initialize WebSocket connection
-    const newSocket = io('http://localhost:5000');
+    const newSocket = io('http://localhost:5000', {
+      // Read on every (re)connect so a refreshed token is used
+      auth: (cb) => cb({ token: sessionManager.getAccessToken() })
+    });
     setSocket(newSocket);
 
     // Socket event handlers
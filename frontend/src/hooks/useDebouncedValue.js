@@ -0,0 +1,15 @@
+import { useState, useEffect } from 'react';
+
+// Returns `value` once it has stopped changing for `delay` ms
+const useDebouncedValue = (value, delay = 300) => {
+  const [debouncedValue, setDebouncedValue] = useState(value);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedValue(value), delay);
+    return () => clearTimeout(timer);
+  }, [value, delay]);
+
+  return debouncedValue;
+};
+
+export default useDebouncedValue;
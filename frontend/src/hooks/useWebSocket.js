@@ -11,6 +11,7 @@ const useWebSocket = () => {
   const [chatMessages, setChatMessages] = useState([]);
   const [notifications, setNotifications] = useState([]);
   const socketRef = useRef(null);
+  const heartbeatRef = useRef(null);
 
   // Initialize WebSocket connection
   useEffect(() => {
@@ -21,9 +22,8 @@ const useWebSocket = () => {
     if (!user?.id || !token) return;
 
     const newSocket = io('http://localhost:5000', {
-      auth: {
-        token: token
-      }
+      // Read on every (re)connect so a refreshed token is used
+      auth: (cb) => cb({ token: sessionManager.getAccessToken() })
     });
 
     socketRef.current = newSocket;
@@ -35,13 +35,27 @@ const useWebSocket = () => {
       setIsConnected(true);
     });
 
-    newSocket.on('disconnect', () => {
+    newSocket.on('disconnect', (reason) => {
       console.log('Disconnected from WebSocket server');
       setIsConnected(false);
+      clearInterval(heartbeatRef.current);
+      // The server disconnects sockets whose access token expired; reconnect with the current one
+      if (reason === 'io server disconnect' && sessionManager.getAccessToken()) {
+        newSocket.connect();
+      }
+    });
+
+    newSocket.on('connect_error', (error) => {
+      console.error('WebSocket connection rejected:', error.message);
     });
 
     newSocket.on('connected', (data) => {
       console.log('WebSocket connection established:', data);
+      // Keeps this socket counted as online; the server drops sockets whose heartbeats stop
+      clearInterval(heartbeatRef.current);
+      if (data.heartbeat_interval) {
+        heartbeatRef.current = setInterval(() => newSocket.emit('heartbeat'), data.heartbeat_interval * 1000);
+      }
     });
 
     // Game events
@@ -128,6 +142,7 @@ const useWebSocket = () => {
     });
 
     return () => {
+      clearInterval(heartbeatRef.current);
       if (newSocket) {
         newSocket.disconnect();
       }
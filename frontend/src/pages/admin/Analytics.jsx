@@ -14,6 +14,7 @@ import {
   Clock
 } from "lucide-react";
 import { toast } from "react-hot-toast";
+import { downloadExport } from "../../utils/exports";
 
 const Analytics = () => {
   const [analyticsData, setAnalyticsData] = useState(null);
@@ -102,22 +103,11 @@ const Analytics = () => {
 
   const exportData = async (type) => {
     try {
-      const response = await fetch(`/api/analytics/export/${type}`, {
-        headers: { "Authorization": `Bearer ${localStorage.getItem("token")}` }
+      toast(`Preparing ${type} export...`);
+      await downloadExport(type, `${type}_export_${new Date().toISOString().split('T')[0]}.xlsx`, {
+        "Authorization": `Bearer ${localStorage.getItem("token")}`
       });
-      
-      if (response.ok) {
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `${type}_export_${new Date().toISOString().split('T')[0]}.xlsx`;
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
-        document.body.removeChild(a);
-        toast.success(`${type} data exported successfully`);
-      }
+      toast.success(`${type} data exported successfully`);
     } catch (error) {
       toast.error("Failed to export data");
     }
@@ -66,7 +66,7 @@ const AdminDashboard = () => {
       }
       
       // Fetch recent activity
-      const activityResponse = await fetch('/api/admin/dashboard/activity', {
+      const activityResponse = await fetch('/api/admin/dashboard/activity?limit=10', {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('access_token')}`
         }
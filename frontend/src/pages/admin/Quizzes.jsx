@@ -17,6 +17,8 @@ import {
 } from "lucide-react";
 import { toast } from "react-hot-toast";
 import { useAuth } from "../../contexts/AuthContext";
+import { pageUrl } from "../../utils/pagination";
+import LoadMoreButton from "../../components/common/LoadMoreButton";
 
 // Separate memoized QuestionEditor component
 const QuestionEditor = memo(({ 
@@ -518,6 +520,8 @@ const QuizModal = memo(({
 const Quizzes = () => {
   const { user } = useAuth();
   const [quizzes, setQuizzes] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [showEditModal, setShowEditModal] = useState(false);
@@ -544,20 +548,23 @@ const Quizzes = () => {
     fetchQuizzes();
   }, []);
 
-  const fetchQuizzes = useCallback(async () => {
+  const fetchQuizzes = useCallback(async (cursor = null) => {
     try {
-      const response = await fetch("/api/admin/quizzes", {
+      if (cursor) setLoadingMore(true);
+      const response = await fetch(pageUrl("/api/admin/quizzes", cursor), {
         headers: {
           "Authorization": `Bearer ${localStorage.getItem("access_token")}`
         }
       });
       const data = await response.json();
       if (data.success) {
-        setQuizzes(data.data);
+        setQuizzes(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       }
     } catch (error) {
       toast.error("Failed to fetch quizzes");
     } finally {
+      setLoadingMore(false);
       setLoading(false);
     }
   }, []);
@@ -948,6 +955,7 @@ const Quizzes = () => {
             ))}
           </div>
         )}
+        <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchQuizzes} />
       </div>
 
       {/* Quiz Preview Modal */}
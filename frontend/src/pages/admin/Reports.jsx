@@ -18,6 +18,7 @@ import {
   Activity
 } from "lucide-react";
 import { toast } from "react-hot-toast";
+import { downloadExport } from "../../utils/exports";
 
 const Reports = () => {
   const [reports, setReports] = useState([]);
@@ -111,22 +112,11 @@ const Reports = () => {
           exportType = 'users';
       }
 
-      const response = await fetch(`/api/analytics/export/${exportType}`, {
-        headers: { "Authorization": `Bearer ${localStorage.getItem("token")}` }
+      toast("Preparing report export...");
+      await downloadExport(exportType, `${report.type}_report_${new Date().toISOString().split('T')[0]}.xlsx`, {
+        "Authorization": `Bearer ${localStorage.getItem("token")}`
       });
-      
-      if (response.ok) {
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `${report.type}_report_${new Date().toISOString().split('T')[0]}.xlsx`;
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
-        document.body.removeChild(a);
-        toast.success("Report exported successfully");
-      }
+      toast.success("Report exported successfully");
     } catch (error) {
       toast.error("Failed to export report");
     }
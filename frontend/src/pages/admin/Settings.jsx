@@ -18,9 +18,13 @@ import {
   Star
 } from "lucide-react";
 import { toast } from "react-hot-toast";
+import { pageUrl } from "../../utils/pagination";
+import LoadMoreButton from "../../components/common/LoadMoreButton";
 
 const ContentManagement = () => {
   const [content, setContent] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [showEditModal, setShowEditModal] = useState(false);
@@ -48,25 +52,28 @@ const ContentManagement = () => {
     fetchContent();
   }, [activeTab]);
 
-  const fetchContent = async () => {
+  const fetchContent = async (cursor = null) => {
     try {
+      if (cursor) setLoadingMore(true);
       const url = activeTab === 'all' 
         ? "/api/content/admin" 
         : `/api/content/admin?type=${activeTab}`;
       
-      const response = await fetch(url, {
+      const response = await fetch(pageUrl(url, cursor), {
         headers: {
           "Authorization": `Bearer ${localStorage.getItem("token")}`
         }
       });
       const data = await response.json();
       if (data.success) {
-        setContent(data.data);
+        setContent(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       }
     } catch (error) {
       toast.error("Failed to fetch content");
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -649,6 +656,7 @@ const ContentManagement = () => {
             })}
           </div>
         )}
+        <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchContent} />
       </div>
 
       {/* Modals */}
@@ -30,9 +30,13 @@ import {
   Activity
 } from 'lucide-react';
 import { toast } from 'react-hot-toast';
+import { pageUrl } from '../../utils/pagination';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
 
 const AdminTournaments = () => {
   const [tournaments, setTournaments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [games, setGames] = useState([]);
   const [loading, setLoading] = useState(true);
   const [selectedTournament, setSelectedTournament] = useState(null);
@@ -64,10 +68,10 @@ const AdminTournaments = () => {
     fetchGames();
   }, []);
 
-  const fetchTournaments = async () => {
+  const fetchTournaments = async (cursor = null) => {
     try {
-      setLoading(true);
-      const response = await fetch('/api/tournament/admin/tournaments', {
+      cursor ? setLoadingMore(true) : setLoading(true);
+      const response = await fetch(pageUrl('/api/tournament/admin/tournaments', cursor), {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('access_token')}`
         }
@@ -75,7 +79,8 @@ const AdminTournaments = () => {
       const data = await response.json();
       
       if (data.success) {
-        setTournaments(data.data);
+        setTournaments(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       } else {
         toast.error(data.message);
         setTournaments([]);
@@ -86,6 +91,7 @@ const AdminTournaments = () => {
       setTournaments([]);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -500,6 +506,7 @@ const AdminTournaments = () => {
             </table>
           </div>
         )}
+        <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchTournaments} />
       </div>
 
       {/* Create Tournament Modal */}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import { 
   Plus, 
   Search, 
@@ -20,6 +20,9 @@ import {
 } from "lucide-react";
 import { toast } from "react-hot-toast";
 import { authService } from "../../services/authService";
+import { pageUrl } from "../../utils/pagination";
+import LoadMoreButton from "../../components/common/LoadMoreButton";
+import useDebouncedValue from "../../hooks/useDebouncedValue";
 
 // Move Modal component outside to prevent re-creation on every render
 const Modal = ({ isOpen, onClose, title, children }) => {
@@ -42,10 +45,14 @@ const Modal = ({ isOpen, onClose, title, children }) => {
 
 const Users = () => {
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState("");
   const [filterRole, setFilterRole] = useState("all");
   const [filterStatus, setFilterStatus] = useState("all");
+  const debouncedSearch = useDebouncedValue(searchTerm.trim());
+  const latestRequest = useRef(0);
   const [selectedUsers, setSelectedUsers] = useState([]);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [showEditModal, setShowEditModal] = useState(false);
@@ -69,7 +76,7 @@ const Users = () => {
 
   useEffect(() => {
     fetchUsers();
-  }, []);
+  }, [debouncedSearch, filterRole, filterStatus]);
 
   // Reset form data when modal closes
   useEffect(() => {
@@ -90,18 +97,27 @@ const Users = () => {
     }
   }, [showCreateModal]);
 
-  const fetchUsers = async () => {
+  // Search, filtering and paging all happen server-side; only the current result pages are held here
+  const fetchUsers = async (cursor = null) => {
+    const requestId = ++latestRequest.current;
     try {
-      setLoading(true);
-      const response = await fetch('/api/admin/users', {
+      // The full-page spinner is only for the first load so the search box keeps focus
+      if (cursor) setLoadingMore(true);
+      const params = new URLSearchParams();
+      if (debouncedSearch) params.set('q', debouncedSearch);
+      if (filterRole !== 'all') params.set('role', filterRole);
+      if (filterStatus !== 'all') params.set('status', filterStatus === 'inactive' ? 'suspended' : filterStatus);
+      const response = await fetch(pageUrl(`/api/admin/users/search?${params}`, cursor), {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('access_token')}`
         }
       });
       const data = await response.json();
+      if (requestId !== latestRequest.current) return;
       
       if (data.success) {
-        setUsers(data.data);
+        setUsers(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       } else {
         toast.error(data.message);
         setUsers([]);
@@ -111,7 +127,10 @@ const Users = () => {
       toast.error('Failed to fetch users. Please try again.');
       setUsers([]);
     } finally {
-      setLoading(false);
+      if (requestId === latestRequest.current) {
+        setLoading(false);
+        setLoadingMore(false);
+      }
     }
   };
 
@@ -456,18 +475,6 @@ const Users = () => {
     }
   };
 
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = user.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         user.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         user.username.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesRole = filterRole === "all" || user.role === filterRole;
-    const matchesStatus = filterStatus === "all" || 
-                         (filterStatus === "active" && user.is_active) ||
-                         (filterStatus === "inactive" && !user.is_active);
-    
-    return matchesSearch && matchesRole && matchesStatus;
-  });
-
   const openEditModal = (user) => {
     if (user.role === 'developer') {
       toast.error('Developer accounts cannot be modified');
@@ -611,7 +618,7 @@ const Users = () => {
               </tr>
             </thead>
             <tbody className="bg-white divide-y divide-gray-200">
-              {filteredUsers.map((user) => (
+              {users.map((user) => (
                 <tr key={user.id} className="hover:bg-gray-50">
                   <td className="px-6 py-4 whitespace-nowrap">
                     <div className="flex items-center">
@@ -705,6 +712,9 @@ const Users = () => {
             </tbody>
           </table>
         </div>
+        <div className="pb-6">
+          <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchUsers} />
+        </div>
       </div>
 
       {/* Create User Modal */}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Users, 
   Search, 
@@ -19,38 +19,57 @@ import {
   CheckCircle,
   Clock
 } from 'lucide-react';
+import { pageUrl } from '../../utils/pagination';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
+import useDebouncedValue from '../../hooks/useDebouncedValue';
 
 const UserManagement = () => {
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [roleFilter, setRoleFilter] = useState('all');
   const [statusFilter, setStatusFilter] = useState('all');
+  const debouncedSearch = useDebouncedValue(searchTerm.trim());
+  const latestRequest = useRef(0);
   const [selectedUser, setSelectedUser] = useState(null);
   const [showEditModal, setShowEditModal] = useState(false);
   const [editForm, setEditForm] = useState({});
 
   useEffect(() => {
     fetchUsers();
-  }, []);
+  }, [debouncedSearch, roleFilter, statusFilter]);
 
-  const fetchUsers = async () => {
+  // Search, filtering and paging all happen server-side; only the current result pages are held here
+  const fetchUsers = async (cursor = null) => {
+    const requestId = ++latestRequest.current;
     try {
+      if (cursor) setLoadingMore(true);
       const token = localStorage.getItem('access_token');
-      const response = await fetch('http://localhost:5000/api/developer/users/manage', {
+      const params = new URLSearchParams();
+      if (debouncedSearch) params.set('q', debouncedSearch);
+      if (roleFilter !== 'all') params.set('role', roleFilter);
+      if (statusFilter !== 'all') params.set('status', statusFilter === 'inactive' ? 'suspended' : statusFilter);
+      const response = await fetch(pageUrl(`http://localhost:5000/api/developer/users/search?${params}`, cursor), {
         headers: {
           'Authorization': `Bearer ${token}`
         }
       });
+      const data = await response.json();
+      if (requestId !== latestRequest.current) return;
       
-      if (response.ok) {
-        const data = await response.json();
-        setUsers(data.data);
+      if (data.success) {
+        setUsers(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       }
     } catch (error) {
       console.error('Error fetching users:', error);
     } finally {
-      setLoading(false);
+      if (requestId === latestRequest.current) {
+        setLoading(false);
+        setLoadingMore(false);
+      }
     }
   };
 
@@ -147,20 +166,6 @@ const UserManagement = () => {
     }
   };
 
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = 
-      user.name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      user.email?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      user.username?.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesRole = roleFilter === 'all' || user.role === roleFilter;
-    const matchesStatus = statusFilter === 'all' || 
-      (statusFilter === 'active' && user.is_active) ||
-      (statusFilter === 'inactive' && !user.is_active);
-    
-    return matchesSearch && matchesRole && matchesStatus;
-  });
-
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -181,7 +186,7 @@ const UserManagement = () => {
               </p>
             </div>
             <button
-              onClick={fetchUsers}
+              onClick={() => fetchUsers()}
               className="inline-flex items-center px-4 py-2 border border-gray-300 rounded-md shadow-sm text-sm font-medium text-gray-700 bg-white hover:bg-gray-50"
             >
               <RefreshCw className="h-4 w-4 mr-2" />
@@ -260,7 +265,7 @@ const UserManagement = () => {
         <div className="bg-white shadow rounded-lg overflow-hidden">
           <div className="px-6 py-4 border-b border-gray-200">
             <h3 className="text-lg font-medium text-gray-900">
-              Users ({filteredUsers.length})
+              Users ({users.length}{nextCursor ? '+' : ''})
             </h3>
           </div>
           <div className="overflow-x-auto">
@@ -291,7 +296,7 @@ const UserManagement = () => {
                 </tr>
               </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-                {filteredUsers.map((user) => (
+                {users.map((user) => (
                   <tr key={user.id} className="hover:bg-gray-50">
                     <td className="px-6 py-4 whitespace-nowrap">
                       <div className="flex items-center">
@@ -366,6 +371,9 @@ const UserManagement = () => {
               </tbody>
             </table>
           </div>
+          <div className="pb-6">
+            <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchUsers} />
+          </div>
         </div>
 
         {/* Edit Modal */}
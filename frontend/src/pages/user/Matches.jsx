@@ -18,9 +18,13 @@ import {
   Crown
 } from "lucide-react";
 import { toast } from "react-hot-toast";
+import { pageUrl } from "../../utils/pagination";
+import LoadMoreButton from "../../components/common/LoadMoreButton";
 
 const Matches = () => {
   const [matches, setMatches] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [pendingMatches, setPendingMatches] = useState([]);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('all');
@@ -32,10 +36,10 @@ const Matches = () => {
     fetchPendingMatches();
   }, []);
 
-  const fetchMatches = async () => {
+  const fetchMatches = async (cursor = null) => {
     try {
-      setLoading(true);
-      const response = await fetch('/api/game/matches', {
+      cursor ? setLoadingMore(true) : setLoading(true);
+      const response = await fetch(pageUrl('/api/game/matches', cursor), {
         headers: {
           'Authorization': `Bearer ${localStorage.getItem('access_token')}`
         }
@@ -43,7 +47,8 @@ const Matches = () => {
       const data = await response.json();
       
       if (data.success) {
-        setMatches(data.data);
+        setMatches(prev => cursor ? [...prev, ...data.data] : data.data);
+        setNextCursor(data.pagination?.next_cursor || null);
       } else {
         toast.error(data.message);
         setMatches([]);
@@ -54,6 +59,7 @@ const Matches = () => {
       setMatches([]);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -410,6 +416,7 @@ const Matches = () => {
               ))}
             </div>
           )}
+          <LoadMoreButton cursor={nextCursor} loading={loadingMore} onLoadMore={fetchMatches} />
         </div>
       </div>
 
@@ -0,0 +1,40 @@
+// Data exports
+// CSV streams straight from /api/analytics/export; XLSX is built by a report
+// worker, so the export request returns a report_id to poll and then download
+
+const POLL_INTERVAL = 2000
+
+const saveBlob = (blob, filename) => {
+  const url = window.URL.createObjectURL(blob)
+  const a = document.createElement('a')
+  a.href = url
+  a.download = filename
+  document.body.appendChild(a)
+  a.click()
+  window.URL.revokeObjectURL(url)
+  document.body.removeChild(a)
+}
+
+export const downloadExport = async (exportType, filename, headers) => {
+  const response = await fetch(`/api/analytics/export/${exportType}?format=xlsx`, { headers })
+  const queued = await response.json()
+  if (!queued.success) {
+    throw new Error(queued.message)
+  }
+
+  const reportId = queued.data.report_id
+  for (;;) {
+    await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL))
+    const status = await (await fetch(`/api/admin/reports/${reportId}`, { headers })).json()
+    if (!status.success || status.data.status === 'failed') {
+      throw new Error(status.data?.error || status.message)
+    }
+    if (status.data.status === 'completed') break
+  }
+
+  const file = await fetch(`/api/admin/reports/${reportId}/download`, { headers })
+  if (!file.ok) {
+    throw new Error('Failed to download export')
+  }
+  saveBlob(await file.blob(), filename)
+}
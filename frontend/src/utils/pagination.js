@@ -0,0 +1,10 @@
+// Cursor pagination helpers
+// List endpoints return one page ({ data, pagination: { next_cursor, has_more } });
+// pages keep next_cursor in state and request the next page on demand
+
+export const PAGE_SIZE = 50
+
+export const pageUrl = (url, cursor = null, limit = PAGE_SIZE) => {
+  const separator = url.endsWith('?') ? '' : url.includes('?') ? '&' : '?'
+  return `${url}${separator}limit=${limit}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '')
+}